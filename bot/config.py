@@ -1,4 +1,5 @@
 import os
+import socket
 from dotenv import load_dotenv
 
 # Всегда загружать .env из корня проекта
@@ -19,4 +20,134 @@ REDIS_PASSWORD = os.getenv('REDIS_PASSWORD', '')
 CACHE_TTL = int(os.getenv("CACHE_TTL", 3600))
 
 # Настройки бесплатных постов
-FREE_POSTS_LIMIT = 5  # Максимальное количество бесплатных постов для новых пользователей
\ No newline at end of file
+FREE_POSTS_LIMIT = 5  # Максимальное количество бесплатных постов для новых пользователей
+
+# Пул HTTP-соединений к OpenAI API (один клиент на всё приложение)
+AI_HTTP_POOL_LIMIT = int(os.getenv('AI_HTTP_POOL_LIMIT', 100))
+AI_HTTP_POOL_LIMIT_PER_HOST = int(os.getenv('AI_HTTP_POOL_LIMIT_PER_HOST', 20))
+AI_HTTP_DNS_CACHE_TTL = int(os.getenv('AI_HTTP_DNS_CACHE_TTL', 300))
+AI_HTTP_KEEPALIVE_TIMEOUT = float(os.getenv('AI_HTTP_KEEPALIVE_TIMEOUT', 60))
+
+# Очередь фоновой AI-генерации
+AI_GENERATION_WORKERS = int(os.getenv('AI_GENERATION_WORKERS', 4))
+AI_GENERATION_QUEUE_SIZE = int(os.getenv('AI_GENERATION_QUEUE_SIZE', 1000))
+# Приоритеты очереди: интерактив с ai_priority → обычный интерактив → фоновые workflow.
+# Один уровень приоритета равен стольким секундам ожидания (старение), поэтому
+# задачи низких уровней не голодают под нагрузкой
+AI_PRIORITY_AGING_SECONDS = float(os.getenv('AI_PRIORITY_AGING_SECONDS', 30))
+# Фоновые задачи (в очереди и в работе) занимают не больше workers - N воркеров:
+# N воркеров всегда остаются интерактивным запросам, сколько бы постов ни генерировал автопостинг
+AI_INTERACTIVE_RESERVED_WORKERS = int(os.getenv('AI_INTERACTIVE_RESERVED_WORKERS', 1))
+
+# Кэш генераций по хэшу промпта (одинаковый запрос — готовый текст без похода в OpenAI)
+AI_CACHE_ENABLED = os.getenv('AI_CACHE_ENABLED', '1') == '1'
+AI_CACHE_TTL = int(os.getenv('AI_CACHE_TTL', 86400))
+AI_CACHE_MAX_ENTRIES = int(os.getenv('AI_CACHE_MAX_ENTRIES', 10000))  # сверх лимита вытесняются давно не читанные
+
+# Потоковая генерация в мастере поста: превью правится по мере получения текста.
+# Telegram ограничивает частоту правок, поэтому правим не чаще раза в интервал.
+AI_STREAMING_ENABLED = os.getenv('AI_STREAMING_ENABLED', '1') == '1'
+AI_STREAM_EDIT_INTERVAL = float(os.getenv('AI_STREAM_EDIT_INTERVAL', 1.5))
+AI_STREAM_MIN_CHARS = int(os.getenv('AI_STREAM_MIN_CHARS', 40))  # минимальный прирост текста между правками
+
+# «Перегенерировать» запрашивает сразу несколько вариантов (параметр n): следующие нажатия
+# показывают сохранённые в FSM варианты без нового запроса к OpenAI
+AI_REGENERATE_VARIANTS = int(os.getenv('AI_REGENERATE_VARIANTS', 3))
+
+# Устойчивость вызовов AI-провайдера
+AI_REQUEST_TIMEOUT = float(os.getenv('AI_REQUEST_TIMEOUT', 60))     # одна попытка, сек
+AI_DEADLINE_SECONDS = float(os.getenv('AI_DEADLINE_SECONDS', 120))  # все попытки вместе с ожиданием
+AI_RETRY_ATTEMPTS = int(os.getenv('AI_RETRY_ATTEMPTS', 3))
+AI_RETRY_BASE_DELAY = float(os.getenv('AI_RETRY_BASE_DELAY', 1))
+AI_RETRY_MAX_DELAY = float(os.getenv('AI_RETRY_MAX_DELAY', 20))
+# Адаптивный лимит параллельных запросов (AIMD). Генерации одновременно ведут не больше
+# AI_GENERATION_WORKERS воркеров, и у каждого в полёте максимум два запроса (основной и хедж),
+# поэтому потолок — 2 * воркеры: выше лимит не связывает. Основная работа лимита — при
+# деградации провайдера опускать параллелизм ниже числа воркеров
+AI_CONCURRENCY_INITIAL = int(os.getenv('AI_CONCURRENCY_INITIAL', AI_GENERATION_WORKERS))
+AI_CONCURRENCY_MIN = int(os.getenv('AI_CONCURRENCY_MIN', 1))
+AI_CONCURRENCY_MAX = int(os.getenv('AI_CONCURRENCY_MAX', 2 * AI_GENERATION_WORKERS))
+AI_LATENCY_TARGET = float(os.getenv('AI_LATENCY_TARGET', 30))       # ответ дольше — признак перегрузки
+# Circuit breaker: после N ошибок подряд запросы отклоняются сразу на время паузы
+AI_BREAKER_FAILURES = int(os.getenv('AI_BREAKER_FAILURES', 5))
+AI_BREAKER_RESET_SECONDS = float(os.getenv('AI_BREAKER_RESET_SECONDS', 30))
+# Хеджирование: если ответа нет за AI_HEDGE_DELAY сек, параллельно спрашиваем резервную модель
+AI_FALLBACK_MODEL = os.getenv('AI_FALLBACK_MODEL', '')              # пусто — без хеджирования
+AI_HEDGE_DELAY = float(os.getenv('AI_HEDGE_DELAY', 15))
+
+# Движок автопостинга по расписанию задач
+WORKFLOW_TICK_SECONDS = int(os.getenv('WORKFLOW_TICK_SECONDS', 30))
+WORKFLOW_BATCH_SIZE = int(os.getenv('WORKFLOW_BATCH_SIZE', 500))
+WORKFLOW_LOOKAHEAD_MINUTES = int(os.getenv('WORKFLOW_LOOKAHEAD_MINUTES', 10))
+WORKFLOW_RETRY_MINUTES = int(os.getenv('WORKFLOW_RETRY_MINUTES', 15))
+
+# Планировщик публикаций: интервал сверки очереди с БД (секунды)
+PUBLISH_RECONCILE_SECONDS = int(os.getenv('PUBLISH_RECONCILE_SECONDS', 300))
+# Одновременные публикации: всего и в один канал
+PUBLISH_CONCURRENCY = int(os.getenv('PUBLISH_CONCURRENCY', 20))
+PUBLISH_PER_CHANNEL_CONCURRENCY = int(os.getenv('PUBLISH_PER_CHANNEL_CONCURRENCY', 1))
+
+# Лимиты Bot API для исходящих сообщений
+TELEGRAM_GLOBAL_RATE = float(os.getenv('TELEGRAM_GLOBAL_RATE', 30))                 # сообщений в секунду на бота
+TELEGRAM_CHAT_RATE_PER_MINUTE = float(os.getenv('TELEGRAM_CHAT_RATE_PER_MINUTE', 20))  # сообщений в минуту в один чат
+TELEGRAM_CHAT_BURST = int(os.getenv('TELEGRAM_CHAT_BURST', 3))
+
+# Публикация с нескольких экземпляров бота: захват постов с арендой
+PUBLISHER_INSTANCE_ID = os.getenv('PUBLISHER_INSTANCE_ID') or f"{socket.gethostname()}-{os.getpid()}"
+PUBLISH_LEASE_SECONDS = int(os.getenv('PUBLISH_LEASE_SECONDS', 300))
+PUBLISH_CLAIM_BATCH = int(os.getenv('PUBLISH_CLAIM_BATCH', 50))
+
+# Повторные попытки публикации при временных ошибках
+PUBLISH_MAX_RETRIES = int(os.getenv('PUBLISH_MAX_RETRIES', 5))
+PUBLISH_RETRY_BASE_DELAY = float(os.getenv('PUBLISH_RETRY_BASE_DELAY', 30))    # секунды
+PUBLISH_RETRY_MAX_DELAY = float(os.getenv('PUBLISH_RETRY_MAX_DELAY', 3600))    # секунды
+
+# Локальный (in-process) уровень кэша пользователей перед Redis
+USER_CACHE_LOCAL_SIZE = int(os.getenv('USER_CACHE_LOCAL_SIZE', 10000))
+USER_CACHE_LOCAL_TTL = int(os.getenv('USER_CACHE_LOCAL_TTL', 60))
+
+# Хранилище состояний FSM: 'redis' (переживает рестарт, общее для реплик) или 'memory'
+FSM_STORAGE = os.getenv('FSM_STORAGE', 'redis')
+FSM_STATE_TTL = int(os.getenv('FSM_STATE_TTL', 24 * 3600))   # по умолчанию
+FSM_WIZARD_TTL = int(os.getenv('FSM_WIZARD_TTL', 6 * 3600))  # мастера создания поста/задачи
+FSM_INPUT_TTL = int(os.getenv('FSM_INPUT_TTL', 3600))        # ожидание одиночного ввода
+
+# Режим получения апдейтов: 'polling' или 'webhook' (несколько экземпляров за балансировщиком)
+BOT_MODE = os.getenv('BOT_MODE', 'polling')
+WEBHOOK_BASE_URL = os.getenv('WEBHOOK_BASE_URL', '')    # публичный https-адрес, например https://bot.example.com
+WEBHOOK_PATH = os.getenv('WEBHOOK_PATH', '/webhook')
+WEBHOOK_SECRET = os.getenv('WEBHOOK_SECRET', '')        # X-Telegram-Bot-Api-Secret-Token, обязателен для webhook
+WEBHOOK_HOST = os.getenv('WEBHOOK_HOST', '0.0.0.0')
+WEBHOOK_PORT = int(os.getenv('WEBHOOK_PORT', 8080))
+WEBHOOK_MAX_CONNECTIONS = int(os.getenv('WEBHOOK_MAX_CONNECTIONS', 40))                  # параллельных запросов от Telegram
+WEBHOOK_MAX_CONCURRENT_UPDATES = int(os.getenv('WEBHOOK_MAX_CONCURRENT_UPDATES', 100))  # апдейтов в обработке на экземпляр
+
+# Кэш сводки профиля (/about); сбрасывается при изменении постов, задач и аккаунтов
+PROFILE_SUMMARY_TTL = int(os.getenv('PROFILE_SUMMARY_TTL', 300))
+
+# Кэш состояния лимитов пользователя (подписка + счётчики использования)
+LIMIT_STATE_TTL = int(os.getenv('LIMIT_STATE_TTL', 300))
+
+# Буфер инкрементов статистики постов: сброс в БД пачкой
+STATS_FLUSH_SECONDS = float(os.getenv('STATS_FLUSH_SECONDS', 5))
+STATS_BUFFER_MAX_POSTS = int(os.getenv('STATS_BUFFER_MAX_POSTS', 1000))
+
+# Сбор метрик опубликованных постов: чем старше пост, тем реже обновление
+STATS_COLLECT_SECONDS = int(os.getenv('STATS_COLLECT_SECONDS', 300))
+STATS_COLLECT_LIMIT = int(os.getenv('STATS_COLLECT_LIMIT', 5000))           # постов за цикл
+STATS_FETCH_BATCH = int(os.getenv('STATS_FETCH_BATCH', 100))               # сообщений в одном запросе к площадке
+STATS_FETCH_CONCURRENCY = int(os.getenv('STATS_FETCH_CONCURRENCY', 5))
+STATS_MAX_AGE_DAYS = int(os.getenv('STATS_MAX_AGE_DAYS', 30))              # старше — не обновляем
+STATS_REFRESH_AGE_FACTOR = float(os.getenv('STATS_REFRESH_AGE_FACTOR', 0.1))  # интервал = доля возраста поста
+STATS_REFRESH_MIN_MINUTES = int(os.getenv('STATS_REFRESH_MIN_MINUTES', 10))
+STATS_REFRESH_MAX_HOURS = int(os.getenv('STATS_REFRESH_MAX_HOURS', 24))
+
+# Метрики Telegram-каналов через MTProto (Bot API их не отдаёт): пакет telethon и ключи с my.telegram.org
+STATS_TELEGRAM_MTPROTO = os.getenv('STATS_TELEGRAM_MTPROTO', '').lower() in ('1', 'true', 'yes')
+TELEGRAM_API_ID = int(os.getenv('TELEGRAM_API_ID', 0))
+TELEGRAM_API_HASH = os.getenv('TELEGRAM_API_HASH', '')
+STATS_TELEGRAM_SESSION = os.getenv('STATS_TELEGRAM_SESSION', 'stats_mtproto')     # файл сессии telethon
+
+# Ключ перестановки для реферальных кодов (код = биекция от ID пользователя).
+# Смена ключа не ломает старые коды: коллизии отсекает уникальный индекс.
+REFERRAL_CODE_SECRET = os.getenv('REFERRAL_CODE_SECRET') or (BOT_TOKEN or '')
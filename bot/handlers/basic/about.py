@@ -3,64 +3,19 @@ from aiogram.filters import Command
 from aiogram.fsm.context import FSMContext
 from aiogram import F
 from aiogram import Router
-from sqlalchemy import select, func
-from datetime import datetime, timezone
+from datetime import datetime
 
-from bot.models.models import Post, UserWorkflow, SocialAccount, Subscription, User
+from bot.services.profile import get_profile_summary
 from bot.keyboards.inline.settings import get_settings_keyboard, get_simple_settings_keyboard
 
 router = Router()
 
 
-async def about_handler(message: Message, session, i18n, user, **_):
+async def about_handler(message: Message, session, i18n, user, redis=None, **_):
     """Отображает упрощенную информацию о профиле пользователя"""
     
-    # Получаем статистику пользователя
-    # Подсчет постов
-    posts_result = await session.execute(
-        select(func.count(Post.id)).where(Post.workflow.has(user_id=user.id))
-    )
-    total_posts = posts_result.scalar() or 0
-    
-    # Подсчет опубликованных постов
-    published_posts_result = await session.execute(
-        select(func.count(Post.id)).where(
-            Post.workflow.has(user_id=user.id),
-            Post.status == 'published'
-        )
-    )
-    published_posts = published_posts_result.scalar() or 0
-    
-    # Подсчет workflow'ов
-    workflows_result = await session.execute(
-        select(func.count(UserWorkflow.id)).where(UserWorkflow.user_id == user.id)
-    )
-    total_workflows = workflows_result.scalar() or 0
-    
-    # Подсчет активных workflow'ов
-    active_workflows_result = await session.execute(
-        select(func.count(UserWorkflow.id)).where(
-            UserWorkflow.user_id == user.id,
-            UserWorkflow.status == 'active'
-        )
-    )
-    active_workflows = active_workflows_result.scalar() or 0
-    
-    # Подсчет аккаунтов
-    accounts_result = await session.execute(
-        select(func.count(SocialAccount.id)).where(SocialAccount.user_id == user.id)
-    )
-    total_accounts = accounts_result.scalar() or 0
-    
-    # Получаем активную подписку
-    subscription_result = await session.execute(
-        select(Subscription).where(
-            Subscription.user_id == user.id,
-            Subscription.status == 'active',
-            Subscription.end_date > datetime.now(timezone.utc)
-        ).order_by(Subscription.end_date.desc())
-    )
-    active_subscription = subscription_result.scalar_one_or_none()
+    # Вся статистика профиля — один запрос к БД (или кэш Redis)
+    summary = await get_profile_summary(session, user.id, redis)
     
     # Формируем упрощенный текст профиля
     user_name = user.name or i18n.get("about.unknown")
@@ -68,9 +23,9 @@ async def about_handler(message: Message, session, i18n, user, **_):
     profile_text = i18n.get("about.profile_title").format(name=user_name) + "\n\n"
     
     # Подписка
-    if active_subscription:
-        subscription_end = active_subscription.end_date.strftime("%d.%m.%Y")
-        plan_name = active_subscription.plan.name if active_subscription.plan else "Unknown"
+    if summary.get("subscription_end"):
+        subscription_end = datetime.fromisoformat(summary["subscription_end"]).strftime("%d.%m.%Y")
+        plan_name = summary.get("plan_name") or "Unknown"
         subscription_info = f"{plan_name} (до {subscription_end})"
     else:
         subscription_info = "Free"
@@ -91,18 +46,7 @@ async def about_handler(message: Message, session, i18n, user, **_):
         print(f"КРИТИЧЕСКАЯ ОШИБКА: У пользователя {user.id} (Telegram ID: {user.telegram_id}) нет реферального кода!")
     
     # Информация о реферере
-    if user.referred_by_id:
-        # Получаем информацию о пригласившем пользователе
-        referrer_result = await session.execute(
-            select(User).where(User.id == user.referred_by_id)
-        )
-        referrer = referrer_result.scalar_one_or_none()
-        if referrer:
-            referrer_name = referrer.name
-        else:
-            referrer_name = i18n.get("about.no_referrer")
-    else:
-        referrer_name = i18n.get("about.no_referrer")
+    referrer_name = summary.get("referrer_name") or i18n.get("about.no_referrer")
     
     profile_text += i18n.get("about.invited_by").format(referrer=referrer_name) + "\n"
     
@@ -112,11 +56,11 @@ async def about_handler(message: Message, session, i18n, user, **_):
     free_posts_remaining = free_posts_limit - free_posts_used
     
     profile_text += "\n" + i18n.get("about.statistics").format(
-        total_posts=total_posts,
-        published_posts=published_posts,
-        total_workflows=total_workflows,
-        active_workflows=active_workflows,
-        total_accounts=total_accounts,
+        total_posts=summary.get("total_posts") or 0,
+        published_posts=summary.get("published_posts") or 0,
+        total_workflows=summary.get("total_workflows") or 0,
+        active_workflows=summary.get("active_workflows") or 0,
+        total_accounts=summary.get("total_accounts") or 0,
         free_posts_remaining=free_posts_remaining
     ) + "\n"
     
@@ -127,10 +71,10 @@ async def about_handler(message: Message, session, i18n, user, **_):
     )
 
 
-async def about_back_handler(callback: CallbackQuery, session, i18n, user, **_):
+async def about_back_handler(callback: CallbackQuery, session, i18n, user, redis=None, **_):
     """Обработчик кнопки "Назад" в профиле"""
     await callback.answer()
-    await about_handler(callback.message, session, i18n, user)
+    await about_handler(callback.message, session, i18n, user, redis)
 
 
 def register_about_handler(router: Router):
@@ -10,7 +10,7 @@ from bot.models.models import User
 from bot.keyboards.inline.settings import get_settings_keyboard
 
 from bot.services.crud.user import update_user_with_cache_clear, get_user_by_telegram_id
-from bot.middlewares.i18n import I18nMiddleware
+from bot.utils.i18n import get_translator
 
 router = Router()
 
@@ -340,11 +340,10 @@ async def language_set_handler(callback: CallbackQuery, session, i18n, user, red
             
             if updated_user:
                 # Получаем новые переводы для выбранного языка
-                from bot.middlewares.i18n import I18nMiddleware
-                new_translations = I18nMiddleware().translations.get(lang, {})
+                new_translations = get_translator(lang)
                 
                 # Отправляем приветственное сообщение на новом языке
-                welcome_text = new_translations.get("welcome", "Привет, {name}!").format(name=user.name or callback.from_user.full_name)
+                welcome_text = new_translations.t("welcome", "Привет, {name}!", name=user.name or callback.from_user.full_name)
                 alert_text = new_translations.get("language_set", "✅ Язык успешно обновлён!")
                 
                 # Удаляем текущее сообщение с настройками
@@ -3,7 +3,7 @@ from aiogram.filters import Command
 from aiogram.fsm.context import FSMContext
 
 from bot.services.crud.user import get_user_by_telegram_id, get_or_create_user, update_user
-from bot.middlewares.i18n import I18nMiddleware
+from bot.utils.i18n import get_translator
 from bot.keyboards.inline.language import get_language_keyboard
 from bot.keyboards.reply.main_menu import get_main_menu
 
@@ -37,8 +37,8 @@ async def start_handler(
             default_lang='en',
         )
 
-        en_texts = I18nMiddleware().translations.get("en", {})
-        welcome_text = en_texts.get("welcome", "Welcome, {name}!").format(name=user.name or full_name)
+        en_texts = get_translator("en")
+        welcome_text = en_texts.t("welcome", "Welcome, {name}!", name=user.name or full_name)
         
         # Добавляем информацию о реферальном коде, если он был использован
         if ref_code and user.referred_by:
@@ -53,8 +53,8 @@ async def start_handler(
     else:
         # Уже зарегистрирован — приветствие на его языке + reply-клава
         lang = user.language or "ru"
-        translations = I18nMiddleware().translations.get(lang, {})
-        welcome_text = translations.get("welcome", "Привет, {name}!").format(name=user.name or full_name)
+        translations = get_translator(lang)
+        welcome_text = translations.t("welcome", "Привет, {name}!", name=user.name or full_name)
         
         # Если пользователь уже зарегистрирован, но передан реферальный код
         if ref_code and not user.referred_by:
@@ -97,8 +97,8 @@ async def language_callback_handler(
     from bot.services.crud.user import update_user_with_cache_clear
     updated_user = await update_user_with_cache_clear(session, user.id, redis, language=lang)
 
-    translations = I18nMiddleware().translations.get(lang, {})
-    welcome_text = translations.get("welcome", "Привет, {name}!").format(name=user.name or callback.from_user.full_name)
+    translations = get_translator(lang)
+    welcome_text = translations.t("welcome", "Привет, {name}!", name=user.name or callback.from_user.full_name)
     alert_text = translations.get("language_set", "Language updated successfully!")
 
     # Удаляем старое сообщение с приветствием и языковой клавой
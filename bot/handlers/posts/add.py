@@ -6,7 +6,9 @@ from datetime import datetime, timezone, timedelta
 from sqlalchemy.future import select
 
 from bot.services.crud.post import create_post
-from bot.services.ai import OpenAIService
+from bot import config
+from bot.services.ai.generation_queue import generation_queue, GenerationJob, PRIORITY_PREMIUM, PRIORITY_INTERACTIVE
+from bot.utils.progressive_edit import ProgressiveEditor
 from bot.keyboards.inline.workflows import (
     get_theme_selection_keyboard,
     get_style_selection_keyboard, 
@@ -30,6 +32,7 @@ class AddPostStates(StatesGroup):
     choosing_language = State()  # Выбор языка
     entering_topic = State()  # Ввод темы поста (запускает AI генерацию)
     entering_manual_topic = State()  # Ручной ввод темы для ручных постов
+    generating = State()  # Контент генерируется в фоне
     confirming_post = State()  # Подтверждение сгенерированного поста
     editing_content = State()  # Редактирование контента
     choosing_publish_time = State()  # Выбор времени публикации
@@ -49,30 +52,23 @@ async def add_post_start(callback: CallbackQuery, session, user, i18n, state: FS
         )
         return
     
-    # Проверяем подписку и бесплатные посты
-    from bot.services.crud.subscription import get_active_subscription
-    from bot.services.crud.usage_stats import get_user_usage_stats
-    from bot.services.crud.user import can_create_free_post, get_free_posts_remaining
+    # Проверяем подписку и бесплатные посты — одно обращение к кэшу лимитов
+    from bot.services.entitlements import get_limit_state
+    limits = await get_limit_state(session, user.id)
     
-    subscription = await get_active_subscription(session, user.id)
-    
-    if not subscription:
+    if not limits or not limits.has_subscription:
         # Проверяем возможность создания бесплатного поста
-        from bot.services.crud.user import get_free_posts_info
-        free_posts_info = await get_free_posts_info(session, user.id)
-        
-        if not free_posts_info['can_create']:
+        if not limits or not limits.can_create_post:
             await callback.message.answer(
-                i18n.get("post.add.free_posts_exceeded", "❌ Вы использовали все {limit} бесплатных постов. Оформите подписку для создания новых постов.").format(limit=free_posts_info['limit'])
+                i18n.get("post.add.free_posts_exceeded", "❌ Вы использовали все {limit} бесплатных постов. Оформите подписку для создания новых постов.").format(limit=limits.free_posts_limit if limits else 0)
             )
             return
         
         # Сохраняем информацию о бесплатных постах
         await state.update_data(is_free_post=True)
     else:
-        # Получаем статистику использования для подписанных пользователей
-        usage_stats = await get_user_usage_stats(session, user.id)
-        if usage_stats and usage_stats.posts_used >= subscription.plan.posts_limit:
+        # Лимит постов по подписке
+        if not limits.can_create_post:
             await callback.message.answer(
                 i18n.get("post.add.limit_exceeded", "❌ Достигнут лимит постов по вашей подписке. Обновите план для создания новых постов.")
             )
@@ -109,10 +105,11 @@ async def process_account_selection(callback: CallbackQuery, state: FSMContext,
     is_free_post = data.get("is_free_post", False)
     
     if is_free_post:
-        from bot.services.crud.user import get_free_posts_info
-        free_posts_info = await get_free_posts_info(session, user.id)
+        from bot.services.entitlements import get_limit_state
+        limits = await get_limit_state(session, user.id)
+        remaining = limits.free_posts_remaining if limits else 0
         
-        text = i18n.get("post.add.free_posts_available", "🎁 У вас есть {remaining} бесплатных постов!").format(remaining=free_posts_info['remaining'])
+        text = i18n.get("post.add.free_posts_available", "🎁 У вас есть {remaining} бесплатных постов!").format(remaining=remaining)
         text += "\n\n" + i18n.get("post.add.choose_creation_method", "🎯 Выберите способ создания поста:")
         
         from bot.keyboards.inline.posts import get_post_creation_method_keyboard
@@ -362,109 +359,19 @@ async def process_topic(message: Message, state: FSMContext, session, user, i18n
     )
     
     try:
-        # Получаем параметры из выбранных пользователем настроек
-        theme = data.get("theme", "общая тематика")
-        style = data.get("writing_style", "friendly")
-        language = data.get("post_language", "ru")
-        content_length = data.get("content_length", "medium")
-        
-        # Проверяем тип подписки пользователя
-        from bot.services.crud.subscription import get_active_subscription
-        active_subscription = await get_active_subscription(session, user.id)
-        
-        # Определяем, является ли пользователь премиум (с активной подпиской)
-        is_premium = active_subscription is not None
-        
-        # Генерируем контент через AI с учетом типа подписки и выбранного шаблона
-        ai_service = OpenAIService()
-        # Достаем выбранный шаблон и заметки
-        prompt_template_text = None
-        if data.get("prompt_template_id"):
-            from bot.services.crud.prompt_template import get_prompt_template_by_id
-            tpl = await get_prompt_template_by_id(session, data["prompt_template_id"])
-            prompt_template_text = tpl.template_text if tpl else None
-        user_notes = data.get("user_notes")
-        temperature = float(data.get("generation_temperature", 0.7))
-        generated_content = await ai_service.generate_post_content(
-            topic=topic,
-            theme=theme,
-            style=style,
-            language=language,
-            content_length=content_length,
-            max_length=3000,
-            is_premium=is_premium,
-            prompt_template=prompt_template_text,
-            user_notes=user_notes,
-            temperature=temperature
+        params, is_premium, priority = await _collect_generation_params(data, session, user, topic)
+        # Генерация уходит в фоновую очередь — хендлер сразу завершается и освобождает сессию БД
+        await _enqueue_generation(
+            loading_msg, state, i18n, params, is_premium,
+            title_default='AI сгенерировал контент',
+            error_default='❌ Ошибка генерации. Попробуйте еще раз или измените параметры.',
+            priority=priority
         )
-        
-        await loading_msg.delete()
-        
-        if generated_content:
-            # Определяем модель для отображения
-            model_name = i18n.get("post.add.ai_model_gpt4", "GPT-4") if is_premium else i18n.get("post.add.ai_model_gpt35", "GPT-3.5 Turbo")
-            
-            # Показываем сгенерированный контент с возможностью редактирования
-            preview_text = (
-                f"🤖 <b>{i18n.get('post.add.ai_generated', 'AI сгенерировал контент')}</b>\n\n"
-                f"{i18n.get('post.add.ai_model', '🧠 Модель: {model}').format(model=model_name)}\n"
-                f"📂 <b>{i18n.get('workflow.field.theme', 'Тематика')}:</b> {theme}\n"
-                f"✨ <b>{i18n.get('workflow.field.style', 'Стиль')}:</b> {style}\n"
-                f"📏 <b>{i18n.get('workflow.field.length', 'Длина')}:</b> {content_length}\n"
-                f"🎯 <b>{i18n.get('post.add.topic_label', 'Тема')}:</b> {topic}\n\n"
-                f"📄 <b>{i18n.get('post.add.generated_content', 'Сгенерированный контент')}:</b>\n\n{generated_content}"
-            )
-            
-            from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton
-            keyboard = InlineKeyboardMarkup(inline_keyboard=[
-                [
-                    InlineKeyboardButton(
-                        text=i18n.get("post.add.use_content", "✅ Использовать"),
-                        callback_data="post:add:use_ai"
-                    ),
-                    InlineKeyboardButton(
-                        text=i18n.get("post.add.regenerate", "🔄 Перегенерировать"),
-                        callback_data="post:add:regenerate"
-                    )
-                ],
-                [
-                    InlineKeyboardButton(
-                        text=i18n.get("post.add.edit_content", "✏️ Редактировать"),
-                        callback_data="post:add:edit_content"
-                    )
-                ],
-                [
-                    InlineKeyboardButton(
-                        text=i18n.get("common.back", "⬅️ Назад"),
-                        callback_data="posts:back"
-                    )
-                ]
-            ])
-            
-            msg = await message.answer(preview_text, reply_markup=keyboard, parse_mode="HTML")
-            await state.update_data(
-                generated_content=generated_content,
-                prev_msg_id=msg.message_id
-            )
-            await state.set_state(AddPostStates.confirming_post)
-            
-        else:
-            await message.answer(
-                i18n.get("post.add.ai_error", "❌ Ошибка генерации. Попробуйте еще раз или измените параметры."),
-                reply_markup=InlineKeyboardMarkup(inline_keyboard=[[
-                    InlineKeyboardButton(text=i18n.get("common.back", "⬅️ Назад"), callback_data="posts:back")
-                ]])
-            )
-            await state.clear()
     except Exception as e:
-        await loading_msg.delete()
-        await message.answer(
-            i18n.get("post.add.ai_error", "❌ Ошибка генерации. Попробуйте еще раз или измените параметры."),
-            reply_markup=InlineKeyboardMarkup(inline_keyboard=[[
-                InlineKeyboardButton(text=i18n.get("common.back", "⬅️ Назад"), callback_data="posts:back")
-            ]])
+        await _show_generation_error(
+            loading_msg, state, i18n,
+            '❌ Ошибка генерации. Попробуйте еще раз или измените параметры.'
         )
-        await state.clear()
 
 
 async def process_manual_topic(message: Message, state: FSMContext, i18n, **_):
@@ -524,6 +431,15 @@ async def process_regenerate_content(callback: CallbackQuery, state: FSMContext,
         await state.clear()
         return
     
+    if pending := data.get("pending_variants"):
+        # Следующий вариант пришёл вместе с предыдущим — показываем его без запроса к API
+        await state.update_data(pending_variants=pending[1:])
+        await _show_generated_preview(
+            callback.message, state, i18n, data["variant_params"], pending[0],
+            data.get("variant_is_premium", False), 'AI сгенерировал новый контент'
+        )
+        return
+    
     try:
         if msg_id := data.get("prev_msg_id"):
             await callback.bot.delete_message(callback.message.chat.id, msg_id)
@@ -537,109 +453,181 @@ async def process_regenerate_content(callback: CallbackQuery, state: FSMContext,
     )
     
     try:
-        # Получаем параметры из выбранных пользователем настроек
-        theme = data.get("theme", "общая тематика")
-        style = data.get("writing_style", "friendly")
-        language = data.get("post_language", "ru")
-        content_length = data.get("content_length", "medium")
-        
-        # Проверяем тип подписки пользователя
-        from bot.services.crud.subscription import get_active_subscription
-        active_subscription = await get_active_subscription(session, user.id)
-        
-        # Определяем, является ли пользователь премиум (с активной подпиской)
-        is_premium = active_subscription is not None
-        
-        # Генерируем новый контент через AI
-        ai_service = OpenAIService()
-        prompt_template_text = None
-        if data.get("prompt_template_id"):
-            from bot.services.crud.prompt_template import get_prompt_template_by_id
-            tpl = await get_prompt_template_by_id(session, data["prompt_template_id"])
-            prompt_template_text = tpl.template_text if tpl else None
-        user_notes = data.get("user_notes")
-        temperature = float(data.get("generation_temperature", 0.7))
-        generated_content = await ai_service.generate_post_content(
-            topic=topic,
-            theme=theme,
-            style=style,
-            language=language,
-            content_length=content_length,
-            max_length=3000,
-            is_premium=is_premium,
-            prompt_template=prompt_template_text,
-            user_notes=user_notes,
-            temperature=temperature
+        params, is_premium, priority = await _collect_generation_params(data, session, user, topic)
+        # Перегенерация должна дать новый текст, а не тот же ответ из кэша
+        params["use_cache"] = False
+        await _enqueue_generation(
+            loading_msg, state, i18n, params, is_premium,
+            title_default='AI сгенерировал новый контент',
+            error_default='❌ Ошибка генерации. Попробуйте еще раз.',
+            variants=config.AI_REGENERATE_VARIANTS,
+            priority=priority
         )
-        
-        await loading_msg.delete()
-        
-        if generated_content:
-            # Определяем модель для отображения
-            model_name = i18n.get("post.add.ai_model_gpt4", "GPT-4") if is_premium else i18n.get("post.add.ai_model_gpt35", "GPT-3.5 Turbo")
-            
-            # Показываем новый сгенерированный контент
-            preview_text = (
-                f"🤖 <b>{i18n.get('post.add.ai_generated', 'AI сгенерировал новый контент')}</b>\n\n"
-                f"{i18n.get('post.add.ai_model', '🧠 Модель: {model}').format(model=model_name)}\n"
-                f"📂 <b>{i18n.get('workflow.field.theme', 'Тематика')}:</b> {theme}\n"
-                f"✨ <b>{i18n.get('workflow.field.style', 'Стиль')}:</b> {style}\n"
-                f"📏 <b>{i18n.get('workflow.field.length', 'Длина')}:</b> {content_length}\n"
-                f"🎯 <b>{i18n.get('post.add.topic_label', 'Тема')}:</b> {topic}\n\n"
-                f"📄 <b>{i18n.get('post.add.generated_content', 'Сгенерированный контент')}:</b>\n\n{generated_content}"
+    except Exception as e:
+        await _show_generation_error(loading_msg, state, i18n, '❌ Ошибка генерации. Попробуйте еще раз.')
+
+
+async def process_generating_wait(message: Message, i18n, **_):
+    """Сообщения во время фоновой генерации — просим подождать"""
+    await message.answer(f"⏳ {i18n.get('post.add.please_wait', 'Пожалуйста, подождите несколько секунд.')}")
+
+
+async def _collect_generation_params(data: dict, session, user, topic: str) -> tuple[dict, bool, int]:
+    """Собирает параметры генерации из FSM и БД (до постановки задачи в очередь)"""
+    # Получаем параметры из выбранных пользователем настроек
+    theme = data.get("theme", "общая тематика")
+    style = data.get("writing_style", "friendly")
+    language = data.get("post_language", "ru")
+    content_length = data.get("content_length", "medium")
+    
+    # Определяем, является ли пользователь премиум (с активной подпиской)
+    from bot.services.entitlements import get_limit_state
+    limits = await get_limit_state(session, user.id)
+    is_premium = bool(limits and limits.has_subscription)
+    # Планы с ai_priority обслуживаются очередью генерации в первую очередь
+    priority = PRIORITY_PREMIUM if limits and limits.ai_priority else PRIORITY_INTERACTIVE
+    
+    # Достаем выбранный шаблон и заметки
+    prompt_template_text = None
+    if data.get("prompt_template_id"):
+        from bot.services.crud.prompt_template import get_prompt_template_by_id
+        tpl = await get_prompt_template_by_id(session, data["prompt_template_id"])
+        prompt_template_text = tpl.template_text if tpl else None
+    user_notes = data.get("user_notes")
+    temperature = float(data.get("generation_temperature", 0.7))
+    
+    params = dict(
+        topic=topic,
+        theme=theme,
+        style=style,
+        language=language,
+        content_length=content_length,
+        max_length=3000,
+        is_premium=is_premium,
+        prompt_template=prompt_template_text,
+        user_notes=user_notes,
+        temperature=temperature
+    )
+    return params, is_premium, priority
+
+
+def _build_ai_preview(i18n, params: dict, generated_content: str, is_premium: bool, title_default: str):
+    """Текст и клавиатура превью сгенерированного контента"""
+    from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton
+    
+    # Определяем модель для отображения
+    model_name = i18n.get("post.add.ai_model_gpt4", "GPT-4") if is_premium else i18n.get("post.add.ai_model_gpt35", "GPT-3.5 Turbo")
+    
+    preview_text = (
+        f"🤖 <b>{i18n.get('post.add.ai_generated', title_default)}</b>\n\n"
+        f"{i18n.get('post.add.ai_model', '🧠 Модель: {model}').format(model=model_name)}\n"
+        f"📂 <b>{i18n.get('workflow.field.theme', 'Тематика')}:</b> {params['theme']}\n"
+        f"✨ <b>{i18n.get('workflow.field.style', 'Стиль')}:</b> {params['style']}\n"
+        f"📏 <b>{i18n.get('workflow.field.length', 'Длина')}:</b> {params['content_length']}\n"
+        f"🎯 <b>{i18n.get('post.add.topic_label', 'Тема')}:</b> {params['topic']}\n\n"
+        f"📄 <b>{i18n.get('post.add.generated_content', 'Сгенерированный контент')}:</b>\n\n{generated_content}"
+    )
+    
+    keyboard = InlineKeyboardMarkup(inline_keyboard=[
+        [
+            InlineKeyboardButton(
+                text=i18n.get("post.add.use_content", "✅ Использовать"),
+                callback_data="post:add:use_ai"
+            ),
+            InlineKeyboardButton(
+                text=i18n.get("post.add.regenerate", "🔄 Перегенерировать"),
+                callback_data="post:add:regenerate"
             )
-            
-            from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton
-            keyboard = InlineKeyboardMarkup(inline_keyboard=[
-                [
-                    InlineKeyboardButton(
-                        text=i18n.get("post.add.use_content", "✅ Использовать"),
-                        callback_data="post:add:use_ai"
-                    ),
-                    InlineKeyboardButton(
-                        text=i18n.get("post.add.regenerate", "🔄 Перегенерировать"),
-                        callback_data="post:add:regenerate"
-                    )
-                ],
-                [
-                    InlineKeyboardButton(
-                        text=i18n.get("post.add.edit_content", "✏️ Редактировать"),
-                        callback_data="post:add:edit_content"
-                    )
-                ],
-                [
-                    InlineKeyboardButton(
-                        text=i18n.get("common.back", "⬅️ Назад"),
-                        callback_data="posts:back"
-                    )
-                ]
-            ])
-            
-            msg = await callback.message.answer(preview_text, reply_markup=keyboard, parse_mode="HTML")
-            await state.update_data(
-                generated_content=generated_content,
-                prev_msg_id=msg.message_id
+        ],
+        [
+            InlineKeyboardButton(
+                text=i18n.get("post.add.edit_content", "✏️ Редактировать"),
+                callback_data="post:add:edit_content"
             )
-            await state.set_state(AddPostStates.confirming_post)
-            
-        else:
-            await callback.message.answer(
-                i18n.get("post.add.ai_error", "❌ Ошибка генерации. Попробуйте еще раз."),
-                reply_markup=InlineKeyboardMarkup(inline_keyboard=[[
-                    InlineKeyboardButton(text=i18n.get("common.back", "⬅️ Назад"), callback_data="posts:back")
-                ]])
+        ],
+        [
+            InlineKeyboardButton(
+                text=i18n.get("common.back", "⬅️ Назад"),
+                callback_data="posts:back"
             )
-            await state.clear()
-            
-    except Exception as e:
-        await loading_msg.delete()
-        await callback.message.answer(
-            i18n.get("post.add.ai_error", "❌ Ошибка генерации. Попробуйте еще раз."),
-            reply_markup=InlineKeyboardMarkup(inline_keyboard=[[
-                InlineKeyboardButton(text=i18n.get("common.back", "⬅️ Назад"), callback_data="posts:back")
-            ]])
+        ]
+    ])
+    return preview_text, keyboard
+
+
+async def _show_generation_error(loading_msg: Message, state: FSMContext, i18n, error_default: str):
+    """Показывает ошибку генерации вместо сообщения о загрузке и сбрасывает мастер"""
+    from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton
+    keyboard = InlineKeyboardMarkup(inline_keyboard=[[
+        InlineKeyboardButton(text=i18n.get("common.back", "⬅️ Назад"), callback_data="posts:back")
+    ]])
+    text = i18n.get("post.add.ai_error", error_default)
+    try:
+        await loading_msg.edit_text(text, reply_markup=keyboard)
+    except Exception:
+        await loading_msg.answer(text, reply_markup=keyboard)
+    await state.clear()
+
+
+# Промежуточное превью короче лимита сообщения Telegram (4096) с запасом на заголовок
+STREAM_PREVIEW_LIMIT = 3800
+
+
+async def _show_generated_preview(loading_msg: Message, state: FSMContext, i18n, params: dict,
+                                  generated_content: str, is_premium: bool, title_default: str):
+    """Заменяет сообщение о загрузке превью контента и переводит мастер к подтверждению"""
+    preview_text, keyboard = _build_ai_preview(i18n, params, generated_content, is_premium, title_default)
+    try:
+        msg = await loading_msg.edit_text(preview_text, reply_markup=keyboard, parse_mode="HTML")
+    except Exception:
+        try:
+            await loading_msg.delete()
+        except Exception:
+            pass
+        msg = await loading_msg.answer(preview_text, reply_markup=keyboard, parse_mode="HTML")
+    message_id = msg.message_id if isinstance(msg, Message) else loading_msg.message_id
+    await state.update_data(
+        generated_content=generated_content,
+        prev_msg_id=message_id
+    )
+    await state.set_state(AddPostStates.confirming_post)
+
+
+async def _enqueue_generation(loading_msg: Message, state: FSMContext, i18n, params: dict, is_premium: bool,
+                              title_default: str, error_default: str, variants: int = 1,
+                              priority: int = PRIORITY_INTERACTIVE):
+    """Ставит генерацию в фоновую очередь; результат заменит сообщение о загрузке"""
+    editor = None
+    if config.AI_STREAMING_ENABLED:
+        # Текст появляется в сообщении о загрузке по мере генерации
+        header = f"🤖 {i18n.get('post.add.generating', 'Генерирую контент...')}\n\n"
+        editor = ProgressiveEditor(loading_msg, lambda text: header + text[:STREAM_PREVIEW_LIMIT] + " ▌")
+    
+    async def on_done(generated_content):
+        if editor:
+            editor.close()
+        # При variants > 1 приходит список: первый показываем, остальные сохраняем для «Перегенерировать»
+        pending = []
+        if isinstance(generated_content, list):
+            generated_content, pending = generated_content[0], generated_content[1:]
+        if not generated_content:
+            await _show_generation_error(loading_msg, state, i18n, error_default)
+            return
+        
+        # Новая генерация заменяет варианты, оставшиеся от прежних параметров
+        await state.update_data(
+            pending_variants=pending,
+            variant_params={key: params[key] for key in ("topic", "theme", "style", "content_length")},
+            variant_is_premium=is_premium
         )
-        await state.clear()
+        # Показываем сгенерированный контент с возможностью редактирования
+        await _show_generated_preview(loading_msg, state, i18n, params, generated_content, is_premium, title_default)
+    
+    await state.set_state(AddPostStates.generating)
+    await generation_queue.submit(GenerationJob(
+        params=params, on_done=on_done, on_partial=editor.update if editor else None,
+        variants=variants, priority=priority
+    ))
 
 
 async def process_edit_content(callback: CallbackQuery, state: FSMContext, i18n, **_):
@@ -793,13 +781,36 @@ async def create_post_from_content(content: str, callback_or_message, state: FSM
                 "manual_topic": data.get("manual_topic"),  # Ручно заданная тема
             })
         
+        # Списываем пост из лимита атомарно: параллельные запросы не превысят квоту
+        from bot.services.entitlements import get_limit_state, consume_post, refund_post
+        limits = await get_limit_state(session, user.id)
+        if not limits or not await consume_post(session, limits, is_manual=is_manual):
+            await message_handler.answer(
+                i18n.get("post.add.limit_exceeded", "❌ Достигнут лимит постов по вашей подписке. Обновите план для создания новых постов.")
+            )
+            await state.clear()
+            return
+        
         # Создаем пост
-        if is_manual:
-            from bot.services.crud.post import create_manual_post
-            post = await create_manual_post(session, **post_kwargs)
-        else:
-            from bot.services.crud.post import create_automatic_post
-            post = await create_automatic_post(session, **post_kwargs)
+        post = None
+        try:
+            if is_manual:
+                from bot.services.crud.post import create_manual_post
+                post = await create_manual_post(session, **post_kwargs)
+            else:
+                from bot.services.crud.post import create_automatic_post
+                post = await create_automatic_post(session, **post_kwargs)
+        finally:
+            if post is None:
+                # Пост не создан — возвращаем списанный лимит
+                await session.rollback()
+                await refund_post(session, limits, is_manual=is_manual)
+        if post is None:
+            await message_handler.answer(
+                i18n.get("post.add.error", "❌ Ошибка создания поста. Попробуйте позже.")
+            )
+            await state.clear()
+            return
         
         # Обновляем статистику использования
         if post:
@@ -807,10 +818,8 @@ async def create_post_from_content(content: str, callback_or_message, state: FSM
             is_free_post = data.get("is_free_post", False)
             
             if is_free_post:
-                # Увеличиваем счетчик бесплатных постов
-                from bot.services.crud.user import increment_free_posts_used, get_free_posts_remaining
-                await increment_free_posts_used(session, user.id)
-                remaining = await get_free_posts_remaining(session, user.id)
+                # Бесплатный пост уже списан перед созданием
+                remaining = limits.free_posts_remaining
                 
                 # Показываем сообщение о бесплатном посте
                 post_type = "ручной" if is_manual else "автоматический"
@@ -986,6 +995,7 @@ def register_add_post_handlers(router: Router):
     router.callback_query.register(process_use_edited_content, F.data == "post:add:use_edited")
     router.callback_query.register(process_publish_time, F.data.startswith("time:"))
     router.message.register(process_topic, AddPostStates.entering_topic)
+    router.message.register(process_generating_wait, AddPostStates.generating)
     router.message.register(process_manual_topic, AddPostStates.entering_manual_topic)
     router.message.register(process_edited_content, AddPostStates.editing_content)
     router.message.register(process_custom_theme, AddPostStates.entering_custom_theme) 
\ No newline at end of file
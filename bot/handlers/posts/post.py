@@ -8,7 +8,10 @@ from bot.services.crud.post import (
     get_post_by_id, 
     get_posts_by_status, 
     delete_post as crud_delete_post,
-    update_post as crud_update_post
+    update_post as crud_update_post,
+    get_user_posts_page,
+    count_user_posts_by_status,
+    encode_posts_cursor,
 )
 from bot.services.publishing import PublishingService
 from bot.models.models import Post, UserWorkflow
@@ -16,84 +19,64 @@ from bot.models.models import Post, UserWorkflow
 router = Router()
 
 
-async def get_posts_by_user_id(session, user_id: int, status_filter: str = None) -> list[Post]:
-    """Получение постов пользователя с опциональной фильтрацией по статусу.
-    Для совместимости с постами без user_workflow_id дополнительно фильтруем по SocialAccount.user_id.
-    """
-    from bot.models.models import SocialAccount
-    query = (
-        select(Post)
-        .outerjoin(UserWorkflow, Post.user_workflow_id == UserWorkflow.id)
-        .outerjoin(SocialAccount, Post.social_account_id == SocialAccount.id)
-        .where(
-            (UserWorkflow.user_id == user_id) | (SocialAccount.user_id == user_id)
-        )
-    )
-    
-    if status_filter and status_filter != "all":
-        query = query.where(Post.status == status_filter)
-    
-    query = query.order_by(Post.created_at.desc())
-    result = await session.execute(query)
-    return result.scalars().all()
-
-
-def format_posts_stats_text(posts, i18n):
-    counts = {"pending": 0, "scheduled": 0, "published": 0, "failed": 0}
-    for p in posts:
-        if p.status in counts:
-            counts[p.status] += 1
+def format_posts_stats_text(counts: dict[str, int], i18n):
     lines = []
-    if counts["pending"]:
+    if counts.get("pending"):
         lines.append(i18n.get("post.stats.pending", "⏳ Ожидание: {count}").format(count=counts["pending"]))
-    if counts["scheduled"]:
+    if counts.get("scheduled"):
         lines.append(i18n.get("post.stats.scheduled", "📅 Запланированы: {count}").format(count=counts["scheduled"]))
-    if counts["published"]:
+    if counts.get("published"):
         lines.append(i18n.get("post.stats.published", "✅ Опубликованы: {count}").format(count=counts["published"]))
-    if counts["failed"]:
+    if counts.get("failed"):
         lines.append(i18n.get("post.stats.failed", "❌ Неудачные: {count}").format(count=counts["failed"]))
     return "\n".join(lines)
 
 
-async def posts_handler(message: Message, session, i18n, user, **_):
-    """Главный обработчик постов"""
-    posts = await get_posts_by_user_id(session, user.id)
+async def build_posts_page(session, user_id: int, i18n, cursor: str = None, direction: str = "next"):
+    """Текст и клавиатура страницы постов: счётчики — одним GROUP BY, список — по курсору"""
+    counts = await count_user_posts_by_status(session, user_id)
+    if not sum(counts.values()):
+        return i18n.get("posts.none", "📝 У вас пока нет постов."), get_posts_keyboard(i18n, [])
 
-    if not posts:
-        await message.answer(
-            i18n.get("posts.none", "📝 У вас пока нет постов."),
-            reply_markup=get_posts_keyboard(i18n, [])
-        )
-        return
+    posts, has_more = await get_user_posts_page(session, user_id, cursor=cursor, direction=direction)
+    if not posts and cursor:
+        # Курсор устарел (посты удалили) — показываем первую страницу
+        return await build_posts_page(session, user_id, i18n)
 
-    text = format_posts_stats_text(posts, i18n)
+    prev_cursor = next_cursor = None
+    if posts:
+        first, last = posts[0], posts[-1]
+        # Со стороны, откуда пришли, страницы точно есть; в направлении движения — если has_more
+        has_newer = (has_more if direction == "prev" else cursor is not None)
+        has_older = (has_more if direction == "next" else True)
+        if has_newer:
+            prev_cursor = encode_posts_cursor(first.created_at, first.id)
+        if has_older:
+            next_cursor = encode_posts_cursor(last.created_at, last.id)
 
-    await message.answer(
-        text,
-        reply_markup=get_posts_keyboard(i18n, posts[:10]),  # Показываем первые 10
-        parse_mode="HTML"
-    )
+    text = format_posts_stats_text(counts, i18n)
+    return text, get_posts_keyboard(i18n, posts, prev_cursor=prev_cursor, next_cursor=next_cursor)
+
+
+async def posts_handler(message: Message, session, i18n, user, **_):
+    """Главный обработчик постов"""
+    text, keyboard = await build_posts_page(session, user.id, i18n)
+    await message.answer(text, reply_markup=keyboard, parse_mode="HTML")
 
 
 async def posts_back_handler(callback: CallbackQuery, session, i18n, user, **_):
     """Возврат к списку постов"""
     await callback.answer()
-    posts = await get_posts_by_user_id(session, user.id)
+    text, keyboard = await build_posts_page(session, user.id, i18n)
+    await callback.message.edit_text(text, reply_markup=keyboard, parse_mode="HTML")
 
-    if not posts:
-        await callback.message.edit_text(
-            i18n.get("posts.none", "📝 У вас пока нет постов."),
-            reply_markup=get_posts_keyboard(i18n, [])
-        )
-        return
-
-    text = format_posts_stats_text(posts, i18n)
 
-    await callback.message.edit_text(
-        text,
-        reply_markup=get_posts_keyboard(i18n, posts[:10]),
-        parse_mode="HTML"
-    )
+async def posts_page_handler(callback: CallbackQuery, session, i18n, user, **_):
+    """Переключение страницы списка постов"""
+    await callback.answer()
+    _, _, direction, cursor = callback.data.split(":", 3)
+    text, keyboard = await build_posts_page(session, user.id, i18n, cursor=cursor, direction=direction)
+    await callback.message.edit_text(text, reply_markup=keyboard, parse_mode="HTML")
 
 
 async def view_post_handler(callback: CallbackQuery, session, user, i18n, **_):
@@ -212,26 +195,26 @@ async def publish_post_handler(callback: CallbackQuery, session, i18n, user, **_
         await callback.message.answer(i18n.get("post.access_denied", "❌ Доступ запрещен."))
         return
 
-    # Используем сервис публикации
+    # Публикуем сразу, не ставя пост в очередь планировщика: иначе его одновременно
+    # забрали бы обработчик и PublishingScheduler. publish_post сам захватывает пост,
+    # а при временной ошибке переносит его (scheduled) на повторную попытку
+    await crud_update_post(session, post_id, moderated=True)
     publishing_service = PublishingService(callback.bot)
-    
-    # Планируем пост к публикации
-    scheduled = await publishing_service.schedule_post_for_publishing(session, post_id)
-    
-    if scheduled:
-        # Сразу пытаемся опубликовать
-        published = await publishing_service.publish_post(session, post_id)
-        
-        if published:
-            await callback.message.edit_text(
-                i18n.get("post.published_successfully", "✅ Пост успешно опубликован!"),
-                reply_markup=get_post_actions_keyboard(post_id, i18n, "published")
-            )
-        else:
-            await callback.message.edit_text(
-                i18n.get("post.scheduled", "✅ Пост запланирован к публикации."),
-                reply_markup=get_post_actions_keyboard(post_id, i18n, "scheduled")
-            )
+    published = await publishing_service.publish_post(session, post_id)
+
+    if published:
+        await callback.message.edit_text(
+            i18n.get("post.published_successfully", "✅ Пост успешно опубликован!"),
+            reply_markup=get_post_actions_keyboard(post_id, i18n, "published")
+        )
+        return
+
+    await session.refresh(post)
+    if post.status in ("scheduled", "publishing"):
+        await callback.message.edit_text(
+            i18n.get("post.scheduled", "✅ Пост запланирован к публикации."),
+            reply_markup=get_post_actions_keyboard(post_id, i18n, "scheduled")
+        )
     else:
         await callback.message.answer(i18n.get("post.publish_error", "❌ Ошибка планирования поста."))
 
@@ -310,6 +293,7 @@ def register_posts_handler(router: Router):
     router.message.register(posts_handler, F.text.lower().contains("пост"))
     
     router.callback_query.register(posts_back_handler, F.data == "posts:back")
+    router.callback_query.register(posts_page_handler, F.data.startswith("posts:page:"))
     router.callback_query.register(view_post_handler, F.data.startswith("post:view:"))
     router.callback_query.register(delete_post_handler, F.data.startswith("post:delete:"))
     router.callback_query.register(publish_post_handler, F.data.startswith("post:publish:"))
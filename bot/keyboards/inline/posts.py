@@ -3,8 +3,10 @@ from aiogram.utils.keyboard import InlineKeyboardBuilder
 from bot.models.models import Post
 from aiogram.utils.keyboard import InlineKeyboardBuilder
 
-def get_posts_keyboard(i18n: dict, posts: list[Post]) -> InlineKeyboardMarkup:
-    """Клавиатура со списком постов"""
+def get_posts_keyboard(
+    i18n: dict, posts: list[Post], prev_cursor: str = None, next_cursor: str = None
+) -> InlineKeyboardMarkup:
+    """Клавиатура со списком постов (с переключением страниц, если курсоры переданы)"""
     keyboard = []
 
     for post in posts:
@@ -22,6 +24,21 @@ def get_posts_keyboard(i18n: dict, posts: list[Post]) -> InlineKeyboardMarkup:
         )
         keyboard.append([button])
 
+    # Навигация по страницам
+    navigation = []
+    if prev_cursor:
+        navigation.append(InlineKeyboardButton(
+            text=i18n.get("posts.page.prev", "⬅️ Новее"),
+            callback_data=f"posts:page:prev:{prev_cursor}"
+        ))
+    if next_cursor:
+        navigation.append(InlineKeyboardButton(
+            text=i18n.get("posts.page.next", "Старее ➡️"),
+            callback_data=f"posts:page:next:{next_cursor}"
+        ))
+    if navigation:
+        keyboard.append(navigation)
+
     # Кнопки управления
     keyboard.append([
         InlineKeyboardButton(
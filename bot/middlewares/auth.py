@@ -3,10 +3,8 @@ from aiogram.types import Message, Update, CallbackQuery
 from typing import Callable, Awaitable, Dict, Any
 from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
-from redis.asyncio.client import Redis
-from bot.config import CACHE_TTL
 from bot.models.models import User
-import json
+from bot.services.cache.user_cache import user_cache, user_to_cache, cache_to_user_kwargs
 
 class AuthMiddleware(BaseMiddleware):
     def __init__(self, force_auth: bool = False):
@@ -19,7 +17,6 @@ class AuthMiddleware(BaseMiddleware):
         data: Dict[str, Any]
     ) -> Any:
         session: AsyncSession = data.get("session")
-        redis: Redis = data.get("redis")
         user_id: int | None = None
 
         # Получаем telegram_id из разных типов событий
@@ -36,41 +33,21 @@ class AuthMiddleware(BaseMiddleware):
         if not user_id or not session:
             return await handler(event, data)
 
-        # Пытаемся достать пользователя из Redis
+        # Сначала кэш: память процесса, затем Redis
         user: User | None = None
-        if redis:
-            raw = await redis.get(f"user:{user_id}")
-            if raw:
-                try:
-                    user_data = json.loads(raw)
-                    user = User(**user_data)
-                except Exception:
-                    pass  # Кеш повреждён, идём в базу
+        cached, version = await user_cache.get(user_id)
+        if cached:
+            try:
+                user = User(**cache_to_user_kwargs(cached))
+            except Exception:
+                pass  # Кеш повреждён, идём в базу
 
         # Если не нашли — берём из базы и обновляем кеш
         if not user:
             result = await session.execute(select(User).where(User.telegram_id == user_id))
             user = result.scalar_one_or_none()
-            if user and redis:
-                try:
-                    # Простой сериализуемый словарь, без relationships
-                    payload = {
-                        "id": user.id,
-                        "telegram_id": user.telegram_id,
-                        "name": user.name,
-                        "username": user.username,
-                        "language": user.language,
-                        "role": user.role,
-                        # Храним только примитивы: используем referred_by_id вместо relationship
-                        "referred_by_id": user.referred_by_id,
-                        "referral_code": user.referral_code,
-                        "cash": float(user.cash) if user.cash else 0.0,
-                        "free_posts_used": user.free_posts_used,
-                        "free_posts_limit": user.free_posts_limit,
-                    }
-                    await redis.set(f"user:{user_id}", json.dumps(payload), ex=CACHE_TTL)
-                except Exception:
-                    pass  # Redis временно недоступен — не страшно
+            if user:
+                await user_cache.set(user_id, user_to_cache(user), version)
 
         # Если не найден, но авторизация обязательна — игнорируем
         if not user and self.force_auth:
@@ -2,8 +2,58 @@ from aiogram import BaseMiddleware
 from db.connection import AsyncSessionLocal
 from typing import Callable, Awaitable, Dict, Any
 from aiogram.types import Update
+from sqlalchemy import event
 from sqlalchemy.ext.asyncio import AsyncSession
 
+
+class LazySession:
+    """
+    Прокси AsyncSession: сессия создаётся при первом обращении хендлера к БД.
+    Обновления, которые работают только с FSM или клавиатурами, не трогают пул соединений.
+    """
+
+    __slots__ = ("_factory", "_session", "_has_writes")
+
+    def __init__(self, factory=AsyncSessionLocal):
+        self._factory = factory
+        self._session: AsyncSession | None = None
+        self._has_writes = False
+
+    @property
+    def started(self) -> bool:
+        return self._session is not None
+
+    def _get(self) -> AsyncSession:
+        if self._session is None:
+            self._session = self._factory()
+            # После autoflush session.new/dirty/deleted пусты, хотя изменения ещё не закоммичены:
+            # факт записи фиксируем по событию flush
+            event.listen(self._session.sync_session, "after_flush", self._on_flush)
+        return self._session
+
+    def _on_flush(self, *_):
+        self._has_writes = True
+
+    def __getattr__(self, name):
+        return getattr(self._get(), name)
+
+    async def execute(self, statement, *args, **kwargs):
+        # UPDATE/INSERT/DELETE и text() не попадают в session.dirty — запоминаем их отдельно
+        if not getattr(statement, "is_select", False):
+            self._has_writes = True
+        return await self._get().execute(statement, *args, **kwargs)
+
+    def has_pending_changes(self) -> bool:
+        session = self._session
+        if session is None:
+            return False
+        return self._has_writes or bool(session.new or session.dirty or session.deleted)
+
+    async def close(self):
+        if self._session is not None:
+            await self._session.close()
+
+
 class DatabaseSessionMiddleware(BaseMiddleware):
     async def __call__(
         self,
@@ -11,12 +61,17 @@ class DatabaseSessionMiddleware(BaseMiddleware):
         event: Update,
         data: Dict[str, Any]
     ) -> Any:
-        async with AsyncSessionLocal() as session:
-            try:
-                data['session'] = session
-                response = await handler(event, data)
-                await session.commit()  # Явный коммит после успешного хендлера
-                return response
-            except Exception as e:
+        session = LazySession()
+        data['session'] = session
+        try:
+            response = await handler(event, data)
+            # Коммитим только если хендлер что-то изменил; чтение просто отпускает соединение
+            if session.has_pending_changes():
+                await session.commit()
+            return response
+        except Exception as e:
+            if session.started:
                 await session.rollback()  # Откат при ошибке
-                raise
+            raise
+        finally:
+            await session.close()
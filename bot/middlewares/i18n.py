@@ -1,32 +1,21 @@
 from aiogram import BaseMiddleware
 from aiogram.types import Message, Update
 from typing import Any, Callable, Awaitable, Dict
-import os
-import json
 import logging
 
+from bot.utils.i18n import I18nCatalog, Translator, i18n_catalog
+
 logger = logging.getLogger(__name__)
 
 class I18nMiddleware(BaseMiddleware):
-    def __init__(self, default_locale='en'):
+    def __init__(self, default_locale='en', catalog: I18nCatalog = None):
         self.default_locale = default_locale
-        self.locales_path = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'locales'))
-        self.translations = {}
-        self._load_locales()
-
-    def _load_locales(self):
-        if not os.path.exists(self.locales_path):
-            logger.warning(f"Locales folder does not exist: {self.locales_path}")
-            return
-
-        for fname in os.listdir(self.locales_path):
-            if fname.endswith('.json'):
-                lang = fname.split('.')[0]
-                try:
-                    with open(os.path.join(self.locales_path, fname), encoding='utf-8') as f:
-                        self.translations[lang] = json.load(f)
-                except Exception as e:
-                    logger.exception(f"Failed to load translation for {lang}: {e}")
+        # Каталог общий для процесса: переводы уже загружены и не читаются с диска повторно
+        self.catalog = catalog or i18n_catalog
+
+    @property
+    def translations(self) -> dict[str, Translator]:
+        return self.catalog.translators
 
     async def __call__(self, handler: Callable, event: Update, data: Dict[str, Any]) -> Any:
         message: Message = data.get('event_message') or getattr(event, 'message', None)
@@ -39,10 +28,10 @@ class I18nMiddleware(BaseMiddleware):
             user_lang = message.from_user.language_code[:2]
 
         # 3. Или дефолт
-        if user_lang not in self.translations:
+        if user_lang not in self.catalog:
             user_lang = self.default_locale
 
         data['locale'] = user_lang
-        data['i18n'] = self.translations.get(user_lang, {})
+        data['i18n'] = self.catalog.get(user_lang)
 
         return await handler(event, data)
@@ -115,6 +115,8 @@ class UsageStats(Base):
     posts_used = Column(Integer, default=0)
     manual_posts_used = Column(Integer, default=0)
     channels_connected = Column(Integer, default=0)
+    # Денормализованный счётчик активных задач; NULL — ещё не пересчитан из user_workflows
+    active_workflows = Column(Integer, nullable=True)
 
     updated_at = Column(DateTime(timezone=True), default=lambda: datetime.now(timezone.utc),
                         onupdate=lambda: datetime.now(timezone.utc))
@@ -238,6 +240,8 @@ class WorkflowSettings(Base):
     # Служебное
     notifications_enabled = Column(Boolean, default=True)
     last_execution = Column(DateTime(timezone=True), nullable=True, index=True)
+    # Следующий слот запуска: first_post_time + k*interval_hours (индекс для выборки «к исполнению»)
+    next_run_at = Column(DateTime(timezone=True), nullable=True, index=True)
 
     created_at = Column(DateTime(timezone=True), default=lambda: datetime.now(timezone.utc))
     updated_at = Column(DateTime(timezone=True), default=lambda: datetime.now(timezone.utc),
@@ -322,6 +326,10 @@ class Post(Base):
     retry_count = Column(Integer, default=0)
     last_error = Column(Text, nullable=True)
 
+    # Аренда поста экземпляром публикатора (status='publishing')
+    lease_owner = Column(String(100), nullable=True)
+    lease_expires_at = Column(DateTime(timezone=True), nullable=True, index=True)
+
     # Редактирование/модерация
     is_editable = Column(Boolean, default=True)
     moderated = Column(Boolean, default=False)
@@ -352,6 +360,9 @@ class Post(Base):
 # --------------------
 # Статистика постов
 # --------------------
+# Владелец views/likes/reposts определяется площадкой поста: если для неё зарегистрирован
+# источник метрик (StatsCollector), значения абсолютные и целиком принадлежат сборщику.
+# Инкременты (PostStatsBuffer) пишутся только для постов площадок без такого источника.
 class PostStats(Base):
     __tablename__ = 'post_stats'
     id = Column(Integer, primary_key=True, index=True)
@@ -1,3 +1,4 @@
 from .openai_service import OpenAIService
+from .http_client import init_http_session, get_http_session, close_http_session
 
-__all__ = ["OpenAIService"] 
\ No newline at end of file
+__all__ = ["OpenAIService", "init_http_session", "get_http_session", "close_http_session"]
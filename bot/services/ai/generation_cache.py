@@ -0,0 +1,90 @@
+import hashlib
+import json
+import logging
+import re
+import time
+from typing import Optional
+
+from bot import config
+
+logger = logging.getLogger(__name__)
+
+# Отсортированное множество ключей кэша: score — время последнего обращения.
+# По нему вытесняются давно не читанные записи, когда их больше AI_CACHE_MAX_ENTRIES.
+INDEX_KEY = "ai:gen:index"
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+def _entry_key(digest: str) -> str:
+    return f"ai:gen:{digest}"
+
+
+def normalize_prompt(text: str) -> str:
+    """Отступы и переносы в шаблонах промптов не влияют на ответ модели — сворачиваем их"""
+    return _WHITESPACE.sub(" ", text).strip()
+
+
+def generation_cache_key(request: dict) -> str:
+    """Хэш тела запроса к chat/completions: модель, температура, лимит токенов и нормализованные сообщения"""
+    normalized = dict(request)
+    normalized["messages"] = [[m["role"], normalize_prompt(m["content"])] for m in request["messages"]]
+    if "temperature" in normalized:
+        normalized["temperature"] = round(float(normalized["temperature"]), 3)
+    payload = json.dumps(normalized, ensure_ascii=False, sort_keys=True)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+class GenerationCache:
+    """
+    Кэш сгенерированных текстов в Redis, адресуемый хэшем запроса.
+
+    Одинаковые промпты (повторы мастера, ретраи, разные пользователи с одной темой)
+    отдаются из кэша без запроса к OpenAI. Размер ограничен: индекс в ZSET хранит
+    время последнего чтения, при переполнении удаляются самые старые записи.
+    Ошибки Redis не мешают генерации — кэш просто пропускается.
+    """
+
+    def __init__(self, ttl: int = None, max_entries: int = None, redis=None):
+        self.ttl = ttl or config.AI_CACHE_TTL
+        self.max_entries = max_entries or config.AI_CACHE_MAX_ENTRIES
+        self._redis = redis
+
+    async def _get_redis(self):
+        if self._redis is None:
+            from db.connection import get_redis
+            self._redis = await get_redis()
+        return self._redis
+
+    async def get(self, digest: str) -> Optional[str]:
+        try:
+            redis = await self._get_redis()
+            content = await redis.get(_entry_key(digest))
+            if content is not None:
+                await redis.zadd(INDEX_KEY, {digest: time.time()})
+            return content
+        except Exception as e:
+            logger.warning(f"Generation cache unavailable: {e}")
+            return None
+
+    async def set(self, digest: str, content: str):
+        try:
+            redis = await self._get_redis()
+            pipe = redis.pipeline(transaction=False)
+            pipe.set(_entry_key(digest), content, ex=self.ttl)
+            pipe.zadd(INDEX_KEY, {digest: time.time()})
+            pipe.zcard(INDEX_KEY)
+            *_, size = await pipe.execute()
+            if size > self.max_entries:
+                await self._evict(redis, size - self.max_entries)
+        except Exception as e:
+            logger.warning(f"Generation cache write failed: {e}")
+
+    async def _evict(self, redis, count: int):
+        evicted = await redis.zpopmin(INDEX_KEY, count)
+        if evicted:
+            await redis.delete(*[_entry_key(digest) for digest, _ in evicted])
+
+
+# Общий кэш приложения
+generation_cache = GenerationCache()
@@ -0,0 +1,149 @@
+import asyncio
+import itertools
+import logging
+import time
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from bot import config
+from .openai_service import OpenAIService
+
+logger = logging.getLogger(__name__)
+
+
+# Уровни приоритета (меньше — раньше)
+PRIORITY_PREMIUM = 0      # интерактивные запросы планов с ai_priority
+PRIORITY_INTERACTIVE = 1  # интерактивные запросы бесплатных и базовых планов
+PRIORITY_BACKGROUND = 2   # фоновая генерация для workflow
+
+
+@dataclass
+class GenerationJob:
+    """Задача на генерацию контента.
+
+    params  — аргументы для OpenAIService.generate_post_content
+    on_done — корутина, получающая результат (текст или None при ошибке)
+    on_partial — корутина для потоковой генерации, получает накопленный текст
+    variants — сколько вариантов запросить одним вызовом; при variants > 1
+               on_done получает список текстов (или None при ошибке)
+    priority — уровень приоритета (PRIORITY_*)
+    """
+    params: Dict[str, Any]
+    on_done: Callable[[Any], Awaitable[None]]
+    on_partial: Optional[Callable[[str], Awaitable[None]]] = None
+    variants: int = 1
+    priority: int = PRIORITY_INTERACTIVE
+
+
+class GenerationQueue:
+    """Очередь AI-генерации с пулом воркеров.
+
+    Хендлер ставит задачу и сразу завершается (освобождая сессию БД),
+    а долгий запрос к OpenAI выполняет один из воркеров.
+
+    Задачи выбираются по приоритету со старением: ключ = время постановки +
+    priority * aging_seconds. Интерактивные запросы платных планов обгоняют
+    остальные, но задача, прождавшая дольше aging_seconds за каждый уровень
+    разницы, будет взята раньше более приоритетной.
+
+    Фоновых задач в очереди и в работе одновременно не больше background_limit:
+    остальные ждут места в submit (пачка автопостинга не попадает в очередь целиком),
+    а оставшиеся воркеры всегда свободны для интерактивных запросов.
+    """
+
+    def __init__(self, workers: int = None, maxsize: int = None, aging_seconds: float = None,
+                 background_limit: int = None):
+        self.workers = workers or config.AI_GENERATION_WORKERS
+        self.maxsize = maxsize if maxsize is not None else config.AI_GENERATION_QUEUE_SIZE
+        self.aging_seconds = config.AI_PRIORITY_AGING_SECONDS if aging_seconds is None else aging_seconds
+        self.background_limit = background_limit or max(1, self.workers - config.AI_INTERACTIVE_RESERVED_WORKERS)
+        self._background_slots = asyncio.Semaphore(self.background_limit)
+        self._queue: Optional[asyncio.PriorityQueue] = None
+        # Порядковый номер разрешает равные ключи в порядке постановки
+        self._sequence = itertools.count()
+        self._tasks: list[asyncio.Task] = []
+        self._service: Optional[OpenAIService] = None
+
+    @property
+    def is_running(self) -> bool:
+        return bool(self._tasks)
+
+    def start(self):
+        """Запускает воркеры (вызывается при старте бота)"""
+        if self.is_running:
+            return
+        self._queue = asyncio.PriorityQueue(maxsize=self.maxsize)
+        self._background_slots = asyncio.Semaphore(self.background_limit)
+        self._service = OpenAIService()
+        self._tasks = [
+            asyncio.create_task(self._worker(n), name=f"ai-generation-{n}")
+            for n in range(self.workers)
+        ]
+
+    async def stop(self):
+        """Останавливает воркеры; незавершённые задачи отбрасываются"""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        self._queue = None
+
+    async def submit(self, job: GenerationJob):
+        """Ставит задачу в очередь (при переполнении или без свободного фонового слота — ждёт)"""
+        if not self.is_running:
+            self.start()
+        if job.priority == PRIORITY_BACKGROUND:
+            # Слот освобождает воркер, выполнив задачу; время ожидания слота в ранг не входит
+            await self._background_slots.acquire()
+        rank = time.monotonic() + job.priority * self.aging_seconds
+        try:
+            await self._queue.put((rank, next(self._sequence), job))
+        except BaseException:
+            if job.priority == PRIORITY_BACKGROUND:
+                self._background_slots.release()
+            raise
+
+    async def generate(self, params: Dict[str, Any], priority: int = PRIORITY_INTERACTIVE) -> Optional[str]:
+        """Ставит задачу в очередь и дожидается результата"""
+        future = asyncio.get_running_loop().create_future()
+
+        async def on_done(content):
+            if not future.done():
+                future.set_result(content)
+
+        await self.submit(GenerationJob(params=params, on_done=on_done, priority=priority))
+        return await future
+
+    def qsize(self) -> int:
+        return self._queue.qsize() if self._queue else 0
+
+    async def _worker(self, n: int):
+        while True:
+            _, _, job = await self._queue.get()
+            try:
+                await self._run(job)
+            finally:
+                self._queue.task_done()
+                if job.priority == PRIORITY_BACKGROUND:
+                    self._background_slots.release()
+
+    async def _run(self, job: GenerationJob):
+        try:
+            params = dict(job.params)
+            if job.on_partial is not None:
+                params["on_partial"] = job.on_partial
+            if job.variants > 1:
+                content = await self._service.generate_post_variants(**params, variants=job.variants) or None
+            else:
+                content = await self._service.generate_post_content(**params)
+        except Exception as e:
+            logger.exception(f"Generation job failed: {e}")
+            content = None
+        try:
+            await job.on_done(content)
+        except Exception as e:
+            logger.exception(f"Generation callback failed: {e}")
+
+
+# Общая очередь приложения
+generation_queue = GenerationQueue()
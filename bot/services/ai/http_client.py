@@ -0,0 +1,45 @@
+import aiohttp
+from typing import Optional
+
+from bot import config
+
+# Единый HTTP-клиент для обращений к AI-провайдеру.
+# Живёт всё время работы бота: соединения переиспользуются (keep-alive),
+# DNS кэшируется, поэтому на каждый запрос не тратится TCP+TLS handshake.
+_session: Optional[aiohttp.ClientSession] = None
+
+
+def _create_session() -> aiohttp.ClientSession:
+    connector = aiohttp.TCPConnector(
+        limit=config.AI_HTTP_POOL_LIMIT,
+        limit_per_host=config.AI_HTTP_POOL_LIMIT_PER_HOST,
+        use_dns_cache=True,
+        ttl_dns_cache=config.AI_HTTP_DNS_CACHE_TTL,
+        keepalive_timeout=config.AI_HTTP_KEEPALIVE_TIMEOUT,
+        enable_cleanup_closed=True,
+    )
+    return aiohttp.ClientSession(connector=connector)
+
+
+async def init_http_session() -> aiohttp.ClientSession:
+    """Создаёт общий HTTP-клиент (вызывается при старте бота)"""
+    global _session
+    if _session is None or _session.closed:
+        _session = _create_session()
+    return _session
+
+
+def get_http_session() -> aiohttp.ClientSession:
+    """Возвращает общий HTTP-клиент, создавая его при первом обращении"""
+    global _session
+    if _session is None or _session.closed:
+        _session = _create_session()
+    return _session
+
+
+async def close_http_session():
+    """Закрывает общий HTTP-клиент (вызывается при остановке бота)"""
+    global _session
+    if _session is not None and not _session.closed:
+        await _session.close()
+    _session = None
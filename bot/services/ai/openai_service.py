@@ -1,18 +1,50 @@
 import asyncio
 import aiohttp
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, Awaitable, Callable
 import json
+import logging
 import os
 
+from bot import config
+from .http_client import get_http_session
+from .generation_cache import generation_cache, generation_cache_key
+from .resilience import AIProviderError, ai_resilience, error_from_response
+
+logger = logging.getLogger(__name__)
+
 class OpenAIService:
     """Сервис для генерации контента через OpenAI API"""
 
-    def __init__(self, api_key: Optional[str] = None):
+    def __init__(self, api_key: Optional[str] = None, http_session: Optional[aiohttp.ClientSession] = None):
         self.api_key = api_key or os.getenv("OPENAI_API_KEY")
         self.base_url = "https://api.openai.com/v1"
         self.model = "gpt-3.5-turbo"
+        # По умолчанию используется общий пул соединений приложения
+        self._http_session = http_session
 
-    async def generate_post_content(
+    @property
+    def http_session(self) -> aiohttp.ClientSession:
+        return self._http_session or get_http_session()
+
+    def _headers(self) -> Dict[str, str]:
+        return {
+            "Authorization": f"Bearer {self.api_key}",
+            "Content-Type": "application/json"
+        }
+
+    async def generate_post_content(self, *args, **kwargs) -> Optional[str]:
+        """
+        Генерирует контент поста на основе темы и настроек
+        
+        Args: см. generate_post_variants (без variants)
+            
+        Returns:
+            str: Сгенерированный контент или None в случае ошибки
+        """
+        variants = await self.generate_post_variants(*args, **kwargs)
+        return variants[0] if variants else None
+    
+    async def generate_post_variants(
         self,
         topic: str,
         theme: str,
@@ -23,10 +55,13 @@ class OpenAIService:
         is_premium: bool = False,
         prompt_template: Optional[str] = None,
         user_notes: Optional[str] = None,
-        temperature: float = 0.7
-    ) -> Optional[str]:
+        temperature: float = 0.7,
+        use_cache: bool = True,
+        on_partial: Optional[Callable[[str], Awaitable[None]]] = None,
+        variants: int = 1
+    ) -> list[str]:
         """
-        Генерирует контент поста на основе темы и настроек
+        Генерирует один или несколько вариантов поста одним запросом (параметр n API)
         
         Args:
             topic: Тема поста
@@ -35,13 +70,18 @@ class OpenAIService:
             language: Язык контента (ru/en)
             max_length: Максимальная длина контента
             is_premium: Использовать GPT-4 для премиум пользователей
+            use_cache: Отдать готовый текст для такого же запроса из кэша
+                (False — всегда новая генерация, например для «Перегенерировать»)
+            on_partial: Корутина для потоковой генерации: получает накопленный текст
+                первого варианта после каждого фрагмента ответа (stream=True)
+            variants: Количество вариантов; промпт оплачивается один раз на все варианты
             
         Returns:
-            str: Сгенерированный контент или None в случае ошибки
+            list[str]: Сгенерированные варианты (пустой список в случае ошибки)
         """
         if not self.api_key:
             # Заглушка для тестирования без API ключа
-            return await self._generate_mock_content(topic, theme, style, language, content_length)
+            return [await self._generate_mock_content(topic, theme, style, language, content_length) for _ in range(variants)]
         
         try:
             prompt = self._build_prompt(topic, theme, style, language, content_length, max_length, prompt_template, user_notes)
@@ -49,44 +89,94 @@ class OpenAIService:
             # Выбираем модель в зависимости от типа подписки
             model = "gpt-4" if is_premium else "gpt-3.5-turbo"
             
-            async with aiohttp.ClientSession() as session:
-                headers = {
-                    "Authorization": f"Bearer {self.api_key}",
-                    "Content-Type": "application/json"
-                }
-                
-                data = {
-                    "model": model,
-                    "messages": [
-                        {
-                            "role": "system",
-                            "content": "Ты профессиональный копирайтер для социальных сетей."
-                        },
-                        {
-                            "role": "user", 
-                            "content": prompt
-                        }
-                    ],
-                    "max_tokens": max_length // 2,
-                    "temperature": temperature
-                }
-                
-                async with session.post(
-                    f"{self.base_url}/chat/completions",
-                    headers=headers,
-                    json=data
-                ) as response:
-                    if response.status == 200:
-                        result = await response.json()
-                        content = result["choices"][0]["message"]["content"].strip()
-                        return content
-                    else:
-                        print(f"OpenAI API error: {response.status}")
-                        return None
-                        
+            data = {
+                "model": model,
+                "messages": [
+                    {
+                        "role": "system",
+                        "content": "Ты профессиональный копирайтер для социальных сетей."
+                    },
+                    {
+                        "role": "user", 
+                        "content": prompt
+                    }
+                ],
+                "max_tokens": max_length // 2,
+                "temperature": temperature
+            }
+            
+            # Кэшируются только одиночные генерации: несколько вариантов просят ради разнообразия
+            use_cache = use_cache and variants == 1 and config.AI_CACHE_ENABLED
+            cache_key = generation_cache_key(data)
+            if use_cache:
+                cached = await generation_cache.get(cache_key)
+                if cached:
+                    return [cached]
+            
+            if variants > 1:
+                data["n"] = variants
+            if on_partial is not None:
+                data["stream"] = True
+            
+            fallback = None
+            if config.AI_FALLBACK_MODEL and on_partial is None:
+                # Хедж только для обычных ответов: потоковое превью нельзя переключить на другой запрос
+                fallback_data = {**data, "model": config.AI_FALLBACK_MODEL}
+                fallback = lambda: self._request(fallback_data)
+            answered_model, contents = await ai_resilience.hedged(
+                lambda: self._request(data, on_partial), fallback, config.AI_HEDGE_DELAY
+            )
+            contents = [c for c in contents if c]
+            if contents and variants == 1 and config.AI_CACHE_ENABLED and answered_model == model:
+                # Свежий текст (в т.ч. после перегенерации) заменяет прежний в кэше
+                await generation_cache.set(cache_key, contents[0])
+            return contents
+                    
+        except AIProviderError as e:
+            logger.warning(f"OpenAI API error: {e}")
+            return []
         except Exception as e:
-            print(f"Error generating content: {e}")
-            return None
+            logger.exception(f"Error generating content: {e}")
+            return []
+    
+    async def _request(self, data: dict, on_partial: Optional[Callable[[str], Awaitable[None]]] = None) -> tuple[str, list[str]]:
+        """Одна попытка запроса к chat/completions; возвращает (модель, варианты)"""
+        async with self.http_session.post(
+            f"{self.base_url}/chat/completions",
+            headers=self._headers(),
+            json=data,
+            timeout=aiohttp.ClientTimeout(total=config.AI_REQUEST_TIMEOUT)
+        ) as response:
+            if response.status != 200:
+                raise error_from_response(response.status, response.headers, await response.text())
+            if on_partial is not None:
+                return data["model"], await self._read_stream(response, on_partial)
+            result = await response.json()
+            choices = sorted(result["choices"], key=lambda c: c.get("index", 0))
+            return data["model"], [c["message"]["content"].strip() for c in choices]
+    
+    async def _read_stream(self, response, on_partial: Callable[[str], Awaitable[None]]) -> list[str]:
+        """
+        Читает ответ в формате server-sent events и собирает тексты вариантов из фрагментов delta.
+        Фрагменты разных вариантов чередуются (поле index); в on_partial уходит первый вариант.
+        """
+        contents: dict[int, str] = {}
+        async for raw_line in response.content:
+            line = raw_line.decode("utf-8").strip()
+            if not line.startswith("data:"):
+                continue
+            payload = line[len("data:"):].strip()
+            if payload == "[DONE]":
+                break
+            for choice in json.loads(payload).get("choices") or []:
+                delta = choice.get("delta", {}).get("content")
+                if not delta:
+                    continue
+                index = choice.get("index", 0)
+                contents[index] = contents.get(index, "") + delta
+                if index == 0:
+                    await on_partial(contents[0])
+        return [contents[i].strip() for i in sorted(contents)]
     
     def _build_prompt(self, topic: str, theme: str, style: str, language: str, content_length: str, max_length: int, prompt_template: Optional[str], user_notes: Optional[str]) -> str:
         """Строит промпт для генерации контента"""
@@ -281,17 +371,12 @@ Requirements:
             return False
             
         try:
-            async with aiohttp.ClientSession() as session:
-                headers = {
-                    "Authorization": f"Bearer {self.api_key}",
-                    "Content-Type": "application/json"
-                }
+            async with self.http_session.get(
+                f"{self.base_url}/models",
+                headers=self._headers(),
+                timeout=aiohttp.ClientTimeout(total=config.AI_REQUEST_TIMEOUT)
+            ) as response:
+                return response.status == 200
                 
-                async with session.get(
-                    f"{self.base_url}/models",
-                    headers=headers
-                ) as response:
-                    return response.status == 200
-                    
         except Exception:
             return False 
\ No newline at end of file
@@ -0,0 +1,287 @@
+import asyncio
+import logging
+import random
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Awaitable, Callable, Mapping, Optional, TypeVar
+
+import aiohttp
+
+from bot import config
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+class AIProviderError(Exception):
+    """Ошибка обращения к AI-провайдеру; retryable — имеет ли смысл повторить запрос"""
+
+    def __init__(self, message: str, status: int = None, retry_after: float = None, retryable: bool = True):
+        super().__init__(message)
+        self.status = status
+        self.retry_after = retry_after
+        self.retryable = retryable
+
+
+class CircuitOpenError(AIProviderError):
+    """Провайдер признан недоступным — запрос отклонён без обращения к API"""
+
+    def __init__(self, retry_after: float = None):
+        super().__init__("AI provider circuit is open", retry_after=retry_after, retryable=False)
+
+
+def parse_retry_after(headers: Mapping[str, str]) -> Optional[float]:
+    """Задержка из Retry-After (секунды) или retry-after-ms, которые присылает OpenAI"""
+    value = headers.get("retry-after-ms")
+    if value:
+        try:
+            return float(value) / 1000
+        except ValueError:
+            pass
+    value = headers.get("Retry-After") or headers.get("retry-after")
+    if value:
+        try:
+            return float(value)
+        except ValueError:
+            return None
+    return None
+
+
+def error_from_response(status: int, headers: Mapping[str, str], body: str = "") -> AIProviderError:
+    """429, 408/409 и 5xx — временные ошибки; остальные 4xx повторять бесполезно"""
+    retryable = status in (408, 409, 429) or status >= 500
+    return AIProviderError(
+        f"AI provider HTTP {status}: {body[:200]}",
+        status=status,
+        retry_after=parse_retry_after(headers),
+        retryable=retryable,
+    )
+
+
+class AdaptiveConcurrencyLimiter:
+    """
+    Ограничение одновременных запросов к провайдеру по схеме AIMD.
+
+    Быстрый успешный ответ увеличивает лимит примерно на единицу за «окно» запросов,
+    а 429, таймаут или ответ медленнее latency_target уменьшают его в backoff раз.
+    При деградации провайдера корутины ждут слота, а не накапливаются в API.
+
+    Параллелизм сверху ограничен воркерами GenerationQueue (плюс хедж-запросы), поэтому
+    лимит выше 2 * AI_GENERATION_WORKERS ничего не меняет: он сдерживает нагрузку, когда
+    после перегрузки опускается ниже числа воркеров.
+    """
+
+    def __init__(self, initial: int = None, min_limit: int = None, max_limit: int = None,
+                 latency_target: float = None, backoff: float = 0.5):
+        self.min_limit = min_limit or config.AI_CONCURRENCY_MIN
+        self.max_limit = max_limit or config.AI_CONCURRENCY_MAX
+        self.latency_target = latency_target or config.AI_LATENCY_TARGET
+        self.backoff = backoff
+        self._limit = float(initial or config.AI_CONCURRENCY_INITIAL)
+        self._in_flight = 0
+        self._waiters: deque[asyncio.Future] = deque()
+
+    @property
+    def limit(self) -> int:
+        return max(self.min_limit, int(self._limit))
+
+    @property
+    def in_flight(self) -> int:
+        return self._in_flight
+
+    async def acquire(self):
+        while self._in_flight >= self.limit:
+            waiter = asyncio.get_running_loop().create_future()
+            self._waiters.append(waiter)
+            try:
+                await waiter
+            except asyncio.CancelledError:
+                # Пробуждение могло достаться отменённой задаче — передаём его следующей
+                self._wake()
+                raise
+            finally:
+                if waiter in self._waiters:
+                    self._waiters.remove(waiter)
+        self._in_flight += 1
+
+    def release(self):
+        self._in_flight -= 1
+        self._wake()
+
+    @asynccontextmanager
+    async def slot(self):
+        await self.acquire()
+        try:
+            yield
+        finally:
+            self.release()
+
+    def on_success(self, latency: float):
+        if latency > self.latency_target:
+            self.on_overload()
+            return
+        self._limit = min(self.max_limit, self._limit + 1 / max(self._limit, 1))
+        self._wake()
+
+    def on_overload(self):
+        self._limit = max(self.min_limit, self._limit * self.backoff)
+
+    def _wake(self):
+        free = self.limit - self._in_flight
+        while free > 0 and self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                free -= 1
+
+
+class CircuitBreaker:
+    """
+    После failure_threshold временных ошибок подряд запросы отклоняются сразу (open)
+    в течение reset_timeout секунд. Затем пропускается один пробный запрос (half-open):
+    успех закрывает цепь, ошибка открывает её снова.
+    """
+
+    def __init__(self, failure_threshold: int = None, reset_timeout: float = None):
+        self.failure_threshold = failure_threshold or config.AI_BREAKER_FAILURES
+        self.reset_timeout = reset_timeout or config.AI_BREAKER_RESET_SECONDS
+        self._failures = 0
+        self._opened_at: Optional[float] = None
+        self._probe_in_flight = False
+
+    @property
+    def state(self) -> str:
+        if self._opened_at is None:
+            return "closed"
+        if time.monotonic() - self._opened_at < self.reset_timeout:
+            return "open"
+        return "half_open"
+
+    def before_call(self):
+        state = self.state
+        if state == "closed":
+            return
+        if state == "open" or self._probe_in_flight:
+            remaining = self.reset_timeout - (time.monotonic() - self._opened_at)
+            raise CircuitOpenError(retry_after=max(remaining, 0))
+        self._probe_in_flight = True
+
+    def cancel_probe(self):
+        """Пробный запрос отменён (например, проигравший хедж) — следующий вызов станет пробным"""
+        self._probe_in_flight = False
+
+    def record_success(self):
+        self._failures = 0
+        self._opened_at = None
+        self._probe_in_flight = False
+
+    def record_failure(self):
+        self._failures += 1
+        self._probe_in_flight = False
+        if self._opened_at is not None or self._failures >= self.failure_threshold:
+            if self._opened_at is None:
+                logger.warning(f"AI provider circuit opened after {self._failures} failures")
+            self._opened_at = time.monotonic()
+
+
+class AIResilience:
+    """
+    Общая обвязка вызовов AI-провайдера: общий дедлайн, адаптивный лимит параллелизма,
+    повторы с jitter (или по Retry-After), circuit breaker и хеджирование запросом
+    к резервной модели.
+    """
+
+    def __init__(self, limiter: AdaptiveConcurrencyLimiter = None, breaker: CircuitBreaker = None,
+                 attempts: int = None, base_delay: float = None, max_delay: float = None, deadline: float = None):
+        self.limiter = limiter or AdaptiveConcurrencyLimiter()
+        self.breaker = breaker or CircuitBreaker()
+        self.attempts = attempts or config.AI_RETRY_ATTEMPTS
+        self.base_delay = config.AI_RETRY_BASE_DELAY if base_delay is None else base_delay
+        self.max_delay = config.AI_RETRY_MAX_DELAY if max_delay is None else max_delay
+        self.deadline = deadline or config.AI_DEADLINE_SECONDS
+
+    def _backoff(self, attempt: int) -> float:
+        # Full jitter: повторы разных запросов не приходят к провайдеру одновременно
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+
+    async def call(self, request: Callable[[], Awaitable[T]]) -> T:
+        """Выполняет запрос с повторами; request — фабрика одной попытки"""
+        deadline = time.monotonic() + self.deadline
+        for attempt in range(self.attempts):
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise AIProviderError("AI request deadline exceeded", retryable=False)
+            self.breaker.before_call()
+
+            started = time.monotonic()
+            try:
+                async with self.limiter.slot():
+                    result = await asyncio.wait_for(request(), timeout=remaining)
+            except asyncio.CancelledError:
+                self.breaker.cancel_probe()
+                raise
+            except asyncio.TimeoutError:
+                error = AIProviderError("AI request timed out")
+                self.limiter.on_overload()
+            except aiohttp.ClientError as e:
+                error = AIProviderError(f"AI request failed: {e}")
+            except AIProviderError as e:
+                error = e
+                if e.status == 429:
+                    self.limiter.on_overload()
+            except Exception:
+                # Ошибка не провайдера (разбор ответа, баг в request): о его доступности она ничего
+                # не говорит, но пробный слот освобождаем — иначе цепь навсегда останется half-open
+                self.breaker.cancel_probe()
+                raise
+            else:
+                self.limiter.on_success(time.monotonic() - started)
+                self.breaker.record_success()
+                return result
+
+            if not error.retryable:
+                # Провайдер ответил (например, 400) — он доступен, цепь не размыкаем
+                self.breaker.record_success()
+                raise error
+            self.breaker.record_failure()
+
+            delay = error.retry_after if error.retry_after is not None else self._backoff(attempt)
+            if attempt == self.attempts - 1 or time.monotonic() + delay >= deadline:
+                raise error
+            logger.info(f"AI request retry {attempt + 1}/{self.attempts - 1} in {delay:.1f}s: {error}")
+            await asyncio.sleep(delay)
+        raise AIProviderError("AI request attempts exhausted", retryable=False)
+
+    async def hedged(self, primary: Callable[[], Awaitable[T]], fallback: Optional[Callable[[], Awaitable[T]]],
+                     delay: float) -> T:
+        """
+        Если основной запрос не ответил за delay секунд, параллельно отправляется
+        резервный; возвращается первый успешный ответ, второй запрос отменяется.
+        """
+        if fallback is None or delay <= 0:
+            return await self.call(primary)
+
+        first = asyncio.ensure_future(self.call(primary))
+        done, _ = await asyncio.wait({first}, timeout=delay)
+        if done:
+            return first.result()
+
+        pending = {first, asyncio.ensure_future(self.call(fallback))}
+        error: Optional[BaseException] = None
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        return task.result()
+                    error = task.exception()
+            raise error
+        finally:
+            for task in pending:
+                task.cancel()
+
+
+# Общая обвязка приложения: лимит и состояние цепи разделяют все вызовы провайдера
+ai_resilience = AIResilience()
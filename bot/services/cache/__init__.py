@@ -0,0 +1,3 @@
+from .user_cache import UserCache, user_cache, invalidate_user_cache
+
+__all__ = ["UserCache", "user_cache", "invalidate_user_cache"]
@@ -0,0 +1,197 @@
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+from decimal import Decimal
+from typing import Any, Optional
+
+import msgpack
+
+from bot import config
+
+logger = logging.getLogger(__name__)
+
+# Канал Redis, по которому реплики узнают об изменении пользователя
+INVALIDATION_CHANNEL = "user-cache:invalidate"
+
+# Поля пользователя, которые кладём в кэш (только примитивы, без relationships)
+CACHED_FIELDS = (
+    "id", "telegram_id", "name", "username", "role", "referred_by_id", "referral_code",
+    "cash", "free_posts_used", "free_posts_limit",
+)
+
+
+def _data_key(telegram_id: int) -> str:
+    return f"user:{telegram_id}"
+
+
+def _version_key(telegram_id: int) -> str:
+    return f"user:ver:{telegram_id}"
+
+
+def user_to_cache(user) -> dict:
+    data = {field: getattr(user, field, None) for field in CACHED_FIELDS}
+    # Decimal не сериализуется msgpack — храним строкой без потери точности
+    data["cash"] = str(data["cash"]) if data["cash"] is not None else None
+    return data
+
+
+def cache_to_user_kwargs(data: dict) -> dict:
+    kwargs = {field: data.get(field) for field in CACHED_FIELDS}
+    kwargs["cash"] = Decimal(kwargs["cash"]) if kwargs["cash"] is not None else Decimal("0")
+    return kwargs
+
+
+class UserCache:
+    """
+    Двухуровневый кэш пользователей: LRU с TTL в памяти процесса + Redis (msgpack).
+
+    Каждое изменение пользователя увеличивает его версию в Redis (INCR user:ver:{id}).
+    Значение в Redis хранит версию, с которой оно было прочитано из БД, и отбрасывается
+    при расхождении — так запоздалая запись старых данных не переживает инвалидацию.
+    Локальные копии на всех репликах сбрасываются сообщением в pub/sub.
+    """
+
+    def __init__(self, max_size: int = None, ttl: int = None, local_ttl: int = None):
+        self.max_size = max_size or config.USER_CACHE_LOCAL_SIZE
+        self.ttl = ttl or config.CACHE_TTL
+        self.local_ttl = local_ttl or config.USER_CACHE_LOCAL_TTL
+        # telegram_id -> (expires_at, version, data)
+        self._local: OrderedDict[int, tuple[float, int, dict]] = OrderedDict()
+        self._redis = None
+        self._listener: Optional[asyncio.Task] = None
+
+    async def _get_redis(self):
+        if self._redis is None:
+            from db.connection import get_binary_redis
+            self._redis = await get_binary_redis()
+        return self._redis
+
+    # --- локальный уровень ---
+
+    def _local_get(self, telegram_id: int) -> Optional[dict]:
+        entry = self._local.get(telegram_id)
+        if entry is None:
+            return None
+        expires_at, _, data = entry
+        if expires_at < time.monotonic():
+            del self._local[telegram_id]
+            return None
+        self._local.move_to_end(telegram_id)
+        return data
+
+    def _local_set(self, telegram_id: int, version: int, data: dict):
+        self._local[telegram_id] = (time.monotonic() + self.local_ttl, version, data)
+        self._local.move_to_end(telegram_id)
+        while len(self._local) > self.max_size:
+            self._local.popitem(last=False)
+
+    def _local_drop(self, telegram_id: int, version: Optional[int] = None):
+        entry = self._local.get(telegram_id)
+        if entry is not None and (version is None or entry[1] < version):
+            del self._local[telegram_id]
+
+    # --- публичный API ---
+
+    async def get(self, telegram_id: int) -> tuple[Optional[dict], int]:
+        """
+        Возвращает (данные пользователя или None, текущая версия).
+        Версию нужно передать в set() после чтения пользователя из БД.
+        """
+        data = self._local_get(telegram_id)
+        if data is not None:
+            return data, self._local[telegram_id][1]
+
+        try:
+            redis = await self._get_redis()
+            raw, version = await redis.mget(_data_key(telegram_id), _version_key(telegram_id))
+        except Exception as e:
+            logger.warning(f"User cache unavailable: {e}")
+            return None, 0
+
+        version = int(version or 0)
+        if raw:
+            try:
+                payload = msgpack.unpackb(raw)
+                if payload.get("v") == version:
+                    data = payload["d"]
+                    self._local_set(telegram_id, version, data)
+                    return data, version
+            except Exception:
+                pass  # Кеш повреждён, идём в базу
+        return None, version
+
+    async def set(self, telegram_id: int, data: dict, version: int):
+        """Кладёт данные, прочитанные из БД при версии version"""
+        self._local_set(telegram_id, version, data)
+        try:
+            redis = await self._get_redis()
+            await redis.set(_data_key(telegram_id), msgpack.packb({"v": version, "d": data}), ex=self.ttl)
+        except Exception as e:
+            logger.warning(f"User cache write failed: {e}")
+
+    async def invalidate(self, telegram_id: int) -> bool:
+        """Сбрасывает пользователя на всех уровнях и во всех репликах"""
+        self._local_drop(telegram_id)
+        try:
+            redis = await self._get_redis()
+            async with redis.pipeline(transaction=True) as pipe:
+                pipe.incr(_version_key(telegram_id))
+                pipe.expire(_version_key(telegram_id), self.ttl * 2)
+                pipe.delete(_data_key(telegram_id))
+                version, *_ = await pipe.execute()
+            await redis.publish(INVALIDATION_CHANNEL, f"{telegram_id}:{version}")
+            return True
+        except Exception as e:
+            logger.warning(f"User cache invalidation failed: {e}")
+            return False
+
+    # --- pub/sub ---
+
+    def start(self):
+        """Подписывается на инвалидации других реплик"""
+        if self._listener is None:
+            self._listener = asyncio.create_task(self._listen(), name="user-cache-invalidation")
+
+    async def stop(self):
+        if self._listener is not None:
+            self._listener.cancel()
+            await asyncio.gather(self._listener, return_exceptions=True)
+            self._listener = None
+        self._local.clear()
+
+    async def _listen(self):
+        while True:
+            try:
+                redis = await self._get_redis()
+                async with redis.pubsub() as pubsub:
+                    await pubsub.subscribe(INVALIDATION_CHANNEL)
+                    async for message in pubsub.listen():
+                        if message.get("type") == "message":
+                            self._handle_message(message["data"])
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                # Пока подписка потеряна, могли пропустить инвалидации — локальный уровень не доверяем
+                logger.warning(f"User cache subscription lost: {e}")
+                self._local.clear()
+                await asyncio.sleep(1)
+
+    def _handle_message(self, raw: Any):
+        try:
+            if isinstance(raw, bytes):
+                raw = raw.decode()
+            telegram_id, version = raw.split(":")
+            self._local_drop(int(telegram_id), int(version))
+        except ValueError:
+            pass
+
+
+# Общий кэш приложения
+user_cache = UserCache()
+
+
+async def invalidate_user_cache(telegram_id: Optional[int]) -> bool:
+    if not telegram_id:
+        return False
+    return await user_cache.invalidate(telegram_id)
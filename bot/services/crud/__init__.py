@@ -9,6 +9,7 @@ from . import (
     post_stats as post_stats_crud,
     plan as plan_crud,
     usage_stats as usage_stats_crud,
+    publication_log as publication_log_crud,
 )
 
 __all__ = [
@@ -22,4 +23,5 @@ __all__ = [
     "post_stats_crud",
     "plan_crud",
     "usage_stats_crud",
+    "publication_log_crud",
 ]
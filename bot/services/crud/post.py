@@ -1,21 +1,40 @@
+from datetime import datetime, timezone, timedelta
+from sqlalchemy import update, func, tuple_
 from sqlalchemy.future import select
 from sqlalchemy.ext.asyncio import AsyncSession
-from bot.models.models import Post
+from bot.models.models import Post, UserWorkflow, SocialAccount
 
 ALLOWED_FIELDS = {
     "topic", "content", "media_type", "media_url",
     "status", "scheduled_time", "moderated",
     "social_account_id", "user_workflow_id",
+    "published_time", "lease_owner", "lease_expires_at",
+    "external_id", "permalink", "retry_count", "last_error",
     # Новые поля для ручных постов
     "user_prompt", "user_notes", "is_manual", "prompt_template_id", "generation_temperature", "manual_topic"
 }
 
 
+def _notify_scheduler(post: Post):
+    """Будит планировщик публикаций, если пост ждёт выхода"""
+    if post.status == 'scheduled':
+        from bot.services.publishing.scheduler import notify_post_scheduled
+        notify_post_scheduled(post.id, post.scheduled_time)
+
+
+async def _invalidate_profile(session: AsyncSession, workflow_id: int | None):
+    """Сбрасывает кэш сводки профиля владельца поста"""
+    from bot.services.profile import invalidate_profile_summary_for_workflow
+    await invalidate_profile_summary_for_workflow(session, workflow_id)
+
+
 async def create_post(session: AsyncSession, **kwargs) -> Post:
     post = Post(**kwargs)
     session.add(post)
     await session.commit()
     await session.refresh(post)
+    _notify_scheduler(post)
+    await _invalidate_profile(session, post.user_workflow_id)
     return post
 
 
@@ -48,6 +67,10 @@ async def update_post(session: AsyncSession, post_id: int, **kwargs) -> Post | N
             setattr(post, key, value)
     await session.commit()
     await session.refresh(post)
+    if "status" in kwargs or "scheduled_time" in kwargs:
+        _notify_scheduler(post)
+    if "status" in kwargs:
+        await _invalidate_profile(session, post.user_workflow_id)
     return post
 
 
@@ -55,8 +78,10 @@ async def delete_post(session: AsyncSession, post_id: int) -> bool:
     post = await get_post_by_id(session, post_id)
     if not post:
         return False
+    workflow_id = post.user_workflow_id
     await session.delete(post)
     await session.commit()
+    await _invalidate_profile(session, workflow_id)
     return True
 
 
@@ -67,6 +92,7 @@ async def approve_post(session: AsyncSession, post_id: int) -> bool:
     post.status = 'scheduled'
     post.moderated = True
     await session.commit()
+    _notify_scheduler(post)
     return True
 
 
@@ -87,8 +113,88 @@ async def publish_post(session: AsyncSession, post_id: int) -> bool:
     post.status = 'published'
     post.published_time = datetime.now(timezone.utc)
     await session.commit()
+    await _invalidate_profile(session, post.user_workflow_id)
     return True
 
+async def claim_due_posts(
+    session: AsyncSession, owner: str, lease_seconds: int, limit: int, post_ids: list[int] | None = None
+) -> list:
+    """
+    Атомарно забирает пачку наступивших постов: scheduled → publishing с арендой owner.
+    Строки, захваченные другим экземпляром, пропускаются (FOR UPDATE SKIP LOCKED).
+    Возвращает строки (id, topic, social_account_id, user_workflow_id).
+    """
+    now = datetime.now(timezone.utc)
+    due = (
+        select(Post.id)
+        .where(Post.status == 'scheduled', Post.scheduled_time <= now)
+        .order_by(Post.scheduled_time)
+        .limit(limit)
+        .with_for_update(skip_locked=True)
+    )
+    if post_ids is not None:
+        due = due.where(Post.id.in_(post_ids))
+
+    result = await session.execute(
+        update(Post)
+        .where(Post.id.in_(due.scalar_subquery()))
+        .values(status='publishing', lease_owner=owner, lease_expires_at=now + timedelta(seconds=lease_seconds))
+        .returning(Post.id, Post.topic, Post.social_account_id, Post.user_workflow_id)
+        .execution_options(synchronize_session=False)
+    )
+    rows = result.all()
+    await session.commit()
+    return rows
+
+
+async def claim_post(session: AsyncSession, post_id: int, owner: str, lease_seconds: int) -> bool:
+    """
+    Захватывает один пост перед публикацией: pending/scheduled → publishing с арендой owner.
+    owner — уникальный токен захвата, поэтому пост, который уже публикуется, не захватит никто,
+    в том числе этот же экземпляр бота.
+    """
+    now = datetime.now(timezone.utc)
+    result = await session.execute(
+        update(Post)
+        .where(Post.id == post_id, Post.status.in_(('pending', 'scheduled')))
+        .values(status='publishing', lease_owner=owner, lease_expires_at=now + timedelta(seconds=lease_seconds))
+        .returning(Post.id)
+        .execution_options(synchronize_session=False)
+    )
+    claimed = result.scalar_one_or_none() is not None
+    await session.commit()
+    return claimed
+
+
+async def renew_lease(session: AsyncSession, post_id: int, owner: str, lease_seconds: int) -> bool:
+    """Продлевает аренду поста, захваченного токеном owner (False — аренда истекла и пост забрали)"""
+    now = datetime.now(timezone.utc)
+    result = await session.execute(
+        update(Post)
+        .where(Post.id == post_id, Post.status == 'publishing', Post.lease_owner == owner)
+        .values(lease_expires_at=now + timedelta(seconds=lease_seconds))
+        .returning(Post.id)
+        .execution_options(synchronize_session=False)
+    )
+    renewed = result.scalar_one_or_none() is not None
+    await session.commit()
+    return renewed
+
+
+async def release_expired_leases(session: AsyncSession) -> list:
+    """Возвращает в scheduled посты, аренда которых истекла (экземпляр упал посреди публикации)"""
+    result = await session.execute(
+        update(Post)
+        .where(Post.status == 'publishing', Post.lease_expires_at < datetime.now(timezone.utc))
+        .values(status='scheduled', lease_owner=None, lease_expires_at=None)
+        .returning(Post.id, Post.scheduled_time)
+        .execution_options(synchronize_session=False)
+    )
+    rows = result.all()
+    await session.commit()
+    return rows
+
+
 async def get_posts_by_media_type(session: AsyncSession, media_type: str) -> list[Post]:
     result = await session.execute(select(Post).where(Post.media_type == media_type))
     return result.scalars().all()
@@ -131,6 +237,82 @@ async def get_posts_by_topic(session: AsyncSession, topic: str) -> list[Post]:
     return result.scalars().all()
 
 
+# Постраничный список постов пользователя (keyset по (created_at, id))
+POSTS_PAGE_SIZE = 10
+_EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+
+def encode_posts_cursor(created_at: datetime, post_id: int) -> str:
+    """Курсор страницы: микросекунды created_at и id (помещается в callback_data)"""
+    micros = (created_at - _EPOCH) // timedelta(microseconds=1)
+    return f"{micros}_{post_id}"
+
+
+def decode_posts_cursor(cursor: str) -> tuple[datetime, int]:
+    micros, post_id = cursor.split("_")
+    return _EPOCH + timedelta(microseconds=int(micros)), int(post_id)
+
+
+def _user_posts_filter(query, user_id: int, status_filter: str | None = None):
+    """Посты пользователя: через задачу или (для постов без workflow) через аккаунт"""
+    query = (
+        query
+        .outerjoin(UserWorkflow, Post.user_workflow_id == UserWorkflow.id)
+        .outerjoin(SocialAccount, Post.social_account_id == SocialAccount.id)
+        .where((UserWorkflow.user_id == user_id) | (SocialAccount.user_id == user_id))
+    )
+    if status_filter and status_filter != "all":
+        query = query.where(Post.status == status_filter)
+    return query
+
+
+async def get_user_posts_page(
+    session: AsyncSession,
+    user_id: int,
+    cursor: str | None = None,
+    direction: str = "next",
+    limit: int = POSTS_PAGE_SIZE,
+    status_filter: str | None = None,
+) -> tuple[list, bool]:
+    """
+    Страница постов пользователя от новых к старым.
+
+    Загружает только id/status/created_at и начало темы. direction="next" — посты старше курсора,
+    "prev" — новее. Возвращает строки страницы и признак, что в этом направлении есть ещё посты.
+    """
+    query = _user_posts_filter(
+        select(Post.id, Post.status, func.substr(Post.topic, 1, 41).label("topic"), Post.created_at),
+        user_id, status_filter
+    )
+    if cursor:
+        key = decode_posts_cursor(cursor)
+        if direction == "prev":
+            query = query.where(tuple_(Post.created_at, Post.id) > key)
+        else:
+            query = query.where(tuple_(Post.created_at, Post.id) < key)
+
+    if direction == "prev":
+        query = query.order_by(Post.created_at.asc(), Post.id.asc())
+    else:
+        query = query.order_by(Post.created_at.desc(), Post.id.desc())
+
+    result = await session.execute(query.limit(limit + 1))
+    rows = result.all()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    if direction == "prev":
+        rows.reverse()
+    return rows, has_more
+
+
+async def count_user_posts_by_status(session: AsyncSession, user_id: int) -> dict[str, int]:
+    """Количество постов пользователя по статусам (GROUP BY в БД)"""
+    result = await session.execute(
+        _user_posts_filter(select(Post.status, func.count(Post.id)), user_id).group_by(Post.status)
+    )
+    return dict(result.all())
+
+
 # Новые функции для работы с ручными постами
 async def get_manual_posts(session: AsyncSession, user_id: int = None) -> list[Post]:
     """Получает ручные посты пользователя"""
@@ -1,3 +1,4 @@
+from datetime import datetime, timezone
 from sqlalchemy.future import select
 from sqlalchemy.ext.asyncio import AsyncSession
 from bot.models.models import PostStats
@@ -39,15 +40,94 @@ async def get_post_stats_by_post_id(session: AsyncSession, post_id: int) -> Post
     result = await session.execute(select(PostStats).where(PostStats.post_id == post_id))
     return result.scalar_one_or_none()
 
+def _insert(session: AsyncSession):
+    """INSERT с поддержкой ON CONFLICT для диалекта текущей сессии"""
+    if session.bind is not None and session.bind.dialect.name == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert
+    else:
+        from sqlalchemy.dialects.postgresql import insert
+    return insert(PostStats)
+
+
+async def increment_post_stats_batch(session: AsyncSession, increments: dict[int, tuple[int, int, int]]) -> None:
+    """
+    Атомарно прибавляет счётчики многим постам одним запросом:
+    INSERT ... ON CONFLICT (post_id) DO UPDATE SET views = post_stats.views + excluded.views, ...
+    Только для постов площадок без источника метрик: иначе сборщик перезапишет инкременты.
+
+    Args:
+        increments: post_id -> (views, likes, reposts)
+    """
+    if not increments:
+        return
+    # Одинаковый порядок строк во всех пачках — параллельные сбросы не взаимоблокируются
+    rows = [
+        {"post_id": post_id, "views": views, "likes": likes, "reposts": reposts}
+        for post_id, (views, likes, reposts) in sorted(increments.items())
+    ]
+    stmt = _insert(session).values(rows)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[PostStats.post_id],
+        set_={
+            "views": PostStats.views + stmt.excluded.views,
+            "likes": PostStats.likes + stmt.excluded.likes,
+            "reposts": PostStats.reposts + stmt.excluded.reposts,
+            "updated_at": datetime.now(timezone.utc),
+        },
+    )
+    await session.execute(stmt)
+    await session.commit()
+
+
+async def upsert_post_stats_batch(session: AsyncSession, metrics: dict[int, tuple[int, int, int]]) -> None:
+    """
+    Записывает абсолютные значения метрик многим постам одним запросом
+    (данные площадки заменяют сохранённые, а не прибавляются к ним).
+    Вызывается только сборщиком: для площадок с источником метрик он владелец этих столбцов.
+
+    Args:
+        metrics: post_id -> (views, likes, reposts)
+    """
+    if not metrics:
+        return
+    rows = [
+        {"post_id": post_id, "views": views, "likes": likes, "reposts": reposts}
+        for post_id, (views, likes, reposts) in sorted(metrics.items())
+    ]
+    stmt = _insert(session).values(rows)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[PostStats.post_id],
+        set_={
+            "views": stmt.excluded.views,
+            "likes": stmt.excluded.likes,
+            "reposts": stmt.excluded.reposts,
+            "updated_at": datetime.now(timezone.utc),
+        },
+    )
+    await session.execute(stmt)
+    await session.commit()
+
+
+async def touch_post_stats_batch(session: AsyncSession, post_ids: list[int]) -> None:
+    """
+    Отмечает попытку сбора метрик без новых значений (сообщение удалено, площадка не ответила):
+    обновляется только updated_at, а строка без метрик создаётся с нулями.
+    Так к посту применяется обычный интервал обновления, и он не занимает каждый цикл сборщика.
+    """
+    if not post_ids:
+        return
+    now = datetime.now(timezone.utc)
+    stmt = _insert(session).values([{"post_id": post_id, "updated_at": now} for post_id in sorted(set(post_ids))])
+    stmt = stmt.on_conflict_do_update(index_elements=[PostStats.post_id], set_={"updated_at": now})
+    await session.execute(stmt)
+    await session.commit()
+
+
 async def increment_post_stats(
     session: AsyncSession, post_id: int, views: int = 0, likes: int = 0, reposts: int = 0
 ) -> None:
-    stats = await get_post_stats_by_post_id(session, post_id)
-    if stats:
-        stats.views += views
-        stats.likes += likes
-        stats.reposts += reposts
-        await session.commit()
+    """Прибавляет счётчики поста одним запросом (строка статистики создаётся при необходимости)"""
+    await increment_post_stats_batch(session, {post_id: (views, likes, reposts)})
 
 async def get_top_posts_by_views(session: AsyncSession, limit: int = 10) -> list[PostStats]:
     result = await session.execute(
@@ -0,0 +1,56 @@
+from datetime import datetime, timezone
+from sqlalchemy.future import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from bot.models.models import PublicationLog
+
+# Максимальная длина сохраняемых текстов ошибки/ответа
+SNIPPET_LIMIT = 1000
+
+
+async def start_attempt(session: AsyncSession, post_id: int, attempt: int, request_hash: str) -> PublicationLog:
+    """Записывает начало попытки публикации"""
+    log = PublicationLog(post_id=post_id, attempt=attempt, request_hash=request_hash, status='started')
+    session.add(log)
+    await session.commit()
+    await session.refresh(log)
+    return log
+
+
+async def finish_attempt(
+    session: AsyncSession,
+    log: PublicationLog,
+    status: str,
+    error_code: str | None = None,
+    error_message: str | None = None,
+    response_snippet: str | None = None,
+) -> PublicationLog:
+    """Фиксирует результат попытки (success|failed)"""
+    log.status = status
+    log.finished_at = datetime.now(timezone.utc)
+    log.error_code = error_code[:50] if error_code else None
+    log.error_message = error_message[:SNIPPET_LIMIT] if error_message else None
+    log.response_snippet = response_snippet[:SNIPPET_LIMIT] if response_snippet else None
+    await session.commit()
+    return log
+
+
+async def get_successful_attempt(session: AsyncSession, post_id: int, request_hash: str) -> PublicationLog | None:
+    """Ищет успешную отправку того же содержимого (защита от повторной публикации)"""
+    result = await session.execute(
+        select(PublicationLog)
+        .where(
+            PublicationLog.post_id == post_id,
+            PublicationLog.request_hash == request_hash,
+            PublicationLog.status == 'success'
+        )
+        .order_by(PublicationLog.id.desc())
+        .limit(1)
+    )
+    return result.scalar_one_or_none()
+
+
+async def get_logs_by_post(session: AsyncSession, post_id: int) -> list[PublicationLog]:
+    result = await session.execute(
+        select(PublicationLog).where(PublicationLog.post_id == post_id).order_by(PublicationLog.attempt)
+    )
+    return result.scalars().all()
@@ -1,6 +1,7 @@
 from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 from bot.models.models import SocialAccount
+from bot.services.profile import invalidate_profile_summary
 
 ALLOWED_FIELDS = {
     "platform", "channel_name", "channel_id", "channel_type", 
@@ -12,6 +13,9 @@ async def create_social_account(session: AsyncSession, **kwargs) -> SocialAccoun
     session.add(account)
     await session.commit()
     await session.refresh(account)
+    from bot.services.entitlements import adjust_channels
+    await adjust_channels(session, account.user_id, 1)
+    await invalidate_profile_summary(account.user_id)
     return account
 
 async def get_social_account_by_id(session: AsyncSession, account_id: int) -> SocialAccount | None:
@@ -41,8 +45,12 @@ async def delete_social_account(session: AsyncSession, account_id: int) -> bool:
     account = await get_social_account_by_id(session, account_id)
     if not account:
         return False
+    user_id = account.user_id
     await session.delete(account)
     await session.commit()
+    from bot.services.entitlements import adjust_channels
+    await adjust_channels(session, user_id, -1)
+    await invalidate_profile_summary(user_id)
     return True
 
 async def get_social_account_by_platform_and_channel(
@@ -1,15 +1,23 @@
 from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 from bot.models.models import Subscription
+from bot.services.profile import invalidate_profile_summary
 from datetime import datetime, timezone
 
 ALLOWED_FIELDS = {"user_id", "plan_id", "start_date", "end_date", "status", "auto_renew"}
 
+async def _invalidate_user_views(user_id: int):
+    """Подписка влияет на сводку профиля и на лимиты — сбрасываем оба кэша"""
+    from bot.services.entitlements import invalidate_limit_state
+    await invalidate_profile_summary(user_id)
+    await invalidate_limit_state(user_id)
+
 async def create_subscription(session: AsyncSession, **kwargs) -> Subscription:
     subscription = Subscription(**kwargs)
     session.add(subscription)
     await session.commit()
     await session.refresh(subscription)
+    await _invalidate_user_views(subscription.user_id)
     return subscription
 
 async def get_subscription_by_id(session: AsyncSession, subscription_id: int) -> Subscription | None:
@@ -48,6 +56,7 @@ async def update_subscription(session: AsyncSession, subscription_id: int, **kwa
 
     await session.commit()
     await session.refresh(subscription)
+    await _invalidate_user_views(subscription.user_id)
     return subscription
 
 async def delete_subscription(session: AsyncSession, subscription_id: int) -> bool:
@@ -55,8 +64,10 @@ async def delete_subscription(session: AsyncSession, subscription_id: int) -> bo
     if not subscription:
         return False
 
+    user_id = subscription.user_id
     await session.delete(subscription)
     await session.commit()
+    await _invalidate_user_views(user_id)
     return True
 
 async def get_active_subscriptions(session: AsyncSession) -> list[Subscription]:
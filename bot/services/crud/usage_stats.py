@@ -1,8 +1,11 @@
-from sqlalchemy import select
+from datetime import datetime, timezone
+from sqlalchemy import select, update, func
 from sqlalchemy.ext.asyncio import AsyncSession
-from bot.models.models import UsageStats, Subscription
+from bot.models.models import UsageStats, Subscription, UserWorkflow, SocialAccount
 
-ALLOWED_FIELDS = {"posts_used", "manual_posts_used", "channels_connected"}
+ALLOWED_FIELDS = {"posts_used", "manual_posts_used", "channels_connected", "active_workflows"}
+# Счётчики, которые меняются атомарно (x = x + n)
+COUNTER_FIELDS = ALLOWED_FIELDS
 
 async def create_usage_stats(session: AsyncSession, **kwargs) -> UsageStats:
     """Создать статистику использования"""
@@ -25,16 +28,21 @@ async def get_usage_stats_by_subscription_id(session: AsyncSession, subscription
     return result.scalar_one_or_none()
 
 async def get_user_usage_stats(session: AsyncSession, user_id: int) -> UsageStats | None:
-    """Получить статистику использования пользователя по активной подписке"""
-    from bot.services.crud.subscription import get_active_subscription
-    
-    # Получаем активную подписку пользователя
-    subscription = await get_active_subscription(session, user_id)
-    if not subscription:
-        return None
-    
-    # Получаем статистику использования для этой подписки
-    return await get_usage_stats_by_subscription_id(session, subscription.id)
+    """Получить статистику использования пользователя по активной подписке (один запрос)"""
+    now = datetime.now(timezone.utc)
+    result = await session.execute(
+        select(UsageStats)
+        .join(Subscription, Subscription.id == UsageStats.subscription_id)
+        .where(
+            Subscription.user_id == user_id,
+            Subscription.status == 'active',
+            Subscription.start_date <= now,
+            Subscription.end_date > now
+        )
+        .order_by(Subscription.end_date.desc())
+        .limit(1)
+    )
+    return result.scalar_one_or_none()
 
 async def get_all_usage_stats(session: AsyncSession) -> list[UsageStats]:
     """Получить всю статистику"""
@@ -66,35 +74,108 @@ async def delete_usage_stats(session: AsyncSession, stats_id: int) -> bool:
     await session.commit()
     return True
 
+def _counter(field: str):
+    if field not in COUNTER_FIELDS:
+        raise ValueError(f"Unknown usage counter: {field}")
+    return getattr(UsageStats, field)
+
+
+async def increment_usage(session: AsyncSession, subscription_id: int, field: str, count: int = 1) -> int | None:
+    """
+    Атомарно меняет счётчик: UPDATE ... SET x = x + count RETURNING x.
+    Отрицательный count уменьшает счётчик, но не ниже нуля. None — статистики нет.
+    """
+    column = _counter(field)
+    result = await session.execute(
+        update(UsageStats)
+        .where(UsageStats.subscription_id == subscription_id)
+        .values({field: func.greatest(func.coalesce(column, 0) + count, 0)})
+        .returning(column)
+    )
+    value = result.scalar_one_or_none()
+    await session.commit()
+    return value
+
+
+async def try_increment_usage(
+    session: AsyncSession, subscription_id: int, field: str, limit: int, count: int = 1
+) -> int | None:
+    """
+    Увеличивает счётчик, только если после этого он не превысит limit.
+    Проверка и запись — одна операция, поэтому параллельные запросы не проскочат лимит.
+
+    Returns:
+        Новое значение счётчика или None, если лимит исчерпан (или статистики нет)
+    """
+    column = _counter(field)
+    result = await session.execute(
+        update(UsageStats)
+        .where(
+            UsageStats.subscription_id == subscription_id,
+            func.coalesce(column, 0) + count <= limit
+        )
+        .values({field: func.coalesce(column, 0) + count})
+        .returning(column)
+    )
+    value = result.scalar_one_or_none()
+    await session.commit()
+    return value
+
+
+async def adjust_user_usage(session: AsyncSession, user_id: int, field: str, delta: int) -> int | None:
+    """Меняет счётчик по активной подписке пользователя без отдельного запроса подписки"""
+    column = _counter(field)
+    now = datetime.now(timezone.utc)
+    active_subscription = (
+        select(Subscription.id)
+        .where(
+            Subscription.user_id == user_id,
+            Subscription.status == 'active',
+            Subscription.start_date <= now,
+            Subscription.end_date > now
+        )
+    )
+    result = await session.execute(
+        update(UsageStats)
+        .where(UsageStats.subscription_id.in_(active_subscription))
+        .values({field: func.greatest(func.coalesce(column, 0) + delta, 0)})
+        .returning(column)
+    )
+    value = result.scalars().first()
+    await session.commit()
+    return value
+
+
+async def recount_usage(session: AsyncSession, subscription_id: int, user_id: int) -> UsageStats | None:
+    """Пересчитывает денормализованные счётчики задач и каналов по исходным таблицам"""
+    active_workflows = (
+        select(func.count(UserWorkflow.id))
+        .where(UserWorkflow.user_id == user_id, UserWorkflow.status == 'active')
+        .scalar_subquery()
+    )
+    channels = select(func.count(SocialAccount.id)).where(SocialAccount.user_id == user_id).scalar_subquery()
+    result = await session.execute(
+        update(UsageStats)
+        .where(UsageStats.subscription_id == subscription_id)
+        .values(active_workflows=active_workflows, channels_connected=channels)
+        .returning(UsageStats)
+    )
+    stats = result.scalar_one_or_none()
+    await session.commit()
+    return stats
+
+
 async def increment_posts_used(session: AsyncSession, subscription_id: int, count: int = 1) -> bool:
     """Увеличить количество использованных постов"""
-    stats = await get_usage_stats_by_subscription_id(session, subscription_id)
-    if not stats:
-        return False
-    
-    stats.posts_used += count
-    await session.commit()
-    return True
+    return await increment_usage(session, subscription_id, "posts_used", count) is not None
 
 async def increment_manual_posts_used(session: AsyncSession, subscription_id: int, count: int = 1) -> bool:
     """Увеличить количество использованных ручных постов"""
-    stats = await get_usage_stats_by_subscription_id(session, subscription_id)
-    if not stats:
-        return False
-    
-    stats.manual_posts_used += count
-    await session.commit()
-    return True
+    return await increment_usage(session, subscription_id, "manual_posts_used", count) is not None
 
 async def increment_channels_connected(session: AsyncSession, subscription_id: int, count: int = 1) -> bool:
     """Увеличить количество подключенных каналов"""
-    stats = await get_usage_stats_by_subscription_id(session, subscription_id)
-    if not stats:
-        return False
-    
-    stats.channels_connected += count
-    await session.commit()
-    return True
+    return await increment_usage(session, subscription_id, "channels_connected", count) is not None
 
 async def reset_usage_stats(session: AsyncSession, subscription_id: int) -> bool:
     """Сбросить статистику использования"""
@@ -1,7 +1,11 @@
-from sqlalchemy import select
+from sqlalchemy import select, update
 from sqlalchemy.ext.asyncio import AsyncSession
 from bot.models.models import User
-from bot.utils.referral import generate_unique_referral_code, is_referral_code_unique, get_user_by_referral_code, validate_referral_code
+from bot.services.cache.user_cache import invalidate_user_cache
+from bot.utils.referral import (
+    generate_unique_referral_code, is_referral_code_unique, get_user_by_referral_code, validate_referral_code,
+    encode_referral_code, next_user_id,
+)
 
 ALLOWED_FIELDS = {
     "name", "email", "password", "username", "language", "timezone", "role", 
@@ -41,6 +45,7 @@ async def update_user(session: AsyncSession, user_id: int, **kwargs) -> User | N
 
     await session.commit()
     await session.refresh(user)
+    await invalidate_user_cache(user.telegram_id)
     return user
 
 async def delete_user(session: AsyncSession, user_id: int) -> bool:
@@ -52,6 +57,63 @@ async def delete_user(session: AsyncSession, user_id: int) -> bool:
     await session.commit()
     return True
 
+# Сколько перестановок пробуем, если код совпал со старым случайным кодом
+REFERRAL_CODE_ATTEMPTS = 3
+
+
+def _insert_statement(session: AsyncSession):
+    if session.bind is not None and session.bind.dialect.name == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert
+    else:
+        from sqlalchemy.dialects.postgresql import insert
+    return insert(User)
+
+
+async def _insert_user(session: AsyncSession, values: dict, tweak: int = 0) -> User | None:
+    """
+    Создаёт пользователя сразу с реферальным кодом: ID берётся из последовательности
+    до вставки, код вычисляется из него. INSERT ... ON CONFLICT DO NOTHING возвращает
+    None, если занят telegram_id или код — без предварительных SELECT.
+    """
+    user_id = await next_user_id(session)
+    if user_id is not None:
+        values = {**values, "id": user_id, "referral_code": encode_referral_code(user_id, tweak)}
+    result = await session.execute(
+        _insert_statement(session).values(**values).on_conflict_do_nothing().returning(User.id)
+    )
+    new_id = result.scalar_one_or_none()
+    await session.commit()
+    if new_id is None:
+        return None
+    user = await get_user_by_id(session, new_id)
+    if user_id is None:
+        # СУБД без последовательностей: код по ID уже после вставки
+        await assign_referral_code(session, user)
+    return user
+
+
+async def assign_referral_code(session: AsyncSession, user: User) -> str | None:
+    """Назначает пользователю код из его ID; при совпадении со старым кодом берёт другую перестановку"""
+    for tweak in range(REFERRAL_CODE_ATTEMPTS):
+        code = encode_referral_code(user.id, tweak)
+        result = await session.execute(
+            update(User)
+            .where(
+                User.id == user.id,
+                User.referral_code.is_(None),
+                ~select(User.id).where(User.referral_code == code).exists()
+            )
+            .values(referral_code=code)
+            .returning(User.referral_code)
+        )
+        assigned = result.scalar_one_or_none()
+        await session.commit()
+        if assigned:
+            await session.refresh(user)
+            return assigned
+    return None
+
+
 async def get_or_create_user(
     session: AsyncSession,
     telegram_id: int,
@@ -71,49 +133,25 @@ async def get_or_create_user(
                 # Если код не найден, сбрасываем его
                 ref_code = None
         
-        # Генерируем уникальный реферальный код для нового пользователя
-        # ПОВТОРЯЕМ ПОПЫТКИ ДО УСПЕХА - пользователь НЕ ДОЛЖЕН создаваться без кода!
-        referral_code = None
-        max_attempts = 50  # Увеличиваем количество попыток
-        
-        for attempt in range(max_attempts):
-            referral_code = await generate_unique_referral_code(session, length=8)
-            if referral_code:
+        # Реферальный код — биекция от ID, поэтому проверять его заранее не нужно:
+        # редкую коллизию со старым случайным кодом отсекает уникальный индекс (ON CONFLICT)
+        for tweak in range(REFERRAL_CODE_ATTEMPTS):
+            user = await _insert_user(session, dict(
+                telegram_id=telegram_id,
+                name=full_name,
+                username=username,
+                referred_by_id=referred_by_user.id if referred_by_user else None,
+            ), tweak)
+            if user:
                 break
-            print(f"Попытка {attempt + 1}/{max_attempts}: Не удалось сгенерировать реферальный код для пользователя {telegram_id}")
+            # Пользователя мог одновременно создать параллельный /start
+            user = await get_user_by_telegram_id(session, telegram_id)
+            if user:
+                return user
         
-        if not referral_code:
-            # Если все попытки исчерпаны, создаем код вручную
-            import random
-            import string
-            for attempt in range(100):
-                # Генерируем код вручную
-                chars = string.ascii_uppercase + string.digits
-                chars = chars.replace('0', '').replace('O', '').replace('1', '').replace('I', '')
-                manual_code = ''.join(random.choice(chars) for _ in range(8))
-                
-                # Проверяем уникальность
-                existing_user = await get_user_by_referral_code(session, manual_code)
-                if not existing_user:
-                    referral_code = manual_code
-                    print(f"Создан реферальный код вручную: {manual_code}")
-                    break
-        
-        if not referral_code:
+        if not user:
             raise Exception(f"КРИТИЧЕСКАЯ ОШИБКА: Не удалось создать реферальный код для пользователя {telegram_id} после всех попыток!")
         
-        user = User(
-            telegram_id=telegram_id,
-            name=full_name,
-            username=username,
-            language=default_lang,
-            referred_by_id=referred_by_user.id if referred_by_user else None,
-            referral_code=referral_code  # ← Теперь ВСЕГДА будет код!
-        )
-        session.add(user)
-        await session.commit()
-        await session.refresh(user)
-        
         # Если есть пригласитель, добавляем бонусы
         if referred_by_user:
             await add_referral_bonus(session, referred_by_user.id, user.id)
@@ -127,14 +165,8 @@ async def get_or_create_user(
             await session.refresh(user)
             
             # Если у пользователя нет реферального кода, генерируем его
-            if not user.referral_code:
-                referral_code = await generate_unique_referral_code(session, length=8)
-                if referral_code:
-                    user.referral_code = referral_code
-                    await session.commit()
-                    await session.refresh(user)
-                else:
-                    print(f"Warning: Не удалось сгенерировать реферальный код для существующего пользователя {user.id}")
+            if not user.referral_code and not await assign_referral_code(session, user):
+                print(f"Warning: Не удалось сгенерировать реферальный код для существующего пользователя {user.id}")
         else:
             # Если код не найден, игнорируем его
             pass
@@ -165,17 +197,8 @@ async def generate_user_referral_code(session: AsyncSession, user_id: int) -> st
     if user.referral_code:
         return user.referral_code
     
-    # Генерируем новый уникальный код
-    referral_code = await generate_unique_referral_code(session)
-    if not referral_code:
-        return None
-    
-    # Сохраняем код
-    user.referral_code = referral_code
-    await session.commit()
-    await session.refresh(user)
-    
-    return referral_code
+    # Код из ID пользователя, без перебора случайных кандидатов
+    return await assign_referral_code(session, user)
 
 
 async def update_user_referral_code(session: AsyncSession, user_id: int, new_code: str) -> bool:
@@ -241,17 +264,13 @@ async def generate_referral_codes_for_existing_users(session: AsyncSession, batc
     generated_count = 0
     
     for user in users_without_codes[:batch_size]:
-        referral_code = await generate_unique_referral_code(session)
+        referral_code = await assign_referral_code(session, user)
         if referral_code:
-            user.referral_code = referral_code
             generated_count += 1
             print(f"Generated referral code {referral_code} for user {user.id}")
         else:
             print(f"Failed to generate referral code for user {user.id}")
     
-    if generated_count > 0:
-        await session.commit()
-    
     return generated_count
 
 async def get_users_by_role(session: AsyncSession, role: str) -> list[User]:
@@ -401,15 +420,43 @@ async def increment_free_posts_used(session: AsyncSession, user_id: int) -> bool
         user_id: ID пользователя
     
     Returns:
-        True, если счетчик успешно увеличен, False - если произошла ошибка
+        True, если счетчик успешно увеличен, False - если лимит исчерпан или пользователь не найден
     """
-    user = await get_user_by_id(session, user_id)
-    if not user:
-        return False
+    return await try_use_free_post(session, user_id) is not None
+
+async def try_use_free_post(session: AsyncSession, user_id: int) -> int | None:
+    """
+    Атомарно списывает бесплатный пост, если лимит ещё не исчерпан
     
-    user.free_posts_used += 1
+    Returns:
+        Количество оставшихся бесплатных постов или None, если списать нельзя
+    """
+    result = await session.execute(
+        update(User)
+        .where(User.id == user_id, User.free_posts_used < User.free_posts_limit)
+        .values(free_posts_used=User.free_posts_used + 1)
+        .returning(User.telegram_id, User.free_posts_limit - User.free_posts_used)
+    )
+    row = result.first()
     await session.commit()
-    await session.refresh(user)
+    if row is None:
+        return None
+    await invalidate_user_cache(row[0])
+    return max(0, row[1])
+
+async def refund_free_post(session: AsyncSession, user_id: int) -> bool:
+    """Возвращает списанный бесплатный пост (пост так и не был создан)"""
+    result = await session.execute(
+        update(User)
+        .where(User.id == user_id, User.free_posts_used > 0)
+        .values(free_posts_used=User.free_posts_used - 1)
+        .returning(User.telegram_id)
+    )
+    telegram_id = result.scalar_one_or_none()
+    await session.commit()
+    if telegram_id is None:
+        return False
+    await invalidate_user_cache(telegram_id)
     return True
 
 async def get_free_posts_remaining(session: AsyncSession, user_id: int) -> int:
@@ -470,6 +517,12 @@ async def get_free_posts_info(session: AsyncSession, user_id: int) -> dict:
     }
 
 
+async def _invalidate_free_posts(user: User):
+    from bot.services.entitlements import invalidate_limit_state
+    await invalidate_user_cache(user.telegram_id)
+    await invalidate_limit_state(user.id)
+
+
 async def set_free_posts_limit(session: AsyncSession, user_id: int, limit: int) -> bool:
     """Устанавливает индивидуальный лимит бесплатных постов для пользователя"""
     if limit < 0:
@@ -482,6 +535,7 @@ async def set_free_posts_limit(session: AsyncSession, user_id: int, limit: int)
     user.free_posts_limit = limit
     await session.commit()
     await session.refresh(user)
+    await _invalidate_free_posts(user)
     return True
 
 
@@ -497,6 +551,7 @@ async def add_free_posts(session: AsyncSession, user_id: int, count: int) -> boo
     user.free_posts_limit += count
     await session.commit()
     await session.refresh(user)
+    await _invalidate_free_posts(user)
     return True
 
 
@@ -537,8 +592,7 @@ async def clear_user_cache(redis, telegram_id: int) -> bool:
         return False
     
     try:
-        await redis.delete(f"user:{telegram_id}")
-        return True
+        return await invalidate_user_cache(telegram_id)
     except Exception as e:
         print(f"Ошибка очистки кэша пользователя: {e}")
         import traceback
@@ -602,6 +656,7 @@ async def add_referral_bonus(session: AsyncSession, referrer_id: int, referred_i
         
         await session.commit()
         await session.refresh(referred_user)
+        await invalidate_user_cache(referred_user.telegram_id)
         
         return True
         
@@ -641,9 +696,8 @@ async def add_balance_to_user(session: AsyncSession, user_id: int, amount: float
         await session.commit()
         await session.refresh(user)
         
-        # Очищаем кеш пользователя, если передан redis клиент
-        if redis and user.telegram_id:
-            await clear_user_cache(redis, user.telegram_id)
+        # Сбрасываем кеш пользователя во всех репликах
+        await invalidate_user_cache(user.telegram_id)
         
         return True
         
@@ -687,9 +741,8 @@ async def add_referrer_bonus_from_payment(session: AsyncSession, referred_user_i
         await session.commit()
         await session.refresh(referrer)
         
-        # Очищаем кеш пригласившего, если передан redis клиент
-        if redis and referrer.telegram_id:
-            await clear_user_cache(redis, referrer.telegram_id)
+        # Сбрасываем кеш пригласившего во всех репликах
+        await invalidate_user_cache(referrer.telegram_id)
         
         return True
         
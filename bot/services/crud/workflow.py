@@ -1,6 +1,7 @@
 from sqlalchemy.future import select
 from sqlalchemy.ext.asyncio import AsyncSession
 from bot.models.models import UserWorkflow
+from bot.services.profile import invalidate_profile_summary
 
 ALLOWED_FIELDS = {"user_id", "workflow_id", "name", "status"}
 
@@ -9,6 +10,7 @@ async def create_user_workflow(session: AsyncSession, **kwargs) -> UserWorkflow:
     session.add(workflow)
     await session.commit()
     await session.refresh(workflow)
+    await invalidate_profile_summary(workflow.user_id)
     return workflow
 
 async def get_user_workflow_by_id(session: AsyncSession, workflow_id: int) -> UserWorkflow | None:
@@ -28,14 +30,21 @@ async def update_user_workflow(session: AsyncSession, workflow_id: int, **kwargs
             setattr(workflow, key, value)
     await session.commit()
     await session.refresh(workflow)
+    await invalidate_profile_summary(workflow.user_id)
     return workflow
 
 async def delete_user_workflow(session: AsyncSession, workflow_id: int) -> bool:
     workflow = await get_user_workflow_by_id(session, workflow_id)
     if not workflow:
         return False
+    user_id = workflow.user_id
+    was_active = workflow.status == "active"
     await session.delete(workflow)
     await session.commit()
+    if was_active:
+        from bot.services.entitlements import release_workflow_slot
+        await release_workflow_slot(session, user_id)
+    await invalidate_profile_summary(user_id)
     return True
 
 async def get_user_workflows_by_user_id(session: AsyncSession, user_id: int) -> list[UserWorkflow]:
@@ -61,30 +70,35 @@ async def toggle_workflow_status(session, user_id: int, workflow_id: int) -> tup
     if not workflow:
         return None, "Workflow not found"
 
+    from bot.services.entitlements import get_limit_state, acquire_workflow_slot, release_workflow_slot
+
+    was_active = workflow.status == "active"
     # Если пытаемся активировать задачу
-    if workflow.status == "inactive":
-        # Проверяем активную подписку пользователя
-        from bot.services.crud.subscription import get_user_active_subscription
-        active_subscription = await get_user_active_subscription(session, user_id)
-        
-        if not active_subscription:
+    if not was_active:
+        # Подписка и счётчик активных задач — из кэша лимитов
+        state = await get_limit_state(session, user_id)
+        if not state or not state.has_subscription:
             return None, "no_subscription"
         
-        # Получаем лимит каналов из подписки
-        channels_limit = active_subscription.plan.channels_limit
-        
-        # Считаем уже активные задачи
-        active_workflows = await get_active_workflows_by_user_id(session, user_id)
-        active_count = len(active_workflows)
-        
-        # Проверяем лимит
-        if active_count >= channels_limit:
+        # Проверка лимита и увеличение счётчика — один атомарный UPDATE
+        if not await acquire_workflow_slot(session, state):
             return None, "limit_exceeded"
     
     # Переключаем статус
-    workflow.status = "inactive" if workflow.status == "active" else "active"
-    await session.commit()
+    workflow.status = "inactive" if was_active else "active"
+    try:
+        await session.commit()
+    except Exception:
+        await session.rollback()
+        if not was_active:
+            # Задача не включилась — возвращаем занятый слот
+            await release_workflow_slot(session, user_id)
+        raise
+    # Слот освобождаем только после того, как выключение задачи закоммичено
+    if was_active:
+        await release_workflow_slot(session, user_id)
     await session.refresh(workflow)
+    await invalidate_profile_summary(workflow.user_id)
     return workflow, None
 
 async def get_active_workflows_by_user_id(session: AsyncSession, user_id: int) -> list[UserWorkflow]:
@@ -1,16 +1,64 @@
+from datetime import datetime, timezone, timedelta
+from sqlalchemy import update
 from sqlalchemy.future import select
 from sqlalchemy.ext.asyncio import AsyncSession
-from bot.models.models import WorkflowSettings
+from bot.models.models import WorkflowSettings, UserWorkflow, Subscription
 
 ALLOWED_FIELDS = {
     "social_account_id", "interval_hours", "theme", "context", "writing_style",
     "generation_method", "content_length", "moderation", "first_post_time",
     "post_language", "post_media_type", "notifications_enabled", "last_execution",
     "mode",  # Новое поле для режима работы
-    "prompt_template_id"  # Связанный шаблон промпта по умолчанию
+    "prompt_template_id",  # Связанный шаблон промпта по умолчанию
+    "next_run_at", "content_memory"
 }
 
+# Режимы, в которых задача сама генерирует посты по расписанию
+AUTO_MODES = ('auto', 'mixed')
+
+# Формат first_post_time, который понимает compute_next_run_at
+FIRST_POST_TIME_PATTERN = r'^([01]?[0-9]|2[0-3]):[0-5][0-9]$'
+
+
+def compute_next_run_at(
+    first_post_time: str | None, interval_hours: int | None, after: datetime, anchor: datetime | None = None
+) -> datetime | None:
+    """
+    Возвращает ближайший слот origin + k*interval_hours строго позже after (UTC)
+
+    Сетка слотов привязана к одной неподвижной точке origin — first_post_time в день anchor
+    (дата создания задачи). Если строить её заново от дня очередного слота, интервалы,
+    не делящие сутки (16, 20, 36 ч), сбиваются на каждой смене даты.
+
+    Args:
+        first_post_time: Время первого поста 'HH:MM' (UTC)
+        interval_hours: Интервал между постами в часах
+        after: Момент, после которого ищется слот
+        anchor: День начала сетки — created_at задачи (по умолчанию — after)
+    """
+    if not first_post_time or not interval_hours:
+        return None
+    base = (anchor or after).astimezone(timezone.utc)
+    try:
+        hour, minute = map(int, first_post_time.split(":"))
+        origin = base.replace(hour=hour, minute=minute, second=0, microsecond=0)
+    except (ValueError, AttributeError):
+        return None
+    if after < origin:
+        return origin
+
+    step = timedelta(hours=interval_hours)
+    k = (after - origin) // step + 1
+    return origin + k * step
+
+
 async def create_workflow_settings(session: AsyncSession, **kwargs) -> WorkflowSettings:
+    # created_at — начало сетки слотов, поэтому задаём его явно тем же моментом
+    now = kwargs.setdefault("created_at", datetime.now(timezone.utc))
+    if "next_run_at" not in kwargs:
+        kwargs["next_run_at"] = compute_next_run_at(
+            kwargs.get("first_post_time"), kwargs.get("interval_hours"), now, anchor=now
+        )
     settings = WorkflowSettings(**kwargs)
     session.add(settings)
     await session.commit()
@@ -32,6 +80,11 @@ async def update_workflow_settings(session: AsyncSession, settings_id: int, **kw
     for key, value in kwargs.items():
         if key in ALLOWED_FIELDS:
             setattr(settings, key, value)
+    # Смена расписания — пересчитываем следующий слот
+    if ("first_post_time" in kwargs or "interval_hours" in kwargs) and "next_run_at" not in kwargs:
+        settings.next_run_at = compute_next_run_at(
+            settings.first_post_time, settings.interval_hours, datetime.now(timezone.utc), anchor=settings.created_at
+        )
     await session.commit()
     await session.refresh(settings)
     return settings
@@ -93,7 +146,6 @@ async def get_settings_by_moderation_status(session: AsyncSession, moderation: s
     return result.scalars().all()
 
 async def update_last_execution(session: AsyncSession, settings_id: int) -> WorkflowSettings | None:
-    from datetime import datetime, timezone
     settings = await get_workflow_settings_by_id(session, settings_id)
     if not settings:
         return None
@@ -104,6 +156,97 @@ async def update_last_execution(session: AsyncSession, settings_id: int) -> Work
     return settings
 
 
+async def bulk_update_workflow_settings(session: AsyncSession, rows: list[dict]) -> None:
+    """
+    Пакетно обновляет настройки одним executemany (без коммита)
+
+    Args:
+        rows: Список словарей вида {"id": settings_id, <поле>: <значение>, ...}
+    """
+    if rows:
+        await session.execute(update(WorkflowSettings), rows)
+
+
+def due_workflow_settings_query(horizon: datetime, limit: int):
+    """
+    Активные задачи, у которых слот наступает до horizon, — только у пользователей
+    с действующей подпиской: без неё автопостинг не генерирует посты.
+    Строки блокируются (FOR UPDATE SKIP LOCKED), чтобы несколько инстансов не взяли одну задачу.
+    """
+    now = datetime.now(timezone.utc)
+    has_active_subscription = (
+        select(Subscription.id)
+        .where(
+            Subscription.user_id == UserWorkflow.user_id,
+            Subscription.status == 'active',
+            Subscription.start_date <= now,
+            Subscription.end_date > now
+        )
+        .exists()
+    )
+    return (
+        select(WorkflowSettings, UserWorkflow.user_id)
+        .join(UserWorkflow, WorkflowSettings.user_workflow_id == UserWorkflow.id)
+        .where(
+            UserWorkflow.status == 'active',
+            WorkflowSettings.mode.in_(AUTO_MODES),
+            WorkflowSettings.next_run_at <= horizon,
+            has_active_subscription
+        )
+        .order_by(WorkflowSettings.next_run_at)
+        .limit(limit)
+        .with_for_update(of=WorkflowSettings, skip_locked=True)
+    )
+
+
+async def claim_due_workflow_settings(
+    session: AsyncSession, horizon: datetime, limit: int
+) -> list[tuple[WorkflowSettings, int]]:
+    """
+    Выбирает одним запросом задачи, у которых наступил слот (см. due_workflow_settings_query)
+
+    Returns:
+        Список пар (WorkflowSettings, user_id)
+    """
+    result = await session.execute(due_workflow_settings_query(horizon, limit))
+    return [(row.WorkflowSettings, row.user_id) for row in result.all()]
+
+
+def missing_next_run_query(limit: int):
+    """
+    Задачи без next_run_at, для которых расписание можно вычислить.
+    Строки без времени первого поста или с нераспознаваемым временем не выбираются,
+    иначе они попадали бы в выборку на каждом тике.
+    """
+    return (
+        select(WorkflowSettings.id, WorkflowSettings.first_post_time,
+               WorkflowSettings.interval_hours, WorkflowSettings.last_execution,
+               WorkflowSettings.created_at)
+        .where(
+            WorkflowSettings.next_run_at.is_(None),
+            WorkflowSettings.mode.in_(AUTO_MODES),
+            WorkflowSettings.interval_hours > 0,
+            WorkflowSettings.first_post_time.regexp_match(FIRST_POST_TIME_PATTERN)
+        )
+        .limit(limit)
+    )
+
+
+async def init_missing_next_runs(session: AsyncSession, limit: int = 1000) -> int:
+    """Заполняет next_run_at для задач, созданных до появления индекса расписания"""
+    result = await session.execute(missing_next_run_query(limit))
+    now = datetime.now(timezone.utc)
+    rows = []
+    for settings_id, first_post_time, interval_hours, last_execution, created_at in result.all():
+        next_run_at = compute_next_run_at(first_post_time, interval_hours, last_execution or now, anchor=created_at)
+        if next_run_at:
+            rows.append({"id": settings_id, "next_run_at": next_run_at})
+    if rows:
+        await bulk_update_workflow_settings(session, rows)
+        await session.commit()
+    return len(rows)
+
+
 # Новые функции для работы с режимом задачи
 async def get_workflows_by_mode(session: AsyncSession, mode: str) -> list[WorkflowSettings]:
     """Получает задачи по режиму работы"""
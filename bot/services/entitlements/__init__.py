@@ -0,0 +1,21 @@
+from .limits import (
+    LimitState,
+    get_limit_state,
+    invalidate_limit_state,
+    consume_post,
+    refund_post,
+    acquire_workflow_slot,
+    release_workflow_slot,
+    adjust_channels,
+)
+
+__all__ = [
+    "LimitState",
+    "get_limit_state",
+    "invalidate_limit_state",
+    "consume_post",
+    "refund_post",
+    "acquire_workflow_slot",
+    "release_workflow_slot",
+    "adjust_channels",
+]
@@ -0,0 +1,231 @@
+import json
+import logging
+from dataclasses import dataclass, asdict
+from datetime import datetime, timezone
+from typing import Optional
+
+from sqlalchemy import select, and_
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from bot import config
+from bot.models.models import User, Subscription, Plan, UsageStats
+from bot.services.crud.usage_stats import (
+    create_usage_stats,
+    recount_usage,
+    try_increment_usage,
+    increment_usage,
+    adjust_user_usage,
+)
+from bot.services.crud.user import try_use_free_post, refund_free_post
+
+logger = logging.getLogger(__name__)
+
+
+def _limits_key(user_id: int) -> str:
+    return f"limits:{user_id}"
+
+
+@dataclass
+class LimitState:
+    """Лимиты пользователя и их использование: подписка, счётчики и бесплатные посты"""
+    user_id: int
+    free_posts_used: int = 0
+    free_posts_limit: int = 0
+    subscription_id: Optional[int] = None
+    plan_name: Optional[str] = None
+    ai_priority: bool = False
+    posts_limit: int = 0
+    manual_posts_limit: int = 0
+    channels_limit: int = 0
+    posts_used: int = 0
+    manual_posts_used: int = 0
+    channels_connected: int = 0
+    active_workflows: int = 0
+
+    @property
+    def has_subscription(self) -> bool:
+        return self.subscription_id is not None
+
+    @property
+    def free_posts_remaining(self) -> int:
+        return max(0, self.free_posts_limit - self.free_posts_used)
+
+    @property
+    def can_create_post(self) -> bool:
+        if self.has_subscription:
+            return self.posts_used < self.posts_limit
+        return self.free_posts_remaining > 0
+
+    @property
+    def can_activate_workflow(self) -> bool:
+        return self.has_subscription and self.active_workflows < self.channels_limit
+
+
+def limit_state_query(user_id: int):
+    """Пользователь + активная подписка + план + счётчики одним запросом"""
+    now = datetime.now(timezone.utc)
+    return (
+        select(
+            User.free_posts_used, User.free_posts_limit,
+            Subscription.id.label("subscription_id"), Plan.name.label("plan_name"), Plan.ai_priority,
+            Plan.posts_limit, Plan.manual_posts_limit, Plan.channels_limit,
+            UsageStats.id.label("usage_id"), UsageStats.posts_used, UsageStats.manual_posts_used,
+            UsageStats.channels_connected, UsageStats.active_workflows,
+        )
+        .select_from(User)
+        .outerjoin(Subscription, and_(
+            Subscription.user_id == User.id,
+            Subscription.status == 'active',
+            Subscription.start_date <= now,
+            Subscription.end_date > now
+        ))
+        .outerjoin(Plan, Plan.id == Subscription.plan_id)
+        .outerjoin(UsageStats, UsageStats.subscription_id == Subscription.id)
+        .where(User.id == user_id)
+        .order_by(Subscription.end_date.desc().nulls_last())
+        .limit(1)
+    )
+
+
+async def load_limit_state(session: AsyncSession, user_id: int) -> Optional[LimitState]:
+    row = (await session.execute(limit_state_query(user_id))).mappings().first()
+    if row is None:
+        return None
+
+    row = dict(row)
+    if row["subscription_id"] is not None and (row["usage_id"] is None or row["active_workflows"] is None):
+        # Статистики ещё нет или счётчики не материализованы — считаем их один раз
+        if row["usage_id"] is None:
+            try:
+                await create_usage_stats(session, subscription_id=row["subscription_id"], posts_used=0, manual_posts_used=0)
+            except IntegrityError:
+                # Статистику уже создал параллельный запрос
+                await session.rollback()
+        stats = await recount_usage(session, row["subscription_id"], user_id)
+        if stats is not None:
+            row.update(
+                posts_used=stats.posts_used, manual_posts_used=stats.manual_posts_used,
+                channels_connected=stats.channels_connected, active_workflows=stats.active_workflows,
+            )
+
+    return LimitState(
+        user_id=user_id,
+        free_posts_used=row["free_posts_used"] or 0,
+        free_posts_limit=row["free_posts_limit"] or 0,
+        subscription_id=row["subscription_id"],
+        plan_name=row["plan_name"],
+        ai_priority=bool(row["ai_priority"]),
+        posts_limit=row["posts_limit"] or 0,
+        manual_posts_limit=row["manual_posts_limit"] or 0,
+        channels_limit=row["channels_limit"] or 0,
+        posts_used=row["posts_used"] or 0,
+        manual_posts_used=row["manual_posts_used"] or 0,
+        channels_connected=row["channels_connected"] or 0,
+        active_workflows=row["active_workflows"] or 0,
+    )
+
+
+async def get_limit_state(session: AsyncSession, user_id: int, redis=None) -> Optional[LimitState]:
+    """Состояние лимитов из Redis, а при промахе — одним запросом к БД"""
+    if redis is None:
+        from db.connection import get_redis
+        redis = await get_redis()
+
+    try:
+        cached = await redis.get(_limits_key(user_id))
+        if cached:
+            return LimitState(**json.loads(cached))
+    except Exception as e:
+        logger.warning(f"Limit state cache unavailable: {e}")
+
+    state = await load_limit_state(session, user_id)
+    if state is not None:
+        try:
+            await redis.set(_limits_key(user_id), json.dumps(asdict(state)), ex=config.LIMIT_STATE_TTL)
+        except Exception as e:
+            logger.warning(f"Limit state cache write failed: {e}")
+    return state
+
+
+async def invalidate_limit_state(user_id: Optional[int]) -> bool:
+    if not user_id:
+        return False
+    try:
+        from db.connection import get_redis
+        redis = await get_redis()
+        await redis.delete(_limits_key(user_id))
+        return True
+    except Exception as e:
+        logger.warning(f"Limit state invalidation failed: {e}")
+        return False
+
+
+async def consume_post(session: AsyncSession, state: LimitState, is_manual: bool = False) -> bool:
+    """
+    Списывает один пост из лимита подписки или из бесплатных постов.
+    Проверка лимита выполняется в самом UPDATE, поэтому два параллельных поста не превысят его.
+    """
+    if state.has_subscription:
+        if is_manual:
+            # Ручной пост списывается и из manual_posts_limit, и из общего лимита
+            manual_used = await try_increment_usage(
+                session, state.subscription_id, "manual_posts_used", state.manual_posts_limit
+            )
+            if manual_used is None:
+                return False
+        used = await try_increment_usage(session, state.subscription_id, "posts_used", state.posts_limit)
+        if used is None:
+            if is_manual:
+                # Общий лимит исчерпан — возвращаем уже списанный ручной пост
+                await increment_usage(session, state.subscription_id, "manual_posts_used", -1)
+                await invalidate_limit_state(state.user_id)
+            return False
+        state.posts_used = used
+        if is_manual:
+            state.manual_posts_used = manual_used
+    else:
+        remaining = await try_use_free_post(session, state.user_id)
+        if remaining is None:
+            return False
+        state.free_posts_used = state.free_posts_limit - remaining
+
+    await invalidate_limit_state(state.user_id)
+    return True
+
+
+async def refund_post(session: AsyncSession, state: LimitState, is_manual: bool = False):
+    """Возвращает пост, списанный consume_post, если создать его не удалось"""
+    if state.has_subscription:
+        state.posts_used = await increment_usage(session, state.subscription_id, "posts_used", -1) or 0
+        if is_manual:
+            state.manual_posts_used = await increment_usage(
+                session, state.subscription_id, "manual_posts_used", -1
+            ) or 0
+    elif await refund_free_post(session, state.user_id):
+        state.free_posts_used = max(0, state.free_posts_used - 1)
+    await invalidate_limit_state(state.user_id)
+
+
+async def acquire_workflow_slot(session: AsyncSession, state: LimitState) -> bool:
+    """Занимает слот активной задачи в пределах channels_limit плана"""
+    if not state.has_subscription:
+        return False
+    active = await try_increment_usage(session, state.subscription_id, "active_workflows", state.channels_limit)
+    if active is None:
+        return False
+    state.active_workflows = active
+    await invalidate_limit_state(state.user_id)
+    return True
+
+
+async def release_workflow_slot(session: AsyncSession, user_id: int):
+    """Освобождает слот активной задачи (задача выключена или удалена)"""
+    await adjust_user_usage(session, user_id, "active_workflows", -1)
+    await invalidate_limit_state(user_id)
+
+
+async def adjust_channels(session: AsyncSession, user_id: int, delta: int):
+    """Учитывает подключение (+1) или удаление (-1) канала"""
+    await adjust_user_usage(session, user_id, "channels_connected", delta)
+    await invalidate_limit_state(user_id)
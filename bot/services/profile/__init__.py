@@ -0,0 +1,11 @@
+from .summary import (
+    get_profile_summary,
+    invalidate_profile_summary,
+    invalidate_profile_summary_for_workflow,
+)
+
+__all__ = [
+    "get_profile_summary",
+    "invalidate_profile_summary",
+    "invalidate_profile_summary_for_workflow",
+]
@@ -0,0 +1,113 @@
+import json
+import logging
+from typing import Optional
+
+from sqlalchemy import select, func
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import aliased
+
+from bot import config
+from bot.models.models import Post, UserWorkflow, SocialAccount, Subscription, Plan, User
+
+logger = logging.getLogger(__name__)
+
+
+def _summary_key(user_id: int) -> str:
+    return f"profile:summary:{user_id}"
+
+
+def profile_summary_query(user_id: int):
+    """
+    Вся статистика экрана профиля одним запросом: счётчики — скалярными подзапросами,
+    пригласивший пользователь — через LEFT JOIN.
+    """
+    user_posts = (
+        select(func.count(Post.id))
+        .join(UserWorkflow, Post.user_workflow_id == UserWorkflow.id)
+        .where(UserWorkflow.user_id == user_id)
+    )
+    user_workflows = select(func.count(UserWorkflow.id)).where(UserWorkflow.user_id == user_id)
+    active_subscription = (
+        select(Plan.name, Subscription.end_date)
+        .join(Plan, Plan.id == Subscription.plan_id)
+        .where(
+            Subscription.user_id == user_id,
+            Subscription.status == 'active',
+            Subscription.end_date > func.now()
+        )
+        .order_by(Subscription.end_date.desc())
+        .limit(1)
+    )
+    referrer = aliased(User)
+
+    return (
+        select(
+            user_posts.scalar_subquery().label("total_posts"),
+            user_posts.where(Post.status == 'published').scalar_subquery().label("published_posts"),
+            user_workflows.scalar_subquery().label("total_workflows"),
+            user_workflows.where(UserWorkflow.status == 'active').scalar_subquery().label("active_workflows"),
+            select(func.count(SocialAccount.id)).where(SocialAccount.user_id == user_id)
+            .scalar_subquery().label("total_accounts"),
+            active_subscription.with_only_columns(Plan.name).scalar_subquery().label("plan_name"),
+            active_subscription.with_only_columns(Subscription.end_date).scalar_subquery().label("subscription_end"),
+            referrer.name.label("referrer_name"),
+        )
+        .select_from(User)
+        .outerjoin(referrer, referrer.id == User.referred_by_id)
+        .where(User.id == user_id)
+    )
+
+
+async def load_profile_summary(session: AsyncSession, user_id: int) -> dict:
+    row = (await session.execute(profile_summary_query(user_id))).mappings().first()
+    if row is None:
+        return {}
+    summary = dict(row)
+    if summary["subscription_end"] is not None:
+        summary["subscription_end"] = summary["subscription_end"].isoformat()
+    return summary
+
+
+async def get_profile_summary(session: AsyncSession, user_id: int, redis=None) -> dict:
+    """
+    Сводка профиля из Redis, а при промахе — одним запросом к БД.
+    subscription_end возвращается строкой ISO 8601 (или None).
+    """
+    if redis is None:
+        from db.connection import get_redis
+        redis = await get_redis()
+
+    try:
+        cached = await redis.get(_summary_key(user_id))
+        if cached:
+            return json.loads(cached)
+    except Exception as e:
+        logger.warning(f"Profile summary cache unavailable: {e}")
+
+    summary = await load_profile_summary(session, user_id)
+    try:
+        await redis.set(_summary_key(user_id), json.dumps(summary), ex=config.PROFILE_SUMMARY_TTL)
+    except Exception as e:
+        logger.warning(f"Profile summary cache write failed: {e}")
+    return summary
+
+
+async def invalidate_profile_summary(user_id: Optional[int]) -> bool:
+    if not user_id:
+        return False
+    try:
+        from db.connection import get_redis
+        redis = await get_redis()
+        await redis.delete(_summary_key(user_id))
+        return True
+    except Exception as e:
+        logger.warning(f"Profile summary invalidation failed: {e}")
+        return False
+
+
+async def invalidate_profile_summary_for_workflow(session: AsyncSession, workflow_id: Optional[int]) -> bool:
+    """Сбрасывает сводку владельца задачи (для изменений постов)"""
+    if not workflow_id:
+        return False
+    user_id = await session.scalar(select(UserWorkflow.user_id).where(UserWorkflow.id == workflow_id))
+    return await invalidate_profile_summary(user_id)
@@ -1,3 +1,5 @@
 from .publisher import PublishingService
+from .scheduler import PublishingScheduler
+from .send_queue import TelegramSendQueue, SendRetryLater
 
-__all__ = ["PublishingService"] 
\ No newline at end of file
+__all__ = ["PublishingService", "PublishingScheduler", "TelegramSendQueue", "SendRetryLater"]
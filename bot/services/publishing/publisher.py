@@ -1,137 +1,242 @@
 import asyncio
-from datetime import datetime, timezone
+import hashlib
+import random
+import uuid
+from datetime import datetime, timezone, timedelta
 from typing import Optional
+from sqlalchemy import func
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
 from aiogram import Bot
+from aiogram.exceptions import TelegramNetworkError, TelegramServerError
+from aiogram.types import Message
 
+from bot import config
 from bot.models.models import Post, UserWorkflow, WorkflowSettings, SocialAccount
-from bot.services.crud.post import update_post
+from bot.services.crud.post import update_post, claim_post, claim_due_posts, renew_lease
+from bot.services.crud.publication_log import start_attempt, finish_attempt, get_successful_attempt
+from bot.services.publishing.send_queue import get_send_queue, SendRetryLater
+from db.connection import AsyncSessionLocal
+
+
+# Поля, которыми пост освобождается после публикации или переноса
+RELEASE_LEASE = dict(lease_owner=None, lease_expires_at=None)
+
+
+def is_transient_error(error: Exception) -> bool:
+    """Ошибки, после которых публикацию имеет смысл повторить"""
+    return isinstance(error, (TelegramNetworkError, TelegramServerError, asyncio.TimeoutError, ConnectionError))
+
+
+def backoff_delay(attempt: int) -> float:
+    """Экспоненциальная задержка с джиттером: base * 2^(attempt-1), но не больше потолка"""
+    delay = min(config.PUBLISH_RETRY_MAX_DELAY, config.PUBLISH_RETRY_BASE_DELAY * 2 ** (attempt - 1))
+    return random.uniform(delay / 2, delay)
 
 
 class PublishingService:
     """Сервис для публикации постов в социальные сети"""
 
-    def __init__(self, bot: Bot):
+    def __init__(self, bot: Bot, concurrency: int = None, per_channel: int = None):
         self.bot = bot
+        # Общий лимит одновременных публикаций и отдельный лимит на каждый канал
+        self._semaphore = asyncio.Semaphore(concurrency or config.PUBLISH_CONCURRENCY)
+        self._per_channel = per_channel or config.PUBLISH_PER_CHANNEL_CONCURRENCY
+        self._channel_semaphores: dict = {}
+        self.send_queue = get_send_queue(bot)
+        self.instance_id = config.PUBLISHER_INSTANCE_ID
+        self.lease_seconds = config.PUBLISH_LEASE_SECONDS
 
-    async def publish_post(self, session: AsyncSession, post_id: int) -> bool:
+    def _lease_token(self) -> str:
+        """Уникальный владелец аренды для одного захвата: два захвата одного экземпляра не совпадают"""
+        return f"{uuid.uuid4().hex}@{self.instance_id}"[:100]
+
+    async def publish_post(self, session: AsyncSession, post_id: int, lease_token: Optional[str] = None) -> bool:
         """
         Публикует пост в соответствующий канал
 
+        Каждая попытка пишется в publication_logs. Временные ошибки (сеть, 5xx, таймауты)
+        переносят пост с экспоненциальной задержкой, постоянные — помечают его failed.
+
         Args:
             session: Сессия базы данных
             post_id: ID поста для публикации
+            lease_token: Токен аренды, если пост уже захвачен пачкой (run_publishing_cycle)
 
         Returns:
             bool: True если публикация успешна, False иначе
         """
+        # Захватываем пост уникальным токеном, а захваченный пачкой — продлеваем аренду этим же токеном.
+        # Пост, который уже публикует кто-то другой (или истёкшую и перехваченную аренду), пропускаем
+        if lease_token is None:
+            claimed = await claim_post(session, post_id, self._lease_token(), self.lease_seconds)
+        else:
+            claimed = await renew_lease(session, post_id, lease_token, self.lease_seconds)
+        if not claimed:
+            return False
+
+        log = None
+        attempt = 1
         try:
             # Получаем пост с всеми связанными данными
             post_data = await self._get_post_with_details(session, post_id)
             if not post_data:
+                print(f"Post {post_id} has no social account to publish to")
+                await update_post(session, post_id, status="failed", **RELEASE_LEASE)
                 return False
 
             post, workflow, settings, social_account = post_data
 
-            # Проверяем что пост готов к публикации
-            if post.status not in ["pending", "scheduled"]:
-                return False
-
-            # Публикуем в зависимости от платформы
-            success = False
-            if social_account.platform == "telegram":
-                success = await self._publish_to_telegram(post, social_account)
-            else:
+            if social_account.platform != "telegram":
                 # Здесь можно добавить поддержку других платформ
                 print(f"Platform {social_account.platform} not supported yet")
+                await update_post(session, post_id, status="failed", last_error="unsupported platform", **RELEASE_LEASE)
                 return False
 
-            if success:
-                # Обновляем статус поста
+            request_hash = self._request_hash(post, social_account)
+            # То же содержимое уже отправлено (например, процесс упал до смены статуса) — не дублируем
+            if await get_successful_attempt(session, post_id, request_hash):
+                print(f"Post {post_id} already sent, skipping duplicate")
                 await update_post(
-                    session,
-                    post_id,
-                    status="published",
-                    published_time=datetime.now(timezone.utc)
+                    session, post_id, status="published", published_time=datetime.now(timezone.utc), **RELEASE_LEASE
                 )
                 return True
-            else:
-                # Помечаем как неудачный
-                await update_post(session, post_id, status="failed")
-                return False
-                
+
+            attempt = (post.retry_count or 0) + 1
+            log = await start_attempt(session, post_id, attempt, request_hash)
+
+            message = await self._publish_to_telegram(post, social_account)
+
+            # Сначала фиксируем успешную отправку в логе: он защищает от повторной публикации
+            await finish_attempt(
+                session, log, "success",
+                response_snippet=message.model_dump_json(include={"message_id", "date", "chat"})
+            )
+            await update_post(
+                session,
+                post_id,
+                status="published",
+                published_time=datetime.now(timezone.utc),
+                external_id=str(message.message_id),
+                permalink=self._telegram_permalink(message),
+                last_error=None,
+                **RELEASE_LEASE
+            )
+            return True
+
+        except SendRetryLater as e:
+            # Упёрлись в лимит Telegram — переносим пост на время, которое назвал Bot API
+            retry_at = datetime.now(timezone.utc) + timedelta(seconds=e.retry_after)
+            print(f"Post {post_id} rate limited, rescheduled to {retry_at}")
+            if log:
+                await finish_attempt(session, log, "failed", error_code="retry_after", error_message=str(e))
+            await update_post(session, post_id, status="scheduled", scheduled_time=retry_at, **RELEASE_LEASE)
+            return False
         except Exception as e:
             print(f"Error publishing post {post_id}: {e}")
             try:
-                await update_post(session, post_id, status="failed")
+                if log:
+                    await finish_attempt(session, log, "failed", error_code=type(e).__name__, error_message=str(e))
+                if is_transient_error(e) and attempt < config.PUBLISH_MAX_RETRIES:
+                    retry_at = datetime.now(timezone.utc) + timedelta(seconds=backoff_delay(attempt))
+                    print(f"Post {post_id} will be retried at {retry_at} (attempt {attempt})")
+                    await update_post(
+                        session, post_id, status="scheduled", scheduled_time=retry_at,
+                        retry_count=attempt, last_error=str(e), **RELEASE_LEASE
+                    )
+                else:
+                    await update_post(
+                        session, post_id, status="failed", retry_count=attempt, last_error=str(e), **RELEASE_LEASE
+                    )
             except:
                 pass
             return False
-    
-    async def _get_post_with_details(self, session: AsyncSession, post_id: int):
-        """Получает пост со всеми связанными данными.
-        Поддерживает два варианта:
-        1) Пост привязан к workflow (через WorkflowSettings → SocialAccount)
-        2) Пост имеет прямую ссылку на SocialAccount (manual без workflow)
-        """
-        # Попытка №1: полный путь через workflow/settings
-        try:
-            query = (
-                select(Post, UserWorkflow, WorkflowSettings, SocialAccount)
-                .join(UserWorkflow, Post.user_workflow_id == UserWorkflow.id)
-                .join(WorkflowSettings, WorkflowSettings.user_workflow_id == UserWorkflow.id)
-                .join(SocialAccount, WorkflowSettings.social_account_id == SocialAccount.id)
-                .where(Post.id == post_id)
-            )
-            result = await session.execute(query)
-            row = result.first()
-            if row:
-                return row.Post, row.UserWorkflow, row.WorkflowSettings, row.SocialAccount
-        except Exception:
-            pass
 
-        # Попытка №2: без workflow, напрямую через Post.social_account_id
-        try:
-            query2 = (
-                select(Post, SocialAccount)
-                .join(SocialAccount, Post.social_account_id == SocialAccount.id)
-                .where(Post.id == post_id)
-            )
-            result2 = await session.execute(query2)
-            row2 = result2.first()
-            if row2:
-                # Совместимость с основным форматом: вернем workflow/settings как None
-                return row2.Post, None, None, row2.SocialAccount
-        except Exception:
-            pass
+    @staticmethod
+    def _request_hash(post: Post, social_account: SocialAccount) -> str:
+        """Хэш отправляемого содержимого: меняется, только если пост отредактировали"""
+        payload = "\x1f".join(
+            str(part or "") for part in
+            (social_account.telegram_chat_id, post.topic, post.content, post.media_type, post.media_url)
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
 
+    @staticmethod
+    def _telegram_permalink(message: Message) -> Optional[str]:
+        if message.chat.username:
+            return f"https://t.me/{message.chat.username}/{message.message_id}"
+        chat_id = str(message.chat.id)
+        if chat_id.startswith("-100"):
+            # Приватный канал/супергруппа: ссылка работает для участников
+            return f"https://t.me/c/{chat_id[4:]}/{message.message_id}"
         return None
     
-    async def _publish_to_telegram(self, post: Post, social_account: SocialAccount) -> bool:
-        """Публикует пост в Telegram канал"""
-        try:
-            chat_id = social_account.telegram_chat_id
-            if not chat_id:
-                print(f"No telegram_chat_id for social account {social_account.id}")
-                return False
-            
-            # Формируем текст поста
-            message_text = f"📝 <b>{post.topic}</b>\n\n{post.content}"
-            
-            # Отправляем сообщение
-            await self.bot.send_message(
-                chat_id=chat_id,
-                text=message_text,
-                parse_mode="HTML"
-            )
-            
-            print(f"Successfully published post {post.id} to Telegram channel {chat_id}")
-            return True
-            
-        except Exception as e:
-            print(f"Error publishing to Telegram: {e}")
-            return False
+    @staticmethod
+    def _details_query():
+        """
+        Пост со всеми связанными данными одним запросом.
+        Канал берётся из настроек задачи, а если их нет — напрямую из Post.social_account_id
+        (ручной пост без workflow); workflow/settings в этом случае приходят как None.
+        """
+        account_id = func.coalesce(WorkflowSettings.social_account_id, Post.social_account_id)
+        return (
+            select(Post, UserWorkflow, WorkflowSettings, SocialAccount)
+            .outerjoin(UserWorkflow, Post.user_workflow_id == UserWorkflow.id)
+            .outerjoin(WorkflowSettings, WorkflowSettings.user_workflow_id == Post.user_workflow_id)
+            .join(SocialAccount, SocialAccount.id == account_id)
+        )
+
+    async def get_posts_with_details(
+        self, session: AsyncSession, post_ids: Optional[list[int]] = None, due_only: bool = False, limit: Optional[int] = None
+    ) -> list[tuple]:
+        """
+        Пакетно получает посты с workflow, настройками и аккаунтом (один запрос на всю пачку)
+
+        Args:
+            session: Сессия базы данных
+            post_ids: Ограничить выборку этими постами
+            due_only: Только запланированные посты, время которых наступило
+            limit: Максимальное количество постов
+
+        Returns:
+            list[tuple]: (post, workflow | None, settings | None, social_account)
+        """
+        query = self._details_query()
+        if post_ids is not None:
+            query = query.where(Post.id.in_(post_ids))
+        if due_only:
+            query = query.where(
+                Post.status == "scheduled",
+                Post.scheduled_time <= datetime.now(timezone.utc)
+            ).order_by(Post.scheduled_time)
+        if limit is not None:
+            query = query.limit(limit)
+        result = await session.execute(query)
+        return [tuple(row) for row in result.all()]
+
+    async def _get_post_with_details(self, session: AsyncSession, post_id: int):
+        """Получает пост со всеми связанными данными (None, если публиковать некуда)"""
+        rows = await self.get_posts_with_details(session, post_ids=[post_id])
+        return rows[0] if rows else None
+
+    async def _publish_to_telegram(self, post: Post, social_account: SocialAccount) -> Message:
+        """Публикует пост в Telegram канал и возвращает отправленное сообщение"""
+        chat_id = social_account.telegram_chat_id
+        if not chat_id:
+            raise ValueError(f"No telegram_chat_id for social account {social_account.id}")
+
+        # Формируем текст поста
+        message_text = f"📝 <b>{post.topic}</b>\n\n{post.content}"
+
+        # Отправляем сообщение через очередь с учётом лимитов Bot API
+        message = await self.send_queue.send_message(
+            chat_id=chat_id,
+            text=message_text,
+            parse_mode="HTML"
+        )
+
+        print(f"Successfully published post {post.id} to Telegram channel {chat_id}")
+        return message
     
     async def schedule_post_for_publishing(self, session: AsyncSession, post_id: int) -> bool:
         """
@@ -156,8 +261,8 @@ class PublishingService:
             print(f"Error scheduling post {post_id}: {e}")
             return False
     
-    async def get_pending_posts(self, session: AsyncSession) -> list[Post]:
-        """Получает все посты готовые к публикации"""
+    async def get_pending_posts(self, session: AsyncSession, post_ids: Optional[list[int]] = None) -> list[Post]:
+        """Получает посты готовые к публикации (все или только из переданного списка)"""
         query = (
             select(Post)
             .where(
@@ -166,30 +271,56 @@ class PublishingService:
             )
             .order_by(Post.scheduled_time)
         )
+        if post_ids is not None:
+            query = query.where(Post.id.in_(post_ids))
         
         result = await session.execute(query)
         return list(result.scalars().all())
     
-    async def run_publishing_cycle(self, session: AsyncSession):
+    async def run_publishing_cycle(self, session: Optional[AsyncSession] = None, post_ids: Optional[list[int]] = None):
         """
         Запускает цикл публикации - публикует все готовые посты
-        Эта функция может вызываться периодически (например, каждые 5 минут)
+        Вызывается планировщиком с ID постов, время которых наступило.
+
+        Посты забираются пачками (scheduled → publishing с арендой этого экземпляра),
+        поэтому несколько реплик бота не публикуют один пост дважды.
+        Каждый пост публикуется в своей сессии, переданная сессия используется только для захвата.
         """
-        pending_posts = await self.get_pending_posts(session)
-        
-        # Публикуем параллельно с ограничением степени параллелизма
-        semaphore = asyncio.Semaphore(5)
-
-        async def _worker(p):
-            async with semaphore:
-                success = await self.publish_post(session, p.id)
-                if success:
-                    print(f"Published post {p.id}: {p.topic}")
-                else:
-                    print(f"Failed to publish post {p.id}: {p.topic}")
-                await asyncio.sleep(0.5)
+        while True:
+            token = self._lease_token()
+            if session is None:
+                async with AsyncSessionLocal() as own_session:
+                    claimed = await self._claim_batch(own_session, token, post_ids)
+            else:
+                claimed = await self._claim_batch(session, token, post_ids)
+            if not claimed:
+                return
+            await asyncio.gather(*[self._publish_worker(p.id, p.topic, self._channel_key(p), token) for p in claimed])
+            if len(claimed) < config.PUBLISH_CLAIM_BATCH:
+                return
+
+    async def _claim_batch(self, session: AsyncSession, token: str, post_ids: Optional[list[int]]):
+        return await claim_due_posts(
+            session, token, self.lease_seconds, config.PUBLISH_CLAIM_BATCH, post_ids
+        )
+
+    @staticmethod
+    def _channel_key(post: Post):
+        return ("account", post.social_account_id) if post.social_account_id else ("workflow", post.user_workflow_id)
 
-        await asyncio.gather(*[ _worker(p) for p in pending_posts ])
+    async def _publish_worker(self, post_id: int, topic: str, channel_key, lease_token: str):
+        """Публикует один пост в собственной короткой сессии БД"""
+        channel_semaphore = self._channel_semaphores.get(channel_key)
+        if channel_semaphore is None:
+            channel_semaphore = self._channel_semaphores[channel_key] = asyncio.Semaphore(self._per_channel)
+
+        async with channel_semaphore, self._semaphore:
+            async with AsyncSessionLocal() as session:
+                success = await self.publish_post(session, post_id, lease_token)
+        if success:
+            print(f"Published post {post_id}: {topic}")
+        else:
+            print(f"Failed to publish post {post_id}: {topic}")
 
     async def get_posts_for_n8n(self, session: AsyncSession, limit: int = 10) -> list[dict]:
         """
@@ -203,18 +334,11 @@ class PublishingService:
             list[dict]: Список постов с полной информацией для публикации
         """
         try:
-            # Получаем посты готовые к публикации
-            posts = await self.get_pending_posts(session)
-            
+            # Посты готовые к публикации вместе с каналом и задачей — одним запросом
+            rows = await self.get_posts_with_details(session, due_only=True, limit=limit)
+
             result = []
-            for post in posts[:limit]:
-                # Получаем связанные данные
-                post_data = await self._get_post_with_details(session, post.id)
-                if not post_data:
-                    continue
-                    
-                post_obj, workflow, settings, social_account = post_data
-                
+            for post_obj, workflow, settings, social_account in rows:
                 # Формируем данные для n8n
                 post_info = {
                     "post_id": post_obj.id,
@@ -228,15 +352,15 @@ class PublishingService:
                     "channel_name": social_account.channel_name,
                     "telegram_chat_id": social_account.telegram_chat_id,
                     "access_token": social_account.access_token,
-                    "user_id": workflow.user_id,
-                    "workflow_id": workflow.id,
-                    "workflow_name": workflow.name
+                    "user_id": workflow.user_id if workflow else social_account.user_id,
+                    "workflow_id": workflow.id if workflow else None,
+                    "workflow_name": workflow.name if workflow else None
                 }
-                
+
                 result.append(post_info)
-            
+
             return result
-            
+
         except Exception as e:
             print(f"Error getting posts for n8n: {e}")
             return []
@@ -255,18 +379,11 @@ class PublishingService:
         """
         try:
             # Обновляем статус поста
-            success = await update_post(
-                session,
-                post_id,
-                status="published",
-                published_time=datetime.now(timezone.utc)
-            )
-            
-            if success and external_id:
-                # Здесь можно сохранить external_id если нужно
-                # await update_post(session, post_id, external_id=external_id)
-                pass
-            
+            fields = dict(status="published", published_time=datetime.now(timezone.utc))
+            if external_id:
+                fields["external_id"] = external_id
+            success = await update_post(session, post_id, **fields)
+
             return success
             
         except Exception as e:
@@ -0,0 +1,151 @@
+import asyncio
+import heapq
+import logging
+from datetime import datetime, timezone, timedelta
+from typing import Optional
+
+from sqlalchemy.future import select
+
+from bot import config
+from bot.models.models import Post
+from bot.services.crud.post import release_expired_leases
+from db.connection import AsyncSessionLocal
+
+logger = logging.getLogger(__name__)
+
+
+class PublishingScheduler:
+    """
+    Планировщик публикаций по времени.
+
+    Держит в памяти кучу (scheduled_time, post_id) и спит до ближайшего дедлайна.
+    Изменения расписания (создание/одобрение/перенос поста) будят его сразу,
+    а редкая сверка с БД подхватывает всё, что могло пройти мимо уведомлений.
+    """
+
+    def __init__(self, service, reconcile_seconds: int = None):
+        self.service = service
+        self.reconcile_interval = reconcile_seconds or config.PUBLISH_RECONCILE_SECONDS
+        # Сверка заглядывает вперёд, чтобы к следующей сверке все ближайшие посты уже были в куче
+        self.horizon = timedelta(seconds=self.reconcile_interval * 2)
+        self._heap: list[tuple[datetime, int]] = []
+        self._deadlines: dict[int, datetime] = {}
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self._inflight: set[asyncio.Task] = set()
+
+    def schedule(self, post_id: int, scheduled_time: datetime):
+        """Добавляет или переносит пост; устаревшие записи кучи отбрасываются лениво"""
+        if scheduled_time.tzinfo is None:
+            scheduled_time = scheduled_time.replace(tzinfo=timezone.utc)
+        if self._deadlines.get(post_id) == scheduled_time:
+            return
+        self._deadlines[post_id] = scheduled_time
+        heapq.heappush(self._heap, (scheduled_time, post_id))
+        if self._heap[0] == (scheduled_time, post_id):
+            self._wakeup.set()
+
+    def next_deadline(self) -> Optional[datetime]:
+        self._drop_stale()
+        return self._heap[0][0] if self._heap else None
+
+    def pop_due(self, now: datetime) -> list[int]:
+        """Извлекает ID постов, время публикации которых наступило"""
+        due = []
+        while True:
+            self._drop_stale()
+            if not self._heap or self._heap[0][0] > now:
+                return due
+            _, post_id = heapq.heappop(self._heap)
+            del self._deadlines[post_id]
+            due.append(post_id)
+
+    def _drop_stale(self):
+        while self._heap:
+            scheduled_time, post_id = self._heap[0]
+            if self._deadlines.get(post_id) == scheduled_time:
+                return
+            heapq.heappop(self._heap)
+
+    async def reconcile(self) -> int:
+        """
+        Сверка с БД: возвращает в очередь посты с истёкшей арендой
+        и добавляет в кучу посты, которые выйдут в ближайшее время
+        """
+        horizon = datetime.now(timezone.utc) + self.horizon
+        async with AsyncSessionLocal() as session:
+            released = await release_expired_leases(session)
+            if released:
+                logger.warning(f"Released {len(released)} posts with expired publishing lease")
+            result = await session.execute(
+                select(Post.id, Post.scheduled_time)
+                .where(Post.status == "scheduled", Post.scheduled_time <= horizon)
+            )
+            rows = result.all()
+        for post_id, scheduled_time in rows:
+            self.schedule(post_id, scheduled_time)
+        return len(rows)
+
+    def start(self):
+        """Запускает планировщик и подключает его к уведомлениям об изменении расписания"""
+        global _active_scheduler
+        if self._task is None:
+            self._task = asyncio.create_task(self.run_forever(), name="publishing-scheduler")
+        _active_scheduler = self
+
+    async def stop(self):
+        global _active_scheduler
+        if _active_scheduler is self:
+            _active_scheduler = None
+        tasks = [t for t in [self._task, *self._inflight] if t]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._task = None
+
+    async def run_forever(self):
+        loop = asyncio.get_running_loop()
+        next_reconcile = loop.time()
+        while True:
+            if loop.time() >= next_reconcile:
+                try:
+                    await self.reconcile()
+                except Exception as e:
+                    logger.exception(f"Publishing reconcile error: {e}")
+                next_reconcile = loop.time() + self.reconcile_interval
+
+            now = datetime.now(timezone.utc)
+            due = self.pop_due(now)
+            if due:
+                self._dispatch(due)
+
+            timeout = next_reconcile - loop.time()
+            deadline = self.next_deadline()
+            if deadline is not None:
+                timeout = min(timeout, (deadline - now).total_seconds())
+
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=max(timeout, 0))
+            except asyncio.TimeoutError:
+                pass
+
+    def _dispatch(self, post_ids: list[int]):
+        task = asyncio.create_task(self._publish(post_ids))
+        self._inflight.add(task)
+        task.add_done_callback(self._inflight.discard)
+
+    async def _publish(self, post_ids: list[int]):
+        try:
+            await self.service.run_publishing_cycle(post_ids=post_ids)
+        except Exception as e:
+            logger.exception(f"Publishing error for posts {post_ids}: {e}")
+
+
+_active_scheduler: Optional[PublishingScheduler] = None
+
+
+def notify_post_scheduled(post_id: int, scheduled_time: datetime):
+    """Сообщает запущенному планировщику о новом или изменённом времени публикации"""
+    if _active_scheduler is not None and scheduled_time is not None:
+        _active_scheduler.schedule(post_id, scheduled_time)
@@ -0,0 +1,105 @@
+import asyncio
+import time
+
+from aiogram import Bot
+from aiogram.exceptions import TelegramRetryAfter
+
+from bot import config
+
+
+class SendRetryLater(Exception):
+    """Telegram попросил подождать: пост нужно перенести, а не помечать неудачным"""
+
+    def __init__(self, retry_after: float):
+        super().__init__(f"Retry after {retry_after}s")
+        self.retry_after = retry_after
+
+
+class TokenBucket:
+    """
+    Token bucket с резервированием: каждый вызов сразу забирает токен
+    (баланс может уйти в минус) и ждёт ровно столько, сколько нужно для его восполнения.
+    Так очередь ожидающих обслуживается честно, без гонок за освободившийся токен.
+    """
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        # Момент последнего пополнения; на время паузы лежит в будущем
+        self._updated = time.monotonic()
+
+    def _refill(self, now: float):
+        if now > self._updated:
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+
+    def reserve(self) -> float:
+        """Забирает токен и возвращает, сколько секунд нужно подождать перед отправкой"""
+        now = time.monotonic()
+        self._refill(now)
+        self._tokens -= 1
+        return max(0.0, self._updated - now) + max(0.0, -self._tokens / self.rate)
+
+    async def acquire(self):
+        delay = self.reserve()
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+    def pause(self, seconds: float):
+        """Останавливает выдачу токенов (например, после 429 с retry_after)"""
+        now = time.monotonic()
+        self._refill(now)
+        self._tokens = min(self._tokens, 0)
+        self._updated = max(self._updated, now + seconds)
+
+
+class TelegramSendQueue:
+    """
+    Исходящая очередь сообщений Bot API.
+
+    Ограничивает общий поток сообщений бота и поток в каждый чат отдельно,
+    поэтому посты в разные каналы уходят параллельно, а в один канал — не чаще лимита.
+    """
+
+    def __init__(self, bot: Bot, global_rate: float = None, chat_rate_per_minute: float = None, chat_burst: int = None):
+        self.bot = bot
+        global_rate = global_rate or config.TELEGRAM_GLOBAL_RATE
+        self._global = TokenBucket(global_rate, global_rate)
+        self._chat_rate = (chat_rate_per_minute or config.TELEGRAM_CHAT_RATE_PER_MINUTE) / 60
+        self._chat_burst = chat_burst or config.TELEGRAM_CHAT_BURST
+        self._chats: dict[int | str, TokenBucket] = {}
+
+    def _chat_bucket(self, chat_id) -> TokenBucket:
+        bucket = self._chats.get(chat_id)
+        if bucket is None:
+            bucket = self._chats[chat_id] = TokenBucket(self._chat_rate, self._chat_burst)
+        return bucket
+
+    async def send_message(self, chat_id, text: str, **kwargs):
+        """
+        Отправляет сообщение с учётом лимитов.
+
+        Raises:
+            SendRetryLater: Telegram вернул 429 — чат поставлен на паузу, отправку нужно повторить позже
+        """
+        chat_bucket = self._chat_bucket(chat_id)
+        # Сначала ждём очередь чата, чтобы занятый канал не расходовал общий лимит
+        await chat_bucket.acquire()
+        await self._global.acquire()
+        try:
+            return await self.bot.send_message(chat_id=chat_id, text=text, **kwargs)
+        except TelegramRetryAfter as e:
+            chat_bucket.pause(e.retry_after)
+            raise SendRetryLater(e.retry_after) from e
+
+
+_queues: dict[int, TelegramSendQueue] = {}
+
+
+def get_send_queue(bot: Bot) -> TelegramSendQueue:
+    """Возвращает общую очередь отправки для бота (лимиты действуют на весь процесс)"""
+    queue = _queues.get(bot.id)
+    if queue is None:
+        queue = _queues[bot.id] = TelegramSendQueue(bot)
+    return queue
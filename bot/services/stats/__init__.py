@@ -0,0 +1,14 @@
+from .buffer import PostStatsBuffer, post_stats_buffer
+from .collector import StatsCollector, register_stats_fetcher, unregister_stats_fetcher
+from .telegram import TelegramStatsFetcher, setup_telegram_stats, close_telegram_stats
+
+__all__ = [
+    "PostStatsBuffer",
+    "post_stats_buffer",
+    "StatsCollector",
+    "register_stats_fetcher",
+    "unregister_stats_fetcher",
+    "TelegramStatsFetcher",
+    "setup_telegram_stats",
+    "close_telegram_stats",
+]
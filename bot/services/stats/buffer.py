@@ -0,0 +1,101 @@
+import asyncio
+import logging
+from typing import Optional
+
+from bot import config
+from bot.services.crud.post_stats import increment_post_stats_batch
+from bot.services.stats.collector import has_stats_fetcher
+
+logger = logging.getLogger(__name__)
+
+
+class PostStatsBuffer:
+    """
+    Буфер инкрементов статистики постов (write-combining).
+
+    Просмотры и лайки копятся в памяти по post_id и периодически сбрасываются
+    в БД одним upsert-запросом на всю пачку. Тысяча событий по одному посту
+    превращаются в одну строку VALUES, а не в тысячу UPDATE.
+
+    Буфер предназначен для постов площадок, метрики которых считает сам бот: для площадок
+    с источником метрик (StatsCollector) post_stats хранит абсолютные значения площадки,
+    и сборщик перезапишет прибавленное. Такие посты add() пропускает по переданной platform.
+
+    Это библиотечный компонент: сейчас в боте нет источника инкрементов, поэтому при старте
+    он не запускается. Код, который начнёт вызывать add(), сам вызывает start() при запуске
+    и stop() при остановке (stop() сбрасывает остаток), либо flush() по своему расписанию.
+    """
+
+    def __init__(self, flush_interval: float = None, max_pending: int = None, session_factory=None):
+        self.flush_interval = flush_interval or config.STATS_FLUSH_SECONDS
+        self.max_pending = max_pending or config.STATS_BUFFER_MAX_POSTS
+        self._session_factory = session_factory
+        # post_id -> [views, likes, reposts]
+        self._pending: dict[int, list[int]] = {}
+        self._flush_lock = asyncio.Lock()
+        self._task: Optional[asyncio.Task] = None
+        self._full = asyncio.Event()
+
+    def _new_session(self):
+        if self._session_factory is None:
+            from db.connection import AsyncSessionLocal
+            self._session_factory = AsyncSessionLocal
+        return self._session_factory()
+
+    @property
+    def pending(self) -> int:
+        return len(self._pending)
+
+    def add(self, post_id: int, views: int = 0, likes: int = 0, reposts: int = 0, platform: Optional[str] = None):
+        """Учитывает инкремент без обращения к БД (platform — площадка поста, если известна)"""
+        if platform is not None and has_stats_fetcher(platform):
+            return
+        counters = self._pending.get(post_id)
+        if counters is None:
+            counters = self._pending[post_id] = [0, 0, 0]
+        counters[0] += views
+        counters[1] += likes
+        counters[2] += reposts
+        if len(self._pending) >= self.max_pending:
+            self._full.set()
+
+    async def flush(self) -> int:
+        """Записывает накопленное одним запросом; возвращает число постов в пачке"""
+        async with self._flush_lock:
+            if not self._pending:
+                return 0
+            batch, self._pending = self._pending, {}
+            self._full.clear()
+            try:
+                async with self._new_session() as session:
+                    await increment_post_stats_batch(session, {k: tuple(v) for k, v in batch.items()})
+            except Exception as e:
+                # Не теряем счётчики: возвращаем пачку в буфер до следующего сброса
+                logger.error(f"Post stats flush failed ({len(batch)} posts): {e}")
+                for post_id, (views, likes, reposts) in batch.items():
+                    self.add(post_id, views, likes, reposts)
+                return 0
+            return len(batch)
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run(), name="post-stats-buffer")
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        await self.flush()
+
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._full.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            await self.flush()
+
+
+# Общий буфер для будущих источников инкрементов (фоновый сброс запускает сам источник)
+post_stats_buffer = PostStatsBuffer()
@@ -0,0 +1,170 @@
+import asyncio
+import logging
+from collections import defaultdict
+from dataclasses import dataclass
+from datetime import timedelta
+from typing import Awaitable, Callable
+
+from sqlalchemy import select, func, literal, or_
+
+from bot import config
+from bot.models.models import Post, PostStats, SocialAccount
+from bot.services.crud.post_stats import upsert_post_stats_batch, touch_post_stats_batch
+
+logger = logging.getLogger(__name__)
+
+# (bot, chat_id, [external_id, ...]) -> {external_id: (views, likes, reposts)}
+StatsFetcher = Callable[[object, str, list[str]], Awaitable[dict[str, tuple[int, int, int]]]]
+
+# Источники метрик по площадкам (platform -> fetcher).
+# Bot API не отдаёт просмотры и реакции сообщений канала, поэтому для Telegram
+# источник — MTProto-клиент (stats/telegram.py), он регистрируется при STATS_TELEGRAM_MTPROTO.
+# Посты площадок без источника не выбираются.
+_fetchers: dict[str, StatsFetcher] = {}
+
+
+def register_stats_fetcher(platform: str, fetcher: StatsFetcher):
+    _fetchers[platform] = fetcher
+
+
+def unregister_stats_fetcher(platform: str):
+    _fetchers.pop(platform, None)
+
+
+def has_stats_fetcher(platform: str) -> bool:
+    """Метрики площадки собирает сборщик (абсолютные значения), а не буфер инкрементов"""
+    return platform in _fetchers
+
+
+@dataclass
+class StatsTarget:
+    post_id: int
+    external_id: str
+    platform: str
+    chat_id: str
+
+
+def due_posts_query(platforms: list[str], limit: int):
+    """
+    Опубликованные посты, метрики которых пора обновить.
+    Интервал обновления растёт с возрастом поста: age * factor, но в пределах [min, max];
+    посты старше STATS_MAX_AGE_DAYS не выбираются вовсе.
+    """
+    now = func.now()
+    age = now - Post.published_time
+    refresh_interval = func.least(
+        func.greatest(age * config.STATS_REFRESH_AGE_FACTOR, literal(timedelta(minutes=config.STATS_REFRESH_MIN_MINUTES))),
+        literal(timedelta(hours=config.STATS_REFRESH_MAX_HOURS)),
+    )
+    chat_id = func.coalesce(SocialAccount.telegram_chat_id, SocialAccount.channel_id)
+    return (
+        select(Post.id, Post.external_id, SocialAccount.platform, chat_id.label("chat_id"))
+        .join(SocialAccount, SocialAccount.id == Post.social_account_id)
+        .outerjoin(PostStats, PostStats.post_id == Post.id)
+        .where(
+            Post.status == 'published',
+            Post.external_id.isnot(None),
+            Post.published_time > now - literal(timedelta(days=config.STATS_MAX_AGE_DAYS)),
+            SocialAccount.platform.in_(platforms),
+            or_(PostStats.id.is_(None), PostStats.updated_at < now - refresh_interval),
+        )
+        # Сначала давно не обновлявшиеся
+        .order_by(PostStats.updated_at.asc().nulls_first())
+        .limit(limit)
+    )
+
+
+def _chunks(items: list, size: int):
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+
+class StatsCollector:
+    """
+    Периодически собирает метрики опубликованных постов.
+
+    Посты группируются по каналу и запрашиваются пачками до STATS_FETCH_BATCH сообщений,
+    а результат всего цикла записывается одним upsert в post_stats. Посты, по которым
+    метрик нет (удалённое сообщение, ошибка площадки), отмечаются попыткой, чтобы не
+    выбираться первыми в каждом цикле. Соединение с БД на время запросов к площадкам
+    не удерживается: выборка и запись идут в разных коротких сессиях.
+    """
+
+    def __init__(self, bot, interval: int = None, limit: int = None, batch_size: int = None, concurrency: int = None,
+                 session_factory=None):
+        self.bot = bot
+        self._session_factory = session_factory
+        self.interval = interval or config.STATS_COLLECT_SECONDS
+        self.limit = limit or config.STATS_COLLECT_LIMIT
+        self.batch_size = batch_size or config.STATS_FETCH_BATCH
+        self._semaphore = asyncio.Semaphore(concurrency or config.STATS_FETCH_CONCURRENCY)
+
+    async def load_targets(self, session) -> list[StatsTarget]:
+        if not _fetchers:
+            return []
+        result = await session.execute(due_posts_query(list(_fetchers), self.limit))
+        return [StatsTarget(*row) for row in result.all()]
+
+    async def _fetch_chunk(self, platform: str, chat_id: str, targets: list[StatsTarget]) -> dict[int, tuple]:
+        fetcher = _fetchers.get(platform)
+        if fetcher is None:
+            return {}
+        async with self._semaphore:
+            try:
+                metrics = await fetcher(self.bot, chat_id, [t.external_id for t in targets])
+            except Exception as e:
+                # Пачка повторится в следующем цикле: updated_at не изменился
+                logger.warning(f"Stats fetch failed for {platform}:{chat_id} ({len(targets)} posts): {e}")
+                return {}
+        return {t.post_id: metrics[t.external_id] for t in targets if t.external_id in metrics}
+
+    async def collect(self, targets: list[StatsTarget]) -> dict[int, tuple]:
+        by_channel: dict[tuple[str, str], list[StatsTarget]] = defaultdict(list)
+        for target in targets:
+            by_channel[(target.platform, target.chat_id)].append(target)
+
+        results = await asyncio.gather(*[
+            self._fetch_chunk(platform, chat_id, chunk)
+            for (platform, chat_id), channel_targets in by_channel.items()
+            for chunk in _chunks(channel_targets, self.batch_size)
+        ])
+        merged: dict[int, tuple] = {}
+        for part in results:
+            merged.update(part)
+        return merged
+
+    def _new_session(self):
+        if self._session_factory is None:
+            from db.connection import AsyncSessionLocal
+            self._session_factory = AsyncSessionLocal
+        return self._session_factory()
+
+    async def run_cycle(self) -> int:
+        """Один цикл сбора; возвращает число обновлённых постов"""
+        if not _fetchers:
+            return 0
+        async with self._new_session() as session:
+            targets = await self.load_targets(session)
+        if not targets:
+            return 0
+
+        metrics = await self.collect(targets)
+        missed = [t.post_id for t in targets if t.post_id not in metrics]
+        async with self._new_session() as session:
+            await upsert_post_stats_batch(session, metrics)
+            await touch_post_stats_batch(session, missed)
+        if missed:
+            logger.info(f"No stats for {len(missed)} posts, retry after the usual refresh interval")
+        return len(metrics)
+
+    async def run_forever(self):
+        while True:
+            try:
+                updated = await self.run_cycle()
+                if updated:
+                    logger.info(f"Post stats refreshed for {updated} posts")
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Stats collector cycle failed: {e}")
+            await asyncio.sleep(self.interval)
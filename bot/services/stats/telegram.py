@@ -0,0 +1,91 @@
+import asyncio
+import logging
+from typing import Optional
+
+from bot import config
+from bot.services.stats.collector import register_stats_fetcher, unregister_stats_fetcher
+
+logger = logging.getLogger(__name__)
+
+
+def _peer(chat_id: str):
+    """Числовой id канала (-100…) передаётся числом, @username — строкой"""
+    try:
+        return int(chat_id)
+    except ValueError:
+        return chat_id
+
+
+def _reactions(message) -> int:
+    reactions = getattr(message, "reactions", None)
+    if not reactions or not reactions.results:
+        return 0
+    return sum(result.count for result in reactions.results)
+
+
+class TelegramStatsFetcher:
+    """
+    Источник метрик Telegram-каналов через MTProto (telethon) под тем же ботом.
+
+    Bot API не отдаёт просмотры и реакции сообщений, а channels.getMessages отдаёт:
+    пачка до 100 сообщений одного канала — один запрос. Бот должен быть администратором канала.
+    """
+
+    def __init__(self, api_id: int, api_hash: str, bot_token: str, session_name: str):
+        self.api_id = api_id
+        self.api_hash = api_hash
+        self.bot_token = bot_token
+        self.session_name = session_name
+        self._client = None
+        self._lock = asyncio.Lock()
+
+    async def _get_client(self):
+        async with self._lock:
+            if self._client is None:
+                # telethon импортируется, только если источник включён (STATS_TELEGRAM_MTPROTO)
+                from telethon import TelegramClient
+
+                client = TelegramClient(self.session_name, self.api_id, self.api_hash)
+                await client.start(bot_token=self.bot_token)
+                self._client = client
+        return self._client
+
+    async def __call__(self, bot, chat_id: str, external_ids: list[str]) -> dict[str, tuple[int, int, int]]:
+        client = await self._get_client()
+        messages = await client.get_messages(_peer(chat_id), ids=[int(i) for i in external_ids])
+        # Удалённые сообщения приходят как None
+        return {
+            str(message.id): (message.views or 0, _reactions(message), message.forwards or 0)
+            for message in messages if message is not None
+        }
+
+    async def close(self):
+        if self._client is not None:
+            await self._client.disconnect()
+            self._client = None
+
+
+_telegram_fetcher: Optional[TelegramStatsFetcher] = None
+
+
+def setup_telegram_stats() -> bool:
+    """Регистрирует MTProto-источник метрик для Telegram, если он включён в конфиге"""
+    global _telegram_fetcher
+    if not config.STATS_TELEGRAM_MTPROTO:
+        return False
+    if not (config.TELEGRAM_API_ID and config.TELEGRAM_API_HASH):
+        logger.warning("STATS_TELEGRAM_MTPROTO is set, but TELEGRAM_API_ID/TELEGRAM_API_HASH are missing")
+        return False
+    _telegram_fetcher = TelegramStatsFetcher(
+        config.TELEGRAM_API_ID, config.TELEGRAM_API_HASH, config.BOT_TOKEN, config.STATS_TELEGRAM_SESSION
+    )
+    register_stats_fetcher("telegram", _telegram_fetcher)
+    return True
+
+
+async def close_telegram_stats():
+    global _telegram_fetcher
+    if _telegram_fetcher is not None:
+        unregister_stats_fetcher("telegram")
+        await _telegram_fetcher.close()
+        _telegram_fetcher = None
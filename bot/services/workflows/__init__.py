@@ -0,0 +1,3 @@
+from .executor import WorkflowExecutor
+
+__all__ = ["WorkflowExecutor"]
@@ -0,0 +1,308 @@
+import asyncio
+import logging
+from dataclasses import dataclass
+from datetime import datetime, timezone, timedelta
+from typing import Optional
+
+from sqlalchemy import func, update
+from sqlalchemy.future import select
+
+from bot import config
+from bot.models.models import Post, Topic, PromptTemplate
+from bot.services.ai.generation_queue import generation_queue, PRIORITY_BACKGROUND
+from bot.services.publishing.scheduler import notify_post_scheduled
+from bot.services.profile import invalidate_profile_summary
+from bot.services.entitlements import get_limit_state, consume_post, invalidate_limit_state
+from bot.services.crud.usage_stats import increment_usage
+from bot.services.crud.workflow_settings import (
+    claim_due_workflow_settings,
+    bulk_update_workflow_settings,
+    compute_next_run_at,
+    init_missing_next_runs,
+)
+from db.connection import AsyncSessionLocal
+
+logger = logging.getLogger(__name__)
+
+# Сколько последних тем храним в content_memory, чтобы не повторяться
+RECENT_TOPICS_LIMIT = 20
+
+
+@dataclass
+class DueWorkflow:
+    """Снимок задачи, взятой в работу (без привязки к сессии БД)"""
+    settings_id: int
+    user_workflow_id: int
+    user_id: int
+    social_account_id: Optional[int]
+    slot: datetime
+    next_run_at: Optional[datetime]
+    theme: str
+    context: Optional[str]
+    writing_style: str
+    content_length: str
+    post_language: str
+    post_media_type: Optional[str]
+    moderation: bool
+    prompt_template_id: Optional[int]
+    content_memory: dict
+    topic_id: Optional[int] = None
+    topic: Optional[str] = None
+    prompt_template: Optional[str] = None
+    is_premium: bool = False
+    subscription_id: Optional[int] = None
+
+
+class WorkflowExecutor:
+    """
+    Движок автопостинга: по индексу next_run_at выбирает задачи, у которых наступил слот,
+    пакетно генерирует контент и создаёт посты.
+
+    Цикл разбит на короткие транзакции, между которыми идут запросы к AI:
+    1) захват пачки задач (SKIP LOCKED) и сдвиг next_run_at на следующий слот;
+    2) списание поста из лимита подписки — задачи без лимита пропускают слот;
+    3) пакетная вставка постов, отметка тем и обновление last_execution/content_memory;
+       лимит за неудавшиеся генерации возвращается.
+    """
+
+    def __init__(self, batch_size: int = None, lookahead_minutes: int = None, retry_minutes: int = None):
+        self.batch_size = batch_size or config.WORKFLOW_BATCH_SIZE
+        self.lookahead = timedelta(minutes=lookahead_minutes if lookahead_minutes is not None else config.WORKFLOW_LOOKAHEAD_MINUTES)
+        self.retry_delay = timedelta(minutes=retry_minutes or config.WORKFLOW_RETRY_MINUTES)
+
+    async def run_forever(self, interval: int = None):
+        """Периодически запускает цикл исполнения задач"""
+        interval = interval or config.WORKFLOW_TICK_SECONDS
+        while True:
+            try:
+                created = await self.run_cycle()
+                if created:
+                    logger.info(f"Workflow engine created {created} posts")
+            except Exception as e:
+                logger.exception(f"Workflow engine error: {e}")
+            await asyncio.sleep(interval)
+
+    async def run_cycle(self) -> int:
+        """Обрабатывает все задачи, слот которых наступил. Возвращает число созданных постов"""
+        async with AsyncSessionLocal() as session:
+            await init_missing_next_runs(session)
+
+        created = 0
+        while True:
+            due = await self._claim_batch()
+            if not due:
+                break
+            claimed = len(due)
+            async with AsyncSessionLocal() as session:
+                due = await self._reserve_quota(session, due)
+            if due:
+                created += await self._execute_batch(due)
+            if claimed < self.batch_size:
+                break
+        return created
+
+    async def _reserve_quota(self, session, due: list[DueWorkflow]) -> list[DueWorkflow]:
+        """
+        Списывает по посту из лимита подписки на каждую задачу до генерации.
+        Условный UPDATE не даёт превысить posts_limit; задачи без лимита пропускают слот
+        (next_run_at уже сдвинут при захвате).
+        """
+        states = {}
+        allowed = []
+        for d in due:
+            if d.user_id not in states:
+                states[d.user_id] = await get_limit_state(session, d.user_id)
+            state = states[d.user_id]
+            if state is None or not state.has_subscription or not await consume_post(session, state):
+                logger.info(f"Workflow {d.user_workflow_id}: no post quota left, slot skipped")
+                continue
+            d.subscription_id = state.subscription_id
+            d.is_premium = True
+            allowed.append(d)
+        return allowed
+
+    async def _refund_quota(self, session, failed: list[DueWorkflow]):
+        """Возвращает в лимит посты, генерация которых не удалась"""
+        for d in failed:
+            await increment_usage(session, d.subscription_id, "posts_used", -1)
+        for user_id in {d.user_id for d in failed}:
+            await invalidate_limit_state(user_id)
+
+    def _retry_rows(self, due: list[DueWorkflow], now: datetime) -> list[dict]:
+        """Переносит следующий запуск на now + retry_delay, если это раньше следующего слота"""
+        retry_at = now + self.retry_delay
+        return [
+            {"id": d.settings_id, "next_run_at": retry_at}
+            for d in due if d.next_run_at is None or retry_at < d.next_run_at
+        ]
+
+    async def _claim_batch(self) -> list[DueWorkflow]:
+        now = datetime.now(timezone.utc)
+        async with AsyncSessionLocal() as session:
+            rows = await claim_due_workflow_settings(session, now + self.lookahead, self.batch_size)
+            if not rows:
+                return []
+
+            due = []
+            for settings, user_id in rows:
+                slot = settings.next_run_at
+                # Пропущенные слоты не догоняем: следующий слот — после max(slot, now),
+                # на сетке, отсчитанной от дня создания задачи
+                next_run_at = compute_next_run_at(
+                    settings.first_post_time, settings.interval_hours, max(slot, now),
+                    anchor=settings.created_at or slot
+                )
+                due.append(DueWorkflow(
+                    settings_id=settings.id,
+                    user_workflow_id=settings.user_workflow_id,
+                    user_id=user_id,
+                    social_account_id=settings.social_account_id,
+                    slot=slot,
+                    next_run_at=next_run_at,
+                    theme=settings.theme,
+                    context=settings.context,
+                    writing_style=settings.writing_style,
+                    content_length=settings.content_length,
+                    post_language=settings.post_language,
+                    post_media_type=settings.post_media_type,
+                    moderation=settings.moderation is True or settings.moderation == "enabled",
+                    prompt_template_id=settings.prompt_template_id,
+                    content_memory=dict(settings.content_memory or {}),
+                ))
+
+            await self._load_batch_context(session, due)
+
+            # Сдвигаем расписание сразу, чтобы задачу не взяли повторно пока идёт генерация
+            await bulk_update_workflow_settings(
+                session, [{"id": d.settings_id, "next_run_at": d.next_run_at} for d in due]
+            )
+            await session.commit()
+            return due
+
+    async def _load_batch_context(self, session, due: list[DueWorkflow]):
+        """Подгружает темы и шаблоны для всей пачки (по одному запросу на вид данных)"""
+        workflow_ids = [d.user_workflow_id for d in due]
+
+        # Первая ожидающая тема каждой задачи
+        ranked = (
+            select(
+                Topic.id, Topic.user_workflow_id, Topic.title,
+                func.row_number().over(
+                    partition_by=Topic.user_workflow_id, order_by=(Topic.created_at, Topic.id)
+                ).label("rn")
+            )
+            .where(Topic.user_workflow_id.in_(workflow_ids), Topic.status == 'pending')
+            .subquery()
+        )
+        topics_result = await session.execute(
+            select(ranked.c.id, ranked.c.user_workflow_id, ranked.c.title).where(ranked.c.rn == 1)
+        )
+        topics = {row.user_workflow_id: (row.id, row.title) for row in topics_result.all()}
+
+        template_ids = {d.prompt_template_id for d in due if d.prompt_template_id}
+        templates = {}
+        if template_ids:
+            templates_result = await session.execute(
+                select(PromptTemplate.id, PromptTemplate.template_text).where(PromptTemplate.id.in_(template_ids))
+            )
+            templates = dict(templates_result.all())
+
+        for d in due:
+            d.topic_id, d.topic = topics.get(d.user_workflow_id, (None, None))
+            d.prompt_template = templates.get(d.prompt_template_id)
+
+    def _generation_params(self, d: DueWorkflow) -> dict:
+        notes = [d.context] if d.context else []
+        recent = d.content_memory.get("recent_topics") or []
+        if recent:
+            if d.post_language == "ru":
+                notes.append("Недавние темы (не повторяй): " + "; ".join(recent[-5:]))
+            else:
+                notes.append("Recent topics (do not repeat): " + "; ".join(recent[-5:]))
+        return dict(
+            topic=d.topic or d.theme,
+            theme=d.theme,
+            style=d.writing_style,
+            language=d.post_language,
+            content_length=d.content_length,
+            max_length=3000,
+            is_premium=d.is_premium,
+            prompt_template=d.prompt_template,
+            user_notes="\n".join(notes) or None,
+            # Регулярный автопостинг по одной теме не должен публиковать одинаковые тексты
+            use_cache=False,
+        )
+
+    async def _execute_batch(self, due: list[DueWorkflow]) -> int:
+        # В очередь одновременно попадает не больше background_limit задач пачки,
+        # остальные ждут слота: интерактивная генерация не стоит за всей пачкой
+        contents = await asyncio.gather(
+            *[generation_queue.generate(self._generation_params(d), priority=PRIORITY_BACKGROUND) for d in due],
+            return_exceptions=True
+        )
+
+        now = datetime.now(timezone.utc)
+        posts = []
+        owner_ids = set()
+        used_topic_ids = []
+        settings_rows = []
+        failed = []
+        for d, content in zip(due, contents):
+            if isinstance(content, Exception) or not content:
+                failed.append(d)
+                # Генерация не удалась — повторим раньше следующего слота
+                settings_rows.extend(self._retry_rows([d], now))
+                logger.warning(f"Workflow {d.user_workflow_id}: generation failed, retry at {now + self.retry_delay}")
+                continue
+
+            topic = d.topic or d.theme
+            posts.append(Post(
+                user_workflow_id=d.user_workflow_id,
+                social_account_id=d.social_account_id,
+                topic=topic,
+                content=content,
+                media_type=d.post_media_type or 'text',
+                status='pending' if d.moderation else 'scheduled',
+                scheduled_time=max(d.slot, now),
+                moderated=False,
+                is_manual=False,
+                prompt_template_id=d.prompt_template_id,
+            ))
+            owner_ids.add(d.user_id)
+            if d.topic_id:
+                used_topic_ids.append(d.topic_id)
+
+            memory = d.content_memory
+            memory["recent_topics"] = ((memory.get("recent_topics") or []) + [topic])[-RECENT_TOPICS_LIMIT:]
+            memory["posts_generated"] = int(memory.get("posts_generated") or 0) + 1
+            settings_rows.append({"id": d.settings_id, "last_execution": now, "content_memory": memory})
+
+        async with AsyncSessionLocal() as session:
+            try:
+                session.add_all(posts)
+                if used_topic_ids:
+                    await session.execute(
+                        update(Topic)
+                        .where(Topic.id.in_(used_topic_ids))
+                        .values(status='used', used_at=now)
+                    )
+                await bulk_update_workflow_settings(session, settings_rows)
+                await session.commit()
+            except Exception as e:
+                # Пачка не записалась: посты потеряны, поэтому лимит возвращаем всем,
+                # а расписание откатываем на повтор, как при ошибке генерации
+                logger.error(f"Workflow batch of {len(due)} posts was not saved: {e}")
+                await session.rollback()
+                await bulk_update_workflow_settings(session, self._retry_rows(due, now))
+                await session.commit()
+                await self._refund_quota(session, due)
+                return 0
+            if failed:
+                await self._refund_quota(session, failed)
+
+        for post in posts:
+            if post.status == 'scheduled':
+                notify_post_scheduled(post.id, post.scheduled_time)
+        for user_id in owner_ids:
+            await invalidate_profile_summary(user_id)
+        return len(posts)
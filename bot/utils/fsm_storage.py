@@ -0,0 +1,84 @@
+import json
+from functools import partial
+from typing import Any, Mapping
+
+from aiogram.fsm.state import State
+from aiogram.fsm.storage.base import StorageKey, StateType
+from aiogram.fsm.storage.redis import RedisStorage, DefaultKeyBuilder
+
+from bot import config
+
+# TTL по состояниям: полное имя состояния или имя группы → секунды.
+# Брошенный на середине мастер не должен жить в Redis вечно.
+STATE_TTLS = {
+    "AddPostStates": config.FSM_WIZARD_TTL,
+    "AddWorkflowState": config.FSM_WIZARD_TTL,
+    "EditPostStates": config.FSM_INPUT_TTL,
+    "EditWorkflowStates": config.FSM_INPUT_TTL,
+    "AddTelegramChannelStates": config.FSM_INPUT_TTL,
+    "ManageAccountStates": config.FSM_INPUT_TTL,
+    "SubscriptionStates": config.FSM_INPUT_TTL,
+    "ReferralInputStates": config.FSM_INPUT_TTL,
+    "SettingsStates": config.FSM_INPUT_TTL,
+}
+
+# Данные живут не дольше состояния: берём оставшийся TTL ключа состояния,
+# а если состояния нет — TTL по умолчанию. Один запрос к Redis вместо двух.
+_SET_DATA_SCRIPT = """
+local ttl = redis.call('PTTL', KEYS[1])
+if ttl <= 0 then ttl = tonumber(ARGV[2]) end
+redis.call('SET', KEYS[2], ARGV[1], 'PX', ttl)
+"""
+
+# Компактный JSON: без пробелов и без \\uXXXX для кириллицы (почти вдвое короче)
+compact_dumps = partial(json.dumps, ensure_ascii=False, separators=(",", ":"))
+
+
+class TTLRedisStorage(RedisStorage):
+    """RedisStorage с TTL, зависящим от текущего состояния, и компактной сериализацией данных"""
+
+    def __init__(self, redis, state_ttls: Mapping[str, int] = None, default_ttl: int = None, **kwargs):
+        super().__init__(redis, json_dumps=compact_dumps, **kwargs)
+        self.state_ttls = dict(STATE_TTLS if state_ttls is None else state_ttls)
+        self.default_ttl = default_ttl or config.FSM_STATE_TTL
+        self._set_data = redis.register_script(_SET_DATA_SCRIPT)
+
+    def ttl_for(self, state: str | None) -> int:
+        if not state:
+            return self.default_ttl
+        if state in self.state_ttls:
+            return self.state_ttls[state]
+        return self.state_ttls.get(state.split(":", 1)[0], self.default_ttl)
+
+    async def set_state(self, key: StorageKey, state: StateType = None) -> None:
+        state_key = self.key_builder.build(key, "state")
+        if state is None:
+            await self.redis.delete(state_key)
+            return
+
+        state_name = state.state if isinstance(state, State) else state
+        ttl = self.ttl_for(state_name)
+        async with self.redis.pipeline(transaction=False) as pipe:
+            pipe.set(state_key, state_name, ex=ttl)
+            # Продлеваем данные мастера вместе с переходом на следующий шаг
+            pipe.expire(self.key_builder.build(key, "data"), ttl)
+            await pipe.execute()
+
+    async def set_data(self, key: StorageKey, data: Mapping[str, Any]) -> None:
+        if not data or not isinstance(data, dict):
+            # Удаление пустых данных и проверку типа оставляем базовой реализации
+            await super().set_data(key, data)
+            return
+        await self._set_data(
+            keys=[self.key_builder.build(key, "state"), self.key_builder.build(key, "data")],
+            args=[self.json_dumps(data), self.default_ttl * 1000],
+        )
+
+    async def close(self) -> None:
+        # Клиент Redis общий для всего бота и закрывается в on_shutdown
+        pass
+
+
+def create_fsm_storage(redis) -> TTLRedisStorage:
+    """FSM-хранилище на общем клиенте Redis (ключи с префиксом fsm)"""
+    return TTLRedisStorage(redis, key_builder=DefaultKeyBuilder(prefix="fsm"))
@@ -0,0 +1,110 @@
+import json
+import logging
+import os
+from string import Formatter
+from typing import Any, Optional
+
+logger = logging.getLogger(__name__)
+
+LOCALES_PATH = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'locales'))
+DEFAULT_LOCALE = 'en'
+
+
+class Translator(dict):
+    """
+    Переводы одного языка: обычный dict (ключ → строка), поэтому старый код
+    с i18n.get(key, default) и передачей i18n в клавиатуры работает без изменений.
+
+    Ключи, которых нет в языке, уже подставлены из языка по умолчанию при загрузке.
+    Для шаблонов с плейсхолдерами заранее сохранён bound-метод str.format_map,
+    а строки без плейсхолдеров отдаются как есть, без форматирования.
+    """
+
+    __slots__ = ("locale", "_formatters")
+
+    def __init__(self, locale: str, messages: dict[str, str]):
+        super().__init__(messages)
+        self.locale = locale
+        self._formatters = {
+            key: value.format_map
+            for key, value in messages.items()
+            if isinstance(value, str) and _has_fields(value)
+        }
+
+    def t(self, key: str, default: Optional[str] = None, **kwargs: Any) -> str:
+        """Перевод по ключу с подстановкой параметров: i18n.t("welcome", name=...)"""
+        formatter = self._formatters.get(key)
+        if formatter is None:
+            text = self.get(key)
+            if text is None:
+                text = key if default is None else default
+                return text.format_map(kwargs) if kwargs else text
+            return text
+        try:
+            return formatter(kwargs)
+        except (KeyError, IndexError, ValueError) as e:
+            logger.warning(f"Bad params for translation {self.locale}:{key}: {e}")
+            return self[key]
+
+
+def _has_fields(template: str) -> bool:
+    try:
+        return any(field is not None for _, field, _, _ in Formatter().parse(template))
+    except ValueError:
+        # Невалидный шаблон (одиночная фигурная скобка) форматировать нельзя
+        return False
+
+
+class I18nCatalog:
+    """Каталог переводов на весь процесс: файлы locales/*.json читаются один раз"""
+
+    def __init__(self, locales_path: str = LOCALES_PATH, default_locale: str = DEFAULT_LOCALE):
+        self.locales_path = locales_path
+        self.default_locale = default_locale
+        self._translators: Optional[dict[str, Translator]] = None
+
+    def load(self) -> dict[str, Translator]:
+        raw: dict[str, dict] = {}
+        if not os.path.exists(self.locales_path):
+            logger.warning(f"Locales folder does not exist: {self.locales_path}")
+        else:
+            for fname in sorted(os.listdir(self.locales_path)):
+                if fname.endswith('.json'):
+                    lang = fname.split('.')[0]
+                    try:
+                        with open(os.path.join(self.locales_path, fname), encoding='utf-8') as f:
+                            raw[lang] = json.load(f)
+                    except Exception as e:
+                        logger.exception(f"Failed to load translation for {lang}: {e}")
+
+        fallback = raw.get(self.default_locale, {})
+        self._translators = {
+            lang: Translator(lang, {**fallback, **messages})
+            for lang, messages in raw.items()
+        }
+        return self._translators
+
+    @property
+    def translators(self) -> dict[str, Translator]:
+        if self._translators is None:
+            self.load()
+        return self._translators
+
+    def __contains__(self, locale: str) -> bool:
+        return locale in self.translators
+
+    def get(self, locale: Optional[str]) -> Translator:
+        """Переводчик для языка; неизвестный язык — язык по умолчанию"""
+        translators = self.translators
+        translator = translators.get(locale) or translators.get(self.default_locale)
+        if translator is None:
+            translator = translators[self.default_locale] = Translator(self.default_locale, {})
+        return translator
+
+
+# Общий каталог приложения
+i18n_catalog = I18nCatalog()
+
+
+def get_translator(locale: Optional[str]) -> Translator:
+    return i18n_catalog.get(locale)
@@ -0,0 +1,47 @@
+import logging
+import time
+from typing import Callable
+
+from aiogram.exceptions import TelegramRetryAfter
+
+from bot import config
+
+logger = logging.getLogger(__name__)
+
+
+class ProgressiveEditor:
+    """
+    Постепенно обновляет сообщение по мере потоковой генерации текста.
+
+    Правки ограничены по частоте (не чаще раза в interval секунд) и по приросту текста,
+    чтобы не упираться в лимиты Telegram на editMessageText. Ошибки правок не прерывают
+    генерацию: промежуточное превью просто пропускается, итог покажет вызывающий код.
+    """
+
+    def __init__(self, message, render: Callable[[str], str], interval: float = None, min_chars: int = None):
+        self.message = message
+        self.render = render
+        self.interval = config.AI_STREAM_EDIT_INTERVAL if interval is None else interval
+        self.min_chars = config.AI_STREAM_MIN_CHARS if min_chars is None else min_chars
+        self._next_edit_at = 0.0
+        self._shown_len = 0
+        self._closed = False
+
+    async def update(self, text: str):
+        if self._closed:
+            return
+        now = time.monotonic()
+        if now < self._next_edit_at or len(text) - self._shown_len < self.min_chars:
+            return
+        self._next_edit_at = now + self.interval
+        try:
+            await self.message.edit_text(self.render(text))
+            self._shown_len = len(text)
+        except TelegramRetryAfter as e:
+            self._next_edit_at = time.monotonic() + e.retry_after
+        except Exception as e:
+            logger.debug(f"Progressive edit skipped: {e}")
+
+    def close(self):
+        """Дальнейшие промежуточные правки игнорируются (итоговое сообщение уже показано)"""
+        self._closed = True
@@ -1,10 +1,63 @@
+import hashlib
 import random
 import string
 from typing import Optional
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
+from sqlalchemy import select, func
+from bot import config
 from bot.models.models import User
 
+# 32 символа без похожих (0/O, 1/I): ровно 5 бит на символ, 8 символов = 40 бит
+CODE_ALPHABET = "23456789ABCDEFGHJKLMNPQRSTUVWXYZ"
+CODE_LENGTH = 8
+_HALF_BITS = CODE_LENGTH * 5 // 2
+_HALF_MASK = (1 << _HALF_BITS) - 1
+_FEISTEL_ROUNDS = 4
+
+
+def _round_value(half: int, round_no: int, tweak: int, key: bytes) -> int:
+    digest = hashlib.blake2b(
+        half.to_bytes(4, "big") + bytes((round_no, tweak)), key=key, digest_size=4
+    ).digest()
+    return int.from_bytes(digest, "big") & _HALF_MASK
+
+
+def _permute(number: int, tweak: int = 0, secret: str = None) -> int:
+    """Сеть Фейстеля на 40 битах: биекция, то есть разные числа дают разные результаты"""
+    key = hashlib.blake2b((config.REFERRAL_CODE_SECRET if secret is None else secret).encode(), digest_size=32).digest()
+    left, right = number >> _HALF_BITS, number & _HALF_MASK
+    for round_no in range(_FEISTEL_ROUNDS):
+        left, right = right, left ^ _round_value(right, round_no, tweak, key)
+    return (left << _HALF_BITS) | right
+
+
+def encode_referral_code(number: int, tweak: int = 0, secret: str = None) -> str:
+    """
+    Реферальный код из ID пользователя без обращения к базе.
+
+    Перестановка с секретным ключом делает коды непоследовательными (соседние ID
+    дают непохожие коды), но взаимно однозначными — два пользователя не получат
+    один код. tweak выбирает другую перестановку, если код занят старым случайным кодом.
+    """
+    if not 0 <= number < 1 << (_HALF_BITS * 2):
+        raise ValueError(f"Referral code number out of range: {number}")
+    value = _permute(number, tweak, secret)
+    chars = []
+    for _ in range(CODE_LENGTH):
+        value, index = divmod(value, len(CODE_ALPHABET))
+        chars.append(CODE_ALPHABET[index])
+    return "".join(reversed(chars))
+
+
+async def next_user_id(session: AsyncSession) -> Optional[int]:
+    """
+    Резервирует ID пользователя из последовательности users.id (PostgreSQL),
+    чтобы реферальный код был известен ещё до INSERT. Для других СУБД — None.
+    """
+    if session.bind is None or session.bind.dialect.name != "postgresql":
+        return None
+    return await session.scalar(select(func.nextval(func.pg_get_serial_sequence("users", "id"))))
+
 
 def generate_referral_code(length: int = 8) -> str:
     """
@@ -109,8 +162,8 @@ def validate_referral_code(code: str) -> bool:
     if not code.isalnum():
         return False
     
-    # Проверяем, что код содержит только заглавные буквы
-    if not code.isupper():
+    # Проверяем, что код не содержит строчных букв (код может состоять из одних цифр)
+    if code != code.upper():
         return False
     
     return True 
\ No newline at end of file
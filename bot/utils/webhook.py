@@ -0,0 +1,108 @@
+import asyncio
+import hmac
+import logging
+from typing import Any
+
+from aiohttp import web
+from aiogram import Bot, Dispatcher
+from aiogram.methods import TelegramMethod
+from aiogram.webhook.aiohttp_server import setup_application
+
+from bot import config
+
+logger = logging.getLogger(__name__)
+
+SECRET_HEADER = "X-Telegram-Bot-Api-Secret-Token"
+
+
+def check_webhook_config():
+    """Без секретного токена вебхук принял бы апдейты от кого угодно — такой запуск запрещён"""
+    if config.BOT_MODE == "webhook" and not config.WEBHOOK_SECRET:
+        raise RuntimeError("BOT_MODE=webhook requires WEBHOOK_SECRET to be set")
+
+
+class BoundedRequestHandler:
+    """
+    Обработчик вебхука с ограничением числа одновременно обрабатываемых апдейтов.
+
+    Апдейт принимается и обрабатывается в фоне, но только при наличии свободного слота.
+    Если слотов нет, ответ Telegram задерживается до освобождения слота: Bot API держит
+    не больше max_connections запросов одновременно, поэтому поток апдейтов сам замедляется
+    (back-pressure), а не копится в памяти бесконечным числом задач.
+    Запросы без правильного X-Telegram-Bot-Api-Secret-Token отклоняются с 401.
+    """
+
+    def __init__(self, dispatcher: Dispatcher, bot: Bot, secret_token: str, max_concurrent: int = None, **data: Any):
+        if not secret_token:
+            raise ValueError("Webhook secret token is required")
+        self.dispatcher = dispatcher
+        self.bot = bot
+        self.data = data
+        self._secret = secret_token
+        self._slots = asyncio.Semaphore(max_concurrent or config.WEBHOOK_MAX_CONCURRENT_UPDATES)
+        self._tasks: set[asyncio.Task] = set()
+
+    def register(self, app: web.Application, path: str):
+        app.router.add_post(path, self.handle)
+        app.on_shutdown.append(self._on_shutdown)
+
+    async def handle(self, request: web.Request) -> web.Response:
+        if not hmac.compare_digest(request.headers.get(SECRET_HEADER, ""), self._secret):
+            return web.Response(text="Unauthorized", status=401)
+        try:
+            update = await request.json(loads=self.bot.session.json_loads)
+        except ValueError:
+            return web.Response(text="Bad Request", status=400)
+
+        await self._slots.acquire()
+        task = asyncio.create_task(self._feed_update(update))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return web.json_response({}, dumps=self.bot.session.json_dumps)
+
+    async def _feed_update(self, update: dict[str, Any]):
+        try:
+            result = await self.dispatcher.feed_raw_update(bot=self.bot, update=update, **self.data)
+            # Ответ хендлера методом Bot API в фоне уже не вернуть в теле вебхука — вызываем его сами
+            if isinstance(result, TelegramMethod):
+                await self.dispatcher.silent_call_request(bot=self.bot, result=result)
+        except Exception as e:
+            logger.exception(f"Webhook update failed: {e}")
+        finally:
+            self._slots.release()
+
+    async def _on_shutdown(self, app: web.Application):
+        # Даём начатым апдейтам завершиться, новые после остановки сервера уже не придут
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+
+
+async def _healthcheck(request: web.Request) -> web.Response:
+    return web.Response(text="ok")
+
+
+async def run_webhook(bot: Bot, dp: Dispatcher):
+    """Регистрирует вебхук в Telegram и обслуживает его aiohttp-сервером до остановки"""
+    check_webhook_config()
+    await bot.set_webhook(
+        url=f"{config.WEBHOOK_BASE_URL.rstrip('/')}{config.WEBHOOK_PATH}",
+        secret_token=config.WEBHOOK_SECRET,
+        max_connections=config.WEBHOOK_MAX_CONNECTIONS,
+        allowed_updates=dp.resolve_used_update_types(),
+    )
+
+    app = web.Application()
+    BoundedRequestHandler(dp, bot, secret_token=config.WEBHOOK_SECRET).register(app, path=config.WEBHOOK_PATH)
+    # Балансировщику нужен лёгкий эндпоинт проверки живости
+    app.router.add_get("/healthz", _healthcheck)
+    setup_application(app, dp, bot=bot)
+
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, host=config.WEBHOOK_HOST, port=config.WEBHOOK_PORT)
+    await site.start()
+    print(f"Webhook server listening on {config.WEBHOOK_HOST}:{config.WEBHOOK_PORT}{config.WEBHOOK_PATH}")
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await runner.cleanup()
@@ -18,16 +18,45 @@ engine = create_async_engine(
 
 AsyncSessionLocal = async_sessionmaker(engine, expire_on_commit=False)
 
-# Асинхронное подключение к Redis
+# Асинхронное подключение к Redis (по одному клиенту с пулом соединений на процесс)
 import redis.asyncio as aioredis
 
+_redis = None
+_binary_redis = None
+
+
 async def get_redis():
-    return aioredis.Redis(
-        host=config.REDIS_HOST,
-        port=config.REDIS_PORT,
-        password=config.REDIS_PASSWORD,
-        decode_responses=True
-    )
+    global _redis
+    if _redis is None:
+        _redis = aioredis.Redis(
+            host=config.REDIS_HOST,
+            port=config.REDIS_PORT,
+            password=config.REDIS_PASSWORD,
+            decode_responses=True
+        )
+    return _redis
+
+
+async def get_binary_redis():
+    """Клиент без декодирования ответов — для бинарных (msgpack) значений"""
+    global _binary_redis
+    if _binary_redis is None:
+        _binary_redis = aioredis.Redis(
+            host=config.REDIS_HOST,
+            port=config.REDIS_PORT,
+            password=config.REDIS_PASSWORD,
+            decode_responses=False
+        )
+    return _binary_redis
+
+
+async def close_redis():
+    """Закрывает клиенты Redis (вызывается при остановке бота)"""
+    global _redis, _binary_redis
+    for client in (_redis, _binary_redis):
+        if client is not None:
+            await client.aclose()
+    _redis = _binary_redis = None
 
 async def test_db_connection():
     """Тестирует подключение к базе данных"""
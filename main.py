@@ -6,7 +6,7 @@ from aiogram.client.default import DefaultBotProperties
 from aiogram.types import BotCommand
 
 from bot.handlers.workflows import register_workflow_handlers
-from db.connection import AsyncSessionLocal, get_redis
+from db.connection import AsyncSessionLocal, get_redis, close_redis
 from bot.middlewares.db import DatabaseSessionMiddleware
 from bot.middlewares.auth import AuthMiddleware
 from bot.middlewares.i18n import I18nMiddleware
@@ -15,6 +15,15 @@ from bot.middlewares.redis import RedisMiddleware
 from bot.handlers.basic import register_basic_handlers
 from bot.handlers.socials import register_socials_handlers
 from bot.handlers.posts import register_posts_handlers
+from bot.services.ai import init_http_session, close_http_session
+from bot.services.ai.generation_queue import generation_queue
+from bot.services.workflows import WorkflowExecutor
+from bot.services.publishing import PublishingService, PublishingScheduler
+from bot.services.cache import user_cache
+from bot.services.stats import StatsCollector, setup_telegram_stats, close_telegram_stats
+from bot.utils.fsm_storage import create_fsm_storage
+from bot.utils.webhook import check_webhook_config, run_webhook
+from bot.utils.i18n import i18n_catalog
 
 
 def register_all_handlers(dp: Dispatcher):
@@ -47,8 +56,19 @@ async def set_bot_commands(bot: Bot):
     await bot.set_my_commands(commands)
 
 
+def create_dispatcher(redis) -> Dispatcher:
+    """Dispatcher с FSM в Redis (или в памяти процесса, если FSM_STORAGE=memory)"""
+    if config.FSM_STORAGE == "redis":
+        storage = create_fsm_storage(redis)
+        # Блокировка по пользователю общая для всех реплик
+        return Dispatcher(storage=storage, events_isolation=storage.create_isolation())
+    return Dispatcher()
+
+
 async def on_startup():
     from db.connection import test_db_connection
+    # Переводы загружаются один раз на процесс
+    i18n_catalog.load()
     # Проверяем подключение к базе данных
     db_ok = await test_db_connection()
     if not db_ok:
@@ -58,47 +78,64 @@ async def on_startup():
     
     print("✅ Подключение к базе данных успешно")
 
+    # Общий пул HTTP-соединений для AI-запросов
+    await init_http_session()
+
 
 async def on_shutdown():
     # Останавливаем фоновые задачи (шедулер), если запущены
     try:
-        global _scheduler_task
-        if _scheduler_task:
-            _scheduler_task.cancel()
+        global _publishing_scheduler, _workflow_task, _stats_task
+        if _publishing_scheduler:
+            await _publishing_scheduler.stop()
+        if _workflow_task:
+            _workflow_task.cancel()
+        if _stats_task:
+            _stats_task.cancel()
     except Exception:
         pass
-    # Закрываем Redis
-    redis = await get_redis()
-    await redis.aclose()
+    await close_telegram_stats()
+    # Останавливаем воркеры AI-генерации
+    await generation_queue.stop()
+    # Закрываем пул HTTP-соединений к AI
+    await close_http_session()
+    # Отписываемся от инвалидаций кэша и закрываем Redis
+    await user_cache.stop()
+    await close_redis()
 
 
 async def main():
+    # Ошибки конфигурации — до запуска фоновых сервисов
+    check_webhook_config()
     bot = Bot(token=config.BOT_TOKEN, default=DefaultBotProperties(parse_mode="HTML"))
-    dp = Dispatcher()
-
     redis = await get_redis()
+    dp = create_dispatcher(redis)
     await set_middlewares(dp, redis)
     register_all_handlers(dp)
 
     await on_startup()
     await set_bot_commands(bot)
+    # Воркеры фоновой AI-генерации
+    generation_queue.start()
+    # Подписка на инвалидации кэша пользователей от других реплик
+    user_cache.start()
     print("Bot started!")
-    # Запускаем фоновый шедулер публикаций
-    async def start_scheduler(bot: Bot):
-        from bot.services.publishing.publisher import PublishingService
-        svc = PublishingService(bot)
-        while True:
-            try:
-                async with AsyncSessionLocal() as session:
-                    await svc.run_publishing_cycle(session)
-            except Exception as e:
-                print(f"Scheduler error: {e}")
-            # Пауза между циклами
-            await asyncio.sleep(60)
-
-    global _scheduler_task
-    _scheduler_task = asyncio.create_task(start_scheduler(bot))
-    await dp.start_polling(bot, shutdown=on_shutdown)
+    # Запускаем планировщик публикаций (просыпается к ближайшему посту)
+    global _publishing_scheduler
+    _publishing_scheduler = PublishingScheduler(PublishingService(bot))
+    _publishing_scheduler.start()
+    # Движок автопостинга: генерирует посты по расписанию задач
+    global _workflow_task
+    _workflow_task = asyncio.create_task(WorkflowExecutor().run_forever())
+    # Сбор метрик опубликованных постов (для Telegram — через MTProto, если включён)
+    setup_telegram_stats()
+    global _stats_task
+    _stats_task = asyncio.create_task(StatsCollector(bot).run_forever())
+    dp.shutdown.register(on_shutdown)
+    if config.BOT_MODE == "webhook":
+        await run_webhook(bot, dp)
+    else:
+        await dp.start_polling(bot)
 
 
 if __name__ == "__main__":
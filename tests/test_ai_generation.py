@@ -1,6 +1,6 @@
 import pytest
 import asyncio
-from bot.services.ai import OpenAIService
+from bot.services.ai import OpenAIService, init_http_session, get_http_session, close_http_session
 
 
 @pytest.mark.asyncio
@@ -127,6 +127,19 @@ async def test_model_selection():
     assert len(content_premium) > 10
 
 
+@pytest.mark.asyncio
+async def test_shared_http_session():
+    """Тест переиспользования общего пула HTTP-соединений"""
+    http_session = await init_http_session()
+    try:
+        assert get_http_session() is http_session
+        assert OpenAIService().http_session is http_session
+        assert OpenAIService().http_session is OpenAIService().http_session
+    finally:
+        await close_http_session()
+    assert http_session.closed
+
+
 if __name__ == "__main__":
     # Запуск тестов
     asyncio.run(test_mock_content_generation())
@@ -0,0 +1,137 @@
+import asyncio
+
+import pytest
+
+from bot.services.ai.resilience import (
+    AIProviderError, AIResilience, AdaptiveConcurrencyLimiter, CircuitBreaker, CircuitOpenError,
+    error_from_response,
+)
+
+
+def make_resilience(**kwargs) -> AIResilience:
+    limiter = AdaptiveConcurrencyLimiter(initial=4, min_limit=1, max_limit=8, latency_target=10)
+    breaker = CircuitBreaker(failure_threshold=kwargs.pop("failures", 3), reset_timeout=60)
+    return AIResilience(limiter=limiter, breaker=breaker, attempts=3, base_delay=0, max_delay=0, deadline=5, **kwargs)
+
+
+def test_error_classification():
+    """Тест: 429 и 5xx повторяются (с учётом Retry-After), 400 — нет"""
+    rate_limited = error_from_response(429, {"Retry-After": "2"})
+    assert rate_limited.retryable and rate_limited.retry_after == 2
+    assert error_from_response(503, {}).retryable
+    assert not error_from_response(400, {}).retryable
+    assert error_from_response(429, {"retry-after-ms": "250"}).retry_after == 0.25
+
+
+@pytest.mark.asyncio
+async def test_retries_transient_errors_and_backs_off_limit():
+    """Тест: временные ошибки повторяются, 429 уменьшает лимит параллелизма"""
+    resilience = make_resilience()
+    calls = []
+
+    async def request():
+        calls.append(1)
+        if len(calls) < 3:
+            raise AIProviderError("rate limited", status=429, retry_after=0)
+        return "ok"
+
+    assert await resilience.call(request) == "ok"
+    assert len(calls) == 3
+    assert resilience.limiter.limit < 4
+
+
+@pytest.mark.asyncio
+async def test_non_retryable_error_is_raised_once():
+    """Тест: ошибка запроса (400) не повторяется и не размыкает цепь"""
+    resilience = make_resilience(failures=1)
+    calls = []
+
+    async def request():
+        calls.append(1)
+        raise AIProviderError("bad request", status=400, retryable=False)
+
+    with pytest.raises(AIProviderError):
+        await resilience.call(request)
+    assert len(calls) == 1
+    assert resilience.breaker.state == "closed"
+
+
+@pytest.mark.asyncio
+async def test_breaker_fails_fast_when_open():
+    """Тест: после серии ошибок запросы отклоняются без обращения к провайдеру"""
+    resilience = make_resilience(failures=3)
+    calls = []
+
+    async def request():
+        calls.append(1)
+        raise AIProviderError("server error", status=500, retry_after=0)
+
+    with pytest.raises(AIProviderError):
+        await resilience.call(request)
+    assert resilience.breaker.state == "open"
+
+    with pytest.raises(CircuitOpenError):
+        await resilience.call(request)
+    assert len(calls) == 3
+
+
+@pytest.mark.asyncio
+async def test_limiter_blocks_above_limit():
+    """Тест: сверх лимита запросы ждут освобождения слота"""
+    limiter = AdaptiveConcurrencyLimiter(initial=1, min_limit=1, max_limit=4, latency_target=10)
+    await limiter.acquire()
+    waiter = asyncio.ensure_future(limiter.acquire())
+    await asyncio.sleep(0)
+    assert not waiter.done()
+
+    limiter.release()
+    await asyncio.wait_for(waiter, timeout=1)
+    assert limiter.in_flight == 1
+
+    for _ in range(3):
+        limiter.on_success(latency=0.1)
+    assert limiter.limit == 2
+
+
+@pytest.mark.asyncio
+async def test_hedged_request_uses_fallback_when_primary_is_slow():
+    """Тест: медленный основной запрос дублируется резервным, побеждает первый ответ"""
+    resilience = make_resilience()
+    primary_cancelled = asyncio.Event()
+
+    async def primary():
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            primary_cancelled.set()
+            raise
+        return "primary"
+
+    async def fallback():
+        return "fallback"
+
+    assert await resilience.hedged(primary, fallback, delay=0.05) == "fallback"
+    await asyncio.wait_for(primary_cancelled.wait(), timeout=1)
+    assert resilience.limiter.in_flight == 0
+
+
+@pytest.mark.asyncio
+async def test_unexpected_error_releases_half_open_probe():
+    """Тест: неожиданная ошибка пробного запроса не оставляет цепь half-open навсегда"""
+    resilience = make_resilience(failures=1)
+    resilience.breaker.record_failure()
+    resilience.breaker._opened_at -= resilience.breaker.reset_timeout
+    assert resilience.breaker.state == "half_open"
+
+    async def broken():
+        raise KeyError("choices")
+
+    with pytest.raises(KeyError):
+        await resilience.call(broken)
+
+    async def request():
+        return "ok"
+
+    assert await resilience.call(request) == "ok"
+    assert resilience.breaker.state == "closed"
+    assert resilience.limiter.in_flight == 0
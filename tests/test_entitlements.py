@@ -0,0 +1,180 @@
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+from sqlalchemy.dialects import postgresql
+
+from bot.services.entitlements import limits as limits_module
+from bot.services.entitlements.limits import LimitState, consume_post, acquire_workflow_slot, limit_state_query
+
+
+def compile_pg(statement) -> str:
+    return str(statement.compile(dialect=postgresql.dialect()))
+
+
+def test_limit_state_is_single_query():
+    """Тест: подписка, план и счётчики читаются одним SELECT"""
+    sql = compile_pg(limit_state_query(1))
+    assert sql.count("SELECT") == 1
+    assert "LEFT OUTER JOIN subscriptions" in sql
+    assert "LEFT OUTER JOIN usage_stats" in sql
+
+
+def test_limit_state_flags():
+    """Тест: флаги возможностей считаются из счётчиков и лимитов"""
+    free = LimitState(user_id=1, free_posts_used=5, free_posts_limit=5)
+    assert not free.has_subscription and not free.can_create_post
+    paid = LimitState(user_id=1, subscription_id=3, posts_limit=10, posts_used=9, channels_limit=2, active_workflows=2)
+    assert paid.can_create_post
+    assert not paid.can_activate_workflow
+
+
+@pytest.mark.asyncio
+async def test_consume_post_uses_conditional_update(monkeypatch):
+    """Тест: пост списывается условным UPDATE, при исчерпанном лимите — отказ"""
+    executed = []
+
+    async def execute(statement):
+        executed.append(statement)
+        result = MagicMock()
+        result.scalar_one_or_none.return_value = None  # условие x + 1 <= limit не выполнено
+        return result
+
+    session = MagicMock()
+    session.execute = execute
+    session.commit = AsyncMock()
+    invalidate = AsyncMock()
+    monkeypatch.setattr(limits_module, "invalidate_limit_state", invalidate)
+
+    state = LimitState(user_id=1, subscription_id=3, posts_limit=10, posts_used=10)
+    assert await consume_post(session, state) is False
+
+    sql = compile_pg(executed[0])
+    assert sql.startswith("UPDATE usage_stats SET posts_used=")
+    assert "RETURNING usage_stats.posts_used" in sql
+    assert "<=" in sql
+    invalidate.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_acquire_workflow_slot_updates_state(monkeypatch):
+    """Тест: успешный захват слота обновляет счётчик и сбрасывает кэш лимитов"""
+    monkeypatch.setattr(limits_module, "try_increment_usage", AsyncMock(return_value=2))
+    invalidate = AsyncMock()
+    monkeypatch.setattr(limits_module, "invalidate_limit_state", invalidate)
+
+    state = LimitState(user_id=1, subscription_id=3, channels_limit=3, active_workflows=1)
+    assert await acquire_workflow_slot(MagicMock(), state) is True
+    assert state.active_workflows == 2
+    invalidate.assert_awaited_once_with(1)
+
+    no_sub = LimitState(user_id=2)
+    assert await acquire_workflow_slot(MagicMock(), no_sub) is False
+
+
+@pytest.mark.asyncio
+async def test_manual_post_respects_manual_limit(monkeypatch):
+    """Тест: ручной пост сверх manual_posts_limit отклоняется, общий лимит не тратится"""
+    counters = {"posts_used": 0, "manual_posts_used": 2}
+
+    async def try_increment(session, subscription_id, field, limit, count=1):
+        if counters[field] + count > limit:
+            return None
+        counters[field] += count
+        return counters[field]
+
+    monkeypatch.setattr(limits_module, "try_increment_usage", try_increment)
+    monkeypatch.setattr(limits_module, "invalidate_limit_state", AsyncMock())
+
+    state = LimitState(user_id=1, subscription_id=3, posts_limit=10, manual_posts_limit=2, manual_posts_used=2)
+    assert await consume_post(MagicMock(), state, is_manual=True) is False
+    assert counters == {"posts_used": 0, "manual_posts_used": 2}
+
+    assert await consume_post(MagicMock(), state) is True
+    assert counters["posts_used"] == 1 and state.posts_used == 1
+
+
+@pytest.mark.asyncio
+async def test_manual_post_refunded_when_posts_limit_exhausted(monkeypatch):
+    """Тест: если исчерпан общий лимит, списанный ручной пост возвращается"""
+    monkeypatch.setattr(limits_module, "try_increment_usage", AsyncMock(side_effect=[1, None]))
+    refund = AsyncMock()
+    monkeypatch.setattr(limits_module, "increment_usage", refund)
+    monkeypatch.setattr(limits_module, "invalidate_limit_state", AsyncMock())
+
+    state = LimitState(user_id=1, subscription_id=3, posts_limit=5, posts_used=5, manual_posts_limit=3)
+    assert await consume_post(MagicMock(), state, is_manual=True) is False
+    refund.assert_awaited_once()
+    assert refund.await_args.args[1:] == (3, "manual_posts_used", -1)
+
+
+@pytest.mark.asyncio
+async def test_deactivation_releases_slot_after_commit(monkeypatch):
+    """Тест: слот активной задачи освобождается только после коммита выключения"""
+    from bot.services import entitlements
+    from bot.services.crud import workflow as workflow_module
+
+    calls = []
+    workflow = MagicMock(status="active", user_id=1)
+    result = MagicMock()
+    result.scalar_one_or_none.return_value = workflow
+    session = MagicMock()
+    session.execute = AsyncMock(return_value=result)
+    session.commit = AsyncMock(side_effect=lambda: calls.append("commit"))
+    session.refresh = AsyncMock()
+
+    async def release(session, user_id):
+        calls.append("release")
+
+    monkeypatch.setattr(entitlements, "release_workflow_slot", release)
+    monkeypatch.setattr(workflow_module, "invalidate_profile_summary", AsyncMock())
+
+    toggled, error = await workflow_module.toggle_workflow_status(session, 1, 5)
+    assert error is None and toggled.status == "inactive"
+    assert calls == ["commit", "release"]
+
+
+@pytest.mark.parametrize("failure", ["raises", "returns_none"])
+@pytest.mark.asyncio
+async def test_failed_post_creation_refunds_quota(monkeypatch, failure):
+    """Тест: если пост не создался, списанный лимит возвращается"""
+    from bot import services
+    from bot.handlers.posts import add as add_module
+    from bot.services.crud import post as post_crud
+
+    state_limits = LimitState(user_id=1, subscription_id=3, posts_limit=10, manual_posts_limit=5)
+    monkeypatch.setattr(services.entitlements, "get_limit_state", AsyncMock(return_value=state_limits))
+    monkeypatch.setattr(services.entitlements, "consume_post", AsyncMock(return_value=True))
+    refund = AsyncMock()
+    monkeypatch.setattr(services.entitlements, "refund_post", refund)
+    create = AsyncMock(side_effect=RuntimeError("db down")) if failure == "raises" else AsyncMock(return_value=None)
+    monkeypatch.setattr(post_crud, "create_manual_post", create)
+
+    fsm = MagicMock()
+    fsm.get_data = AsyncMock(return_value={"topic": "ETF", "is_manual": True})
+    fsm.clear = AsyncMock()
+    callback = MagicMock()
+    callback.message.answer = AsyncMock()
+    session = MagicMock()
+    session.rollback = AsyncMock()
+    i18n = MagicMock()
+    i18n.get.side_effect = lambda key, default=None: default
+
+    await add_module.create_post_from_content("Текст", callback, fsm, session, MagicMock(id=1), i18n)
+
+    refund.assert_awaited_once_with(session, state_limits, is_manual=True)
+    session.rollback.assert_awaited_once()
+    assert "Ошибка создания поста" in callback.message.answer.await_args.args[0]
+
+
+@pytest.mark.asyncio
+async def test_refund_post_returns_subscription_and_manual_counters(monkeypatch):
+    """Тест: возврат поста уменьшает общий и ручной счётчики подписки"""
+    increment = AsyncMock(side_effect=[4, 1])
+    monkeypatch.setattr(limits_module, "increment_usage", increment)
+    monkeypatch.setattr(limits_module, "invalidate_limit_state", AsyncMock())
+
+    state = LimitState(user_id=1, subscription_id=3, posts_used=5, manual_posts_used=2)
+    await limits_module.refund_post(MagicMock(), state, is_manual=True)
+
+    assert [c.args[1:] for c in increment.await_args_list] == [(3, "posts_used", -1), (3, "manual_posts_used", -1)]
+    assert (state.posts_used, state.manual_posts_used) == (4, 1)
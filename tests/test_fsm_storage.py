@@ -0,0 +1,21 @@
+from unittest.mock import MagicMock
+
+from bot.utils.fsm_storage import TTLRedisStorage, compact_dumps
+
+
+def test_state_ttl_resolution():
+    """Тест: TTL берётся по полному имени состояния, затем по группе, затем по умолчанию"""
+    storage = TTLRedisStorage(
+        MagicMock(),
+        state_ttls={"AddPostStates": 600, "AddPostStates:generating": 60},
+        default_ttl=3600,
+    )
+    assert storage.ttl_for("AddPostStates:generating") == 60
+    assert storage.ttl_for("AddPostStates:choosing_style") == 600
+    assert storage.ttl_for("SettingsStates:waiting_for_email") == 3600
+    assert storage.ttl_for(None) == 3600
+
+
+def test_compact_serialization():
+    """Тест: данные FSM сериализуются без пробелов и экранирования кириллицы"""
+    assert compact_dumps({"topic": "Тема", "n": 1}) == '{"topic":"Тема","n":1}'
@@ -0,0 +1,99 @@
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+
+from bot.services.ai import openai_service as service_module
+from bot.services.ai.generation_cache import GenerationCache, generation_cache_key
+from bot.services.ai.openai_service import OpenAIService
+
+
+class FakeRedis:
+    """Минимальный Redis в памяти: строки и отсортированное множество"""
+
+    def __init__(self):
+        self.values = {}
+        self.zset = {}
+
+    async def get(self, key):
+        return self.values.get(key)
+
+    async def zadd(self, key, mapping):
+        self.zset.update(mapping)
+
+    async def zpopmin(self, key, count):
+        popped = sorted(self.zset.items(), key=lambda item: item[1])[:count]
+        for member, _ in popped:
+            del self.zset[member]
+        return popped
+
+    async def delete(self, *keys):
+        for key in keys:
+            self.values.pop(key, None)
+
+    def pipeline(self, transaction=True):
+        redis, calls = self, []
+
+        class Pipeline:
+            def set(self, key, value, ex=None):
+                calls.append(lambda: redis.values.__setitem__(key, value))
+
+            def zadd(self, key, mapping):
+                calls.append(lambda: redis.zset.update(mapping))
+
+            def zcard(self, key):
+                calls.append(lambda: len(redis.zset))
+
+            async def execute(self):
+                return [call() for call in calls]
+
+        return Pipeline()
+
+
+def test_key_ignores_whitespace_but_not_params():
+    """Тест: ключ не зависит от отступов в промпте, но зависит от модели и температуры"""
+    base = {"model": "gpt-4", "temperature": 0.7, "messages": [{"role": "user", "content": "Пост  про\n ETF "}]}
+    same = {**base, "messages": [{"role": "user", "content": "Пост про ETF"}]}
+    assert generation_cache_key(base) == generation_cache_key(same)
+    assert generation_cache_key(base) != generation_cache_key({**base, "temperature": 0.9})
+    assert generation_cache_key(base) != generation_cache_key({**base, "model": "gpt-3.5-turbo"})
+
+
+@pytest.mark.asyncio
+async def test_cache_evicts_least_recently_read():
+    """Тест: при переполнении вытесняется запись, которую дольше всех не читали"""
+    redis = FakeRedis()
+    cache = GenerationCache(ttl=60, max_entries=2, redis=redis)
+    await cache.set("a", "A")
+    await cache.set("b", "B")
+    redis.zset["a"] += 10  # «a» прочитали позже «b»
+    await cache.set("c", "C")
+
+    assert await cache.get("b") is None
+    assert await cache.get("a") == "A"
+    assert await cache.get("c") == "C"
+
+
+def _service_with_response(text: str) -> tuple[OpenAIService, MagicMock]:
+    response = MagicMock(status=200)
+    response.json = AsyncMock(return_value={"choices": [{"message": {"content": text}}]})
+    context = MagicMock()
+    context.__aenter__ = AsyncMock(return_value=response)
+    context.__aexit__ = AsyncMock(return_value=False)
+    http = MagicMock()
+    http.post.return_value = context
+    return OpenAIService(api_key="key", http_session=http), http
+
+
+@pytest.mark.asyncio
+async def test_service_reuses_cached_text(monkeypatch):
+    """Тест: повторный одинаковый запрос отдаётся из кэша, перегенерация идёт в API"""
+    monkeypatch.setattr(service_module, "generation_cache", GenerationCache(ttl=60, max_entries=10, redis=FakeRedis()))
+    service, http = _service_with_response("Готовый пост")
+    params = dict(topic="ETF", theme="финансы")
+
+    assert await service.generate_post_content(**params) == "Готовый пост"
+    assert await service.generate_post_content(**params) == "Готовый пост"
+    assert http.post.call_count == 1
+
+    await service.generate_post_content(**params, use_cache=False)
+    assert http.post.call_count == 2
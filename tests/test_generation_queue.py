@@ -0,0 +1,115 @@
+import asyncio
+import pytest
+
+from bot.services.ai.generation_queue import GenerationQueue, GenerationJob
+
+
+@pytest.mark.asyncio
+async def test_generation_job_is_processed_in_background():
+    """Тест выполнения задачи генерации воркером очереди"""
+    queue = GenerationQueue(workers=2)
+    done = asyncio.Event()
+    results = []
+
+    async def on_done(content):
+        results.append(content)
+        done.set()
+
+    await queue.submit(GenerationJob(
+        params=dict(topic="Инвестиции в ETF", theme="финансы", language="ru"),
+        on_done=on_done
+    ))
+    assert queue.is_running
+
+    await asyncio.wait_for(done.wait(), timeout=5)
+    await queue.stop()
+
+    assert results and results[0]
+    assert not queue.is_running
+
+
+@pytest.mark.asyncio
+async def test_generation_job_failure_reports_none():
+    """Тест: ошибка генерации передаётся в колбэк как None"""
+    queue = GenerationQueue(workers=1)
+    done = asyncio.Event()
+    results = []
+
+    async def on_done(content):
+        results.append(content)
+        done.set()
+
+    # Неизвестный аргумент приводит к исключению внутри воркера
+    await queue.submit(GenerationJob(params=dict(unknown_arg=True), on_done=on_done))
+    await asyncio.wait_for(done.wait(), timeout=5)
+    await queue.stop()
+
+    assert results == [None]
+
+
+@pytest.mark.asyncio
+async def test_jobs_are_taken_by_priority_with_aging(monkeypatch):
+    """Тест: платные интерактивные задачи берутся первыми, но старые фоновые не голодают"""
+    from bot.services.ai import generation_queue as queue_module
+
+    clock = [1000.0]
+    monkeypatch.setattr(queue_module.time, "monotonic", lambda: clock[0])
+    queue = GenerationQueue(workers=1, aging_seconds=30, background_limit=2)
+    queue._queue = asyncio.PriorityQueue()
+    queue._tasks = [None]  # воркеры не запускаем: порядок проверяем напрямую
+
+    async def noop(content):
+        pass
+
+    def job(name, priority):
+        return GenerationJob(params={"topic": name}, on_done=noop, priority=priority)
+
+    await queue.submit(job("old-background", queue_module.PRIORITY_BACKGROUND))
+    clock[0] += 45
+    await queue.submit(job("free", queue_module.PRIORITY_INTERACTIVE))
+    await queue.submit(job("premium", queue_module.PRIORITY_PREMIUM))
+    clock[0] += 30
+    await queue.submit(job("late-premium", queue_module.PRIORITY_PREMIUM))
+    await queue.submit(job("new-background", queue_module.PRIORITY_BACKGROUND))
+
+    order = []
+    while not queue._queue.empty():
+        _, _, item = queue._queue.get_nowait()
+        order.append(item.params["topic"])
+    assert order == ["premium", "old-background", "free", "late-premium", "new-background"]
+
+
+@pytest.mark.asyncio
+async def test_interactive_job_not_delayed_by_background_batch():
+    """Тест: при сотне фоновых задач интерактивная ждёт не дольше одной генерации"""
+    from bot.services.ai import generation_queue as queue_module
+
+    class SlowService:
+        async def generate_post_content(self, **params):
+            await asyncio.sleep(0.05)
+            return params["topic"]
+
+    # Малое старение: фоновые задачи успевают «постареть» и обогнать новые премиальные
+    queue = GenerationQueue(workers=3, aging_seconds=0.01, background_limit=2)
+    queue.start()
+    queue._service = SlowService()
+    try:
+        background = [
+            asyncio.ensure_future(queue.generate({"topic": f"bg-{i}"}, priority=queue_module.PRIORITY_BACKGROUND))
+            for i in range(100)
+        ]
+        await asyncio.sleep(0.12)
+        assert queue.qsize() <= 2
+
+        started = asyncio.get_running_loop().time()
+        result = await queue.generate({"topic": "premium"}, priority=queue_module.PRIORITY_PREMIUM)
+        waited = asyncio.get_running_loop().time() - started
+
+        assert result == "premium"
+        assert waited < 0.1
+        assert sum(task.done() for task in background) < 20
+    finally:
+        await queue.stop()
+        for task in background:
+            task.cancel()
+        await asyncio.gather(*background, return_exceptions=True)
@@ -0,0 +1,100 @@
+import json
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+
+from bot.handlers.posts import add as add_module
+from bot.services.ai.openai_service import OpenAIService
+
+
+def _http_returning(response) -> MagicMock:
+    context = MagicMock()
+    context.__aenter__ = AsyncMock(return_value=response)
+    context.__aexit__ = AsyncMock(return_value=False)
+    http = MagicMock()
+    http.post.return_value = context
+    return http
+
+
+class StreamContent:
+    def __init__(self, lines):
+        self._lines = iter(lines)
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        try:
+            return next(self._lines)
+        except StopIteration:
+            raise StopAsyncIteration
+
+
+@pytest.mark.asyncio
+async def test_variants_in_single_request():
+    """Тест: несколько вариантов запрашиваются одним вызовом с параметром n"""
+    response = MagicMock(status=200)
+    response.json = AsyncMock(return_value={"choices": [
+        {"index": 1, "message": {"content": "Второй"}},
+        {"index": 0, "message": {"content": "Первый"}},
+    ]})
+    http = _http_returning(response)
+
+    service = OpenAIService(api_key="key", http_session=http)
+    variants = await service.generate_post_variants(topic="t", theme="x", variants=2)
+
+    assert variants == ["Первый", "Второй"]
+    assert http.post.call_count == 1
+    assert http.post.call_args.kwargs["json"]["n"] == 2
+
+
+@pytest.mark.asyncio
+async def test_stream_splits_variants_by_index():
+    """Тест: в потоке фрагменты вариантов разделяются по index, превью строится по первому"""
+    chunks = [(0, "A1"), (1, "B1"), (0, " A2"), (1, " B2")]
+    lines = [
+        f"data: {json.dumps({'choices': [{'index': i, 'delta': {'content': text}}]})}\n".encode()
+        for i, text in chunks
+    ] + [b"data: [DONE]\n"]
+    http = _http_returning(MagicMock(status=200, content=StreamContent(lines)))
+    partials = []
+
+    async def on_partial(text):
+        partials.append(text)
+
+    service = OpenAIService(api_key="key", http_session=http)
+    variants = await service.generate_post_variants(topic="t", theme="x", variants=2, on_partial=on_partial)
+
+    assert variants == ["A1 A2", "B1 B2"]
+    assert partials == ["A1", "A1 A2"]
+
+
+@pytest.mark.asyncio
+async def test_regenerate_serves_stored_variant(monkeypatch):
+    """Тест: «Перегенерировать» показывает сохранённый вариант без новой генерации"""
+    submit = AsyncMock()
+    monkeypatch.setattr(add_module.generation_queue, "submit", submit)
+
+    state = MagicMock()
+    state.get_data = AsyncMock(return_value={
+        "topic": "ETF",
+        "pending_variants": ["Вариант 2", "Вариант 3"],
+        "variant_params": {"topic": "ETF", "theme": "финансы", "style": "friendly", "content_length": "medium"},
+        "variant_is_premium": False,
+    })
+    state.update_data = AsyncMock()
+    state.set_state = AsyncMock()
+
+    callback = MagicMock()
+    callback.answer = AsyncMock()
+    callback.message.edit_text = AsyncMock(return_value=True)
+    callback.message.message_id = 42
+    i18n = MagicMock()
+    i18n.get.side_effect = lambda key, default=None: default
+
+    await add_module.process_regenerate_content(callback, state, session=None, user=None, i18n=i18n)
+
+    submit.assert_not_called()
+    state.update_data.assert_any_await(pending_variants=["Вариант 3"])
+    assert "Вариант 2" in callback.message.edit_text.await_args.args[0]
+    state.set_state.assert_awaited_with(add_module.AddPostStates.confirming_post)
@@ -0,0 +1,40 @@
+import json
+
+from bot.utils.i18n import I18nCatalog, Translator
+
+
+def make_catalog(tmp_path):
+    (tmp_path / "en.json").write_text(json.dumps({"welcome": "Hello, {name}!", "only.en": "EN only"}), encoding="utf-8")
+    (tmp_path / "ru.json").write_text(json.dumps({"welcome": "Привет, {name}!"}), encoding="utf-8")
+    return I18nCatalog(locales_path=str(tmp_path), default_locale="en")
+
+
+def test_catalog_falls_back_to_default_locale(tmp_path):
+    """Тест: отсутствующие ключи и неизвестный язык берутся из языка по умолчанию"""
+    catalog = make_catalog(tmp_path)
+    ru = catalog.get("ru")
+    assert isinstance(ru, dict)
+    assert ru.get("only.en") == "EN only"
+    assert catalog.get("de").locale == "en"
+    assert "de" not in catalog
+
+
+def test_translator_formats_templates():
+    """Тест: t() подставляет параметры, а при ошибке или отсутствии ключа не падает"""
+    translator = Translator("ru", {"welcome": "Привет, {name}!", "plain": "Текст {не шаблон"})
+    assert translator.t("welcome", name="Аня") == "Привет, Аня!"
+    assert translator.t("welcome") == "Привет, {name}!"
+    assert translator.t("plain") == "Текст {не шаблон"
+    assert translator.t("missing", "Нет {x}", x=1) == "Нет 1"
+    assert translator.t("missing") == "missing"
+
+
+def test_catalog_reads_files_once(tmp_path, monkeypatch):
+    """Тест: файлы переводов читаются один раз на процесс"""
+    catalog = make_catalog(tmp_path)
+    calls = []
+    original_load = catalog.load
+    monkeypatch.setattr(catalog, "load", lambda: calls.append(1) or original_load())
+    for _ in range(3):
+        catalog.get("ru")
+    assert len(calls) == 1
@@ -0,0 +1,54 @@
+import pytest
+from unittest.mock import AsyncMock, MagicMock
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+from sqlalchemy.orm import Session
+
+from bot.middlewares.db import LazySession
+from bot.models.models import PostStats, User
+
+
+def _factory():
+    session = MagicMock()
+    session.new = session.dirty = session.deleted = ()
+    session.execute = AsyncMock()
+    session.sync_session = Session()
+    return MagicMock(return_value=session)
+
+
+def test_lazy_session_not_created_without_access():
+    """Тест: сессия не создаётся, если хендлер не обращался к БД"""
+    factory = _factory()
+    session = LazySession(factory)
+    assert not session.started
+    assert not session.has_pending_changes()
+    factory.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_lazy_session_tracks_writes():
+    """Тест: чтение не требует коммита, UPDATE — требует"""
+    session = LazySession(_factory())
+    await session.execute(select(User.id))
+    assert session.started
+    assert not session.has_pending_changes()
+
+    await session.execute(update(User).values(name="x"))
+    assert session.has_pending_changes()
+
+
+@pytest.mark.asyncio
+async def test_lazy_session_commits_autoflushed_changes():
+    """Тест: изменения, ушедшие в БД через autoflush, всё равно требуют коммита"""
+    engine = create_async_engine("sqlite+aiosqlite:///:memory:")
+    async with engine.begin() as conn:
+        await conn.run_sync(PostStats.__table__.create)
+    try:
+        session = LazySession(async_sessionmaker(engine, expire_on_commit=False))
+        session.add(PostStats(post_id=1, views=1))
+        await session.execute(select(PostStats.id))
+        assert not session.new
+        assert session.has_pending_changes()
+        await session.close()
+    finally:
+        await engine.dispose()
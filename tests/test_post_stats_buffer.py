@@ -0,0 +1,90 @@
+import pytest
+import pytest_asyncio
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+
+from bot.models.models import PostStats
+from bot.services.crud.post_stats import (
+    increment_post_stats, get_post_stats_by_post_id, touch_post_stats_batch, upsert_post_stats_batch,
+)
+from bot.services.stats.buffer import PostStatsBuffer
+
+
+@pytest_asyncio.fixture
+async def session_factory():
+    engine = create_async_engine("sqlite+aiosqlite:///:memory:")
+    async with engine.begin() as conn:
+        await conn.run_sync(PostStats.__table__.create)
+    yield async_sessionmaker(engine, expire_on_commit=False)
+    await engine.dispose()
+
+
+@pytest.mark.asyncio
+async def test_increment_creates_and_accumulates(session_factory):
+    """Тест: инкремент создаёт строку статистики и затем прибавляет к ней"""
+    async with session_factory() as session:
+        await increment_post_stats(session, 1, views=10, likes=1)
+        await increment_post_stats(session, 1, views=5, reposts=2)
+        stats = await get_post_stats_by_post_id(session, 1)
+        await session.refresh(stats)
+        assert (stats.views, stats.likes, stats.reposts) == (15, 1, 2)
+
+
+@pytest.mark.asyncio
+async def test_buffer_combines_writes(session_factory):
+    """Тест: буфер объединяет события по постам и сбрасывает их одной пачкой"""
+    buffer = PostStatsBuffer(flush_interval=60, max_pending=100, session_factory=session_factory)
+    for _ in range(50):
+        buffer.add(1, views=1)
+    buffer.add(2, likes=3)
+    assert buffer.pending == 2
+
+    assert await buffer.flush() == 2
+    assert buffer.pending == 0
+
+    async with session_factory() as session:
+        first = await get_post_stats_by_post_id(session, 1)
+        second = await get_post_stats_by_post_id(session, 2)
+        assert first.views == 50
+        assert second.likes == 3
+
+
+@pytest.mark.asyncio
+async def test_buffer_keeps_counts_on_failure():
+    """Тест: при ошибке записи инкременты остаются в буфере"""
+    def broken_factory():
+        raise RuntimeError("db down")
+
+    buffer = PostStatsBuffer(flush_interval=60, max_pending=100, session_factory=broken_factory)
+    buffer.add(1, views=2)
+    assert await buffer.flush() == 0
+    buffer.add(1, views=3)
+    assert buffer._pending[1] == [5, 0, 0]
+
+
+def test_buffer_skips_platforms_owned_by_collector(monkeypatch):
+    """Тест: инкременты постов площадки со сборщиком метрик не копятся — их перезапишет сборщик"""
+    from bot.services.stats import collector as collector_module
+
+    monkeypatch.setattr(collector_module, "_fetchers", {"telegram": object()})
+    buffer = PostStatsBuffer(flush_interval=60, max_pending=100)
+    buffer.add(1, views=1, platform="telegram")
+    buffer.add(2, views=1, platform="vk")
+    buffer.add(3, views=1)
+    assert buffer.pending == 2
+
+
+@pytest.mark.asyncio
+async def test_touch_marks_attempt_without_changing_metrics(session_factory):
+    """Тест: отметка попытки сбора двигает updated_at, не трогая метрики, и создаёт пустую строку"""
+    async with session_factory() as session:
+        await upsert_post_stats_batch(session, {1: (100, 5, 2)})
+        before = (await get_post_stats_by_post_id(session, 1)).updated_at
+
+        await touch_post_stats_batch(session, [1, 2])
+        first = await get_post_stats_by_post_id(session, 1)
+        await session.refresh(first)
+        second = await get_post_stats_by_post_id(session, 2)
+
+        assert (first.views, first.likes, first.reposts) == (100, 5, 2)
+        assert first.updated_at >= before
+        assert second is not None and second.views == 0
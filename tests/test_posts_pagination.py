@@ -0,0 +1,21 @@
+from datetime import datetime, timezone
+
+from bot.services.crud.post import encode_posts_cursor, decode_posts_cursor
+from bot.keyboards.inline.posts import get_posts_keyboard
+
+
+def test_posts_cursor_roundtrip():
+    """Тест: курсор страницы восстанавливается без потери микросекунд"""
+    created_at = datetime(2026, 3, 1, 12, 30, 15, 123456, tzinfo=timezone.utc)
+    cursor = encode_posts_cursor(created_at, 4242)
+    assert decode_posts_cursor(cursor) == (created_at, 4242)
+    assert len(f"posts:page:next:{cursor}") <= 64
+
+
+def test_posts_keyboard_navigation_buttons():
+    """Тест: кнопки страниц появляются только для переданных курсоров"""
+    i18n = {}
+    keyboard = get_posts_keyboard(i18n, [], next_cursor="1_2")
+    callbacks = [b.callback_data for row in keyboard.inline_keyboard for b in row]
+    assert "posts:page:next:1_2" in callbacks
+    assert not any(c.startswith("posts:page:prev:") for c in callbacks)
@@ -0,0 +1,51 @@
+import json
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+from sqlalchemy.dialects import postgresql
+
+from bot.services.profile.summary import profile_summary_query, get_profile_summary
+
+
+def test_summary_is_single_statement():
+    """Тест: все счётчики профиля собираются в одном SELECT"""
+    sql = str(profile_summary_query(7).compile(dialect=postgresql.dialect()))
+    assert sql.count("SELECT") == 8  # основной запрос + 7 скалярных подзапросов
+    for label in ("total_posts", "published_posts", "active_workflows", "total_accounts", "plan_name", "referrer_name"):
+        assert label in sql
+
+
+@pytest.mark.asyncio
+async def test_summary_served_from_cache():
+    """Тест: при попадании в кэш запрос к БД не выполняется"""
+    redis = AsyncMock()
+    redis.get.return_value = json.dumps({"total_posts": 3})
+    session = MagicMock()
+    session.execute = AsyncMock()
+
+    summary = await get_profile_summary(session, 7, redis)
+
+    assert summary == {"total_posts": 3}
+    session.execute.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_summary_cached_after_miss():
+    """Тест: при промахе сводка читается одним запросом и кладётся в Redis"""
+    redis = AsyncMock()
+    redis.get.return_value = None
+    result = MagicMock()
+    result.mappings.return_value.first.return_value = {
+        "total_posts": 2, "published_posts": 1, "total_workflows": 1, "active_workflows": 1,
+        "total_accounts": 1, "plan_name": None, "subscription_end": None, "referrer_name": None,
+    }
+    session = MagicMock()
+    session.execute = AsyncMock(return_value=result)
+
+    summary = await get_profile_summary(session, 7, redis)
+
+    assert summary["total_posts"] == 2
+    session.execute.assert_awaited_once()
+    key, payload = redis.set.await_args.args
+    assert key == "profile:summary:7"
+    assert json.loads(payload) == summary
@@ -0,0 +1,173 @@
+import asyncio
+from datetime import datetime, timezone
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+import pytest_asyncio
+from aiogram.exceptions import TelegramBadRequest, TelegramNetworkError
+from aiogram.methods import SendMessage
+
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+
+from bot import config
+from bot.models.models import Post
+from bot.services.publishing import publisher as publisher_module
+from bot.services.publishing.publisher import PublishingService, backoff_delay, is_transient_error
+
+
+@pytest_asyncio.fixture
+async def session_factory(tmp_path):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'posts.db'}")
+    async with engine.begin() as conn:
+        await conn.run_sync(Post.__table__.create)
+    yield async_sessionmaker(engine, expire_on_commit=False)
+    await engine.dispose()
+
+
+def test_backoff_grows_and_is_capped():
+    """Тест: задержка растёт экспоненциально, с джиттером и не превышает потолок"""
+    base = config.PUBLISH_RETRY_BASE_DELAY
+    for attempt in range(1, 4):
+        delay = backoff_delay(attempt)
+        assert base * 2 ** (attempt - 1) / 2 <= delay <= base * 2 ** (attempt - 1)
+    assert backoff_delay(100) <= config.PUBLISH_RETRY_MAX_DELAY
+
+
+def test_transient_errors_classification():
+    """Тест: сетевые ошибки повторяются, ошибки запроса — нет"""
+    method = SendMessage(chat_id=1, text="x")
+    assert is_transient_error(TelegramNetworkError(method=method, message="timeout"))
+    assert is_transient_error(asyncio.TimeoutError())
+    assert not is_transient_error(TelegramBadRequest(method=method, message="chat not found"))
+
+
+def test_request_hash_depends_on_content():
+    """Тест: хэш запроса стабилен и меняется при правке поста"""
+    account = SimpleNamespace(telegram_chat_id="-1001")
+    post = SimpleNamespace(topic="Тема", content="Текст", media_type="text", media_url=None)
+    first = PublishingService._request_hash(post, account)
+    assert first == PublishingService._request_hash(post, account)
+    post.content = "Другой текст"
+    assert first != PublishingService._request_hash(post, account)
+
+
+@pytest.mark.asyncio
+async def test_concurrent_publish_sends_once(session_factory, monkeypatch):
+    """Тест: два одновременных publish_post одного поста (один экземпляр) отправляют его один раз"""
+    async with session_factory() as session:
+        session.add(Post(
+            id=1, topic="Тема", content="Текст", media_type="text", status="scheduled",
+            scheduled_time=datetime.now(timezone.utc),
+        ))
+        await session.commit()
+
+    monkeypatch.setattr(publisher_module, "update_post", AsyncMock())
+    monkeypatch.setattr(publisher_module, "get_successful_attempt", AsyncMock(return_value=None))
+    monkeypatch.setattr(publisher_module, "start_attempt", AsyncMock())
+    monkeypatch.setattr(publisher_module, "finish_attempt", AsyncMock())
+
+    service = PublishingService(MagicMock(id=1))
+    account = SimpleNamespace(platform="telegram", telegram_chat_id="-1001")
+    post = SimpleNamespace(id=1, topic="Тема", content="Текст", media_type="text", media_url=None, retry_count=0)
+    service._get_post_with_details = AsyncMock(return_value=(post, None, None, account))
+    sends = []
+
+    async def send(post, social_account):
+        sends.append(post.id)
+        await asyncio.sleep(0.05)
+        return MagicMock(message_id=10)
+
+    service._publish_to_telegram = send
+
+    async def publish():
+        async with session_factory() as session:
+            return await service.publish_post(session, 1)
+
+    results = await asyncio.gather(publish(), publish())
+
+    assert sorted(results) == [False, True]
+    assert sends == [1]
+
+
+@pytest.mark.asyncio
+async def test_channel_posts_serialized_other_channels_concurrent(monkeypatch):
+    """Тест: посты одного канала публикуются по очереди, разных каналов — параллельно"""
+    claimed = [
+        SimpleNamespace(id=1, topic="a", social_account_id=1, user_workflow_id=None),
+        SimpleNamespace(id=2, topic="b", social_account_id=1, user_workflow_id=None),
+        SimpleNamespace(id=3, topic="c", social_account_id=2, user_workflow_id=None),
+    ]
+    channel_of = {p.id: p.social_account_id for p in claimed}
+    active = {1: 0, 2: 0}
+    max_active = {1: 0, 2: 0}
+    max_total = [0]
+
+    class DummySession:
+        async def __aenter__(self):
+            return self
+
+        async def __aexit__(self, *exc):
+            return False
+
+    monkeypatch.setattr(publisher_module, "AsyncSessionLocal", DummySession)
+    service = PublishingService(MagicMock(id=2), concurrency=10, per_channel=1)
+    service._claim_batch = AsyncMock(side_effect=[claimed, []])
+
+    async def publish(session, post_id, lease_token=None):
+        channel = channel_of[post_id]
+        active[channel] += 1
+        max_active[channel] = max(max_active[channel], active[channel])
+        max_total[0] = max(max_total[0], sum(active.values()))
+        await asyncio.sleep(0.02)
+        active[channel] -= 1
+        return True
+
+    service.publish_post = publish
+    await service.run_publishing_cycle()
+
+    assert max_active == {1: 1, 2: 1}
+    assert max_total[0] == 2
+
+
+@pytest.mark.asyncio
+async def test_post_db_error_does_not_roll_back_sibling(session_factory, monkeypatch):
+    """Тест: ошибка БД при публикации одного поста не откатывает соседний — у каждого своя сессия"""
+    now = datetime.now(timezone.utc)
+    async with session_factory() as session:
+        session.add_all([
+            Post(id=1, social_account_id=1, topic="a", content="x", media_type="text", status="scheduled", scheduled_time=now),
+            Post(id=2, social_account_id=2, topic="b", content="y", media_type="text", status="scheduled", scheduled_time=now),
+            # Уже опубликованный пост того же канала с тем же message_id: запись поста 2 нарушит уникальность
+            Post(id=3, social_account_id=2, topic="c", content="z", media_type="text", status="published",
+                 scheduled_time=now, external_id="10"),
+        ])
+        await session.commit()
+
+    monkeypatch.setattr(publisher_module, "AsyncSessionLocal", session_factory)
+    monkeypatch.setattr(publisher_module, "get_successful_attempt", AsyncMock(return_value=None))
+    monkeypatch.setattr(publisher_module, "start_attempt", AsyncMock())
+    monkeypatch.setattr(publisher_module, "finish_attempt", AsyncMock())
+
+    service = PublishingService(MagicMock(id=3))
+    accounts = {
+        1: SimpleNamespace(id=1, platform="telegram", telegram_chat_id="-1001"),
+        2: SimpleNamespace(id=2, platform="telegram", telegram_chat_id="-1002"),
+    }
+
+    async def details(session, post_id):
+        post = await session.get(Post, post_id)
+        return post, None, None, accounts[post.social_account_id]
+
+    async def send(post, social_account):
+        return MagicMock(message_id=10)
+
+    service._get_post_with_details = details
+    service._publish_to_telegram = send
+
+    await service.run_publishing_cycle(post_ids=[1, 2])
+
+    async with session_factory() as session:
+        first, second = await session.get(Post, 1), await session.get(Post, 2)
+        assert (first.status, first.external_id) == ("published", "10")
+        assert second.status != "published"
@@ -0,0 +1,84 @@
+from datetime import datetime, timedelta, timezone
+from unittest.mock import MagicMock
+
+import pytest
+import pytest_asyncio
+from sqlalchemy import event
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+from sqlalchemy.ext.compiler import compiles
+
+from bot.models.models import Post, SocialAccount, UserWorkflow, WorkflowSettings
+from bot.services.publishing.publisher import PublishingService
+
+
+@compiles(JSONB, "sqlite")
+def _jsonb_as_json(element, compiler, **kw):
+    # В SQLite нет JSONB: для этих тестов достаточно обычного JSON
+    return "JSON"
+
+
+@pytest_asyncio.fixture
+async def engine():
+    engine = create_async_engine("sqlite+aiosqlite:///:memory:")
+    async with engine.begin() as conn:
+        for model in (SocialAccount, UserWorkflow, WorkflowSettings, Post):
+            await conn.run_sync(model.__table__.create)
+    now = datetime.now(timezone.utc)
+    async with async_sessionmaker(engine)() as session:
+        session.add_all([
+            SocialAccount(id=1, user_id=7, platform="telegram", channel_name="wf", channel_id="@wf", telegram_chat_id="-1001"),
+            SocialAccount(id=2, user_id=8, platform="telegram", channel_name="direct", channel_id="@direct", telegram_chat_id="-1002"),
+            UserWorkflow(id=1, user_id=7, workflow_id="auto", name="Задача"),
+            WorkflowSettings(id=1, user_workflow_id=1, social_account_id=1, interval_hours=8, first_post_time="09:00",
+                             theme="финансы", writing_style="friendly", generation_method="ai"),
+            # Пост задачи: канал берётся из настроек задачи
+            Post(id=1, user_workflow_id=1, topic="a", content="x", media_type="text", status="scheduled",
+                 scheduled_time=now - timedelta(minutes=5)),
+            # Ручной пост без задачи: канал — Post.social_account_id
+            Post(id=2, social_account_id=2, topic="b", content="y", media_type="text", status="scheduled",
+                 scheduled_time=now - timedelta(minutes=1)),
+            Post(id=3, social_account_id=2, topic="c", content="z", media_type="text", status="scheduled",
+                 scheduled_time=now + timedelta(hours=1)),
+        ])
+        await session.commit()
+    yield engine
+    await engine.dispose()
+
+
+@pytest.mark.asyncio
+async def test_details_resolve_account_from_settings_or_post(engine):
+    """Тест: канал берётся из настроек задачи, а у поста без задачи — из Post.social_account_id"""
+    service = PublishingService(MagicMock(id=4))
+    async with async_sessionmaker(engine)() as session:
+        rows = await service.get_posts_with_details(session)
+
+    by_post = {post.id: (workflow, settings, account) for post, workflow, settings, account in rows}
+    assert sorted(by_post) == [1, 2, 3]
+    workflow, settings, account = by_post[1]
+    assert (workflow.id, settings.id, account.id) == (1, 1, 1)
+    workflow, settings, account = by_post[2]
+    assert workflow is None and settings is None and account.id == 2
+
+
+@pytest.mark.asyncio
+async def test_n8n_posts_limit_pushed_into_query(engine):
+    """Тест: выборка для n8n — только наступившие посты, LIMIT выполняется в самом запросе"""
+    statements = []
+    event.listen(engine.sync_engine, "before_cursor_execute",
+                 lambda conn, cursor, statement, *args: statements.append(statement))
+
+    service = PublishingService(MagicMock(id=4))
+    async with async_sessionmaker(engine)() as session:
+        posts = await service.get_posts_for_n8n(session, limit=1)
+
+    assert [p["post_id"] for p in posts] == [1]
+    assert posts[0]["user_id"] == 7 and posts[0]["workflow_id"] == 1
+    assert posts[0]["telegram_chat_id"] == "-1001"
+    assert len(statements) == 1
+    assert "LIMIT" in statements[0]
+
+    async with async_sessionmaker(engine)() as session:
+        posts = await service.get_posts_for_n8n(session, limit=10)
+    assert [p["post_id"] for p in posts] == [1, 2]
+    assert posts[1]["user_id"] == 8 and posts[1]["workflow_id"] is None
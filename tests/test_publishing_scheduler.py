@@ -0,0 +1,28 @@
+from datetime import datetime, timezone, timedelta
+
+from bot.services.publishing.scheduler import PublishingScheduler
+
+
+def test_scheduler_pops_due_posts_in_order():
+    """Тест: из кучи извлекаются только наступившие посты, по возрастанию времени"""
+    scheduler = PublishingScheduler(service=None, reconcile_seconds=60)
+    now = datetime.now(timezone.utc)
+    scheduler.schedule(1, now - timedelta(seconds=5))
+    scheduler.schedule(2, now - timedelta(seconds=10))
+    scheduler.schedule(3, now + timedelta(minutes=5))
+
+    assert scheduler.pop_due(now) == [2, 1]
+    assert scheduler.next_deadline() == now + timedelta(minutes=5)
+
+
+def test_scheduler_reschedule_replaces_deadline():
+    """Тест: перенос поста отменяет старый дедлайн и будит планировщик"""
+    scheduler = PublishingScheduler(service=None, reconcile_seconds=60)
+    now = datetime.now(timezone.utc)
+    scheduler.schedule(1, now + timedelta(hours=1))
+    scheduler._wakeup.clear()
+
+    scheduler.schedule(1, now - timedelta(seconds=1))
+    assert scheduler._wakeup.is_set()
+    assert scheduler.pop_due(now) == [1]
+    assert scheduler.next_deadline() is None
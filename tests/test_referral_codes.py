@@ -0,0 +1,67 @@
+import pytest
+import pytest_asyncio
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+
+from bot.models.models import User
+from bot.services.crud import user as user_crud
+from bot.utils.referral import encode_referral_code, validate_referral_code, CODE_ALPHABET, CODE_LENGTH
+
+
+@pytest_asyncio.fixture
+async def session():
+    engine = create_async_engine("sqlite+aiosqlite:///:memory:")
+    async with engine.begin() as conn:
+        await conn.run_sync(User.__table__.create)
+    async with async_sessionmaker(engine, expire_on_commit=False)() as session:
+        yield session
+    await engine.dispose()
+
+
+def test_codes_are_unique_and_valid():
+    """Тест: разные ID дают разные коды фиксированной длины из допустимого алфавита"""
+    codes = {encode_referral_code(i, secret="test") for i in range(1, 20001)}
+    assert len(codes) == 20000
+    code = encode_referral_code(42, secret="test")
+    assert len(code) == CODE_LENGTH
+    assert set(code) <= set(CODE_ALPHABET)
+    assert validate_referral_code(code)
+
+
+def test_tweak_and_secret_change_code():
+    """Тест: другая перестановка или ключ дают другой код для того же ID"""
+    base = encode_referral_code(7, secret="a")
+    assert encode_referral_code(7, secret="a") == base
+    assert encode_referral_code(7, tweak=1, secret="a") != base
+    assert encode_referral_code(7, secret="b") != base
+    with pytest.raises(ValueError):
+        encode_referral_code(-1)
+
+
+@pytest.mark.asyncio
+async def test_new_user_gets_code_without_lookups(session, monkeypatch):
+    """Тест: новый пользователь создаётся сразу с кодом, без перебора случайных кандидатов"""
+    async def unexpected(*args, **kwargs):
+        raise AssertionError("random code generation should not be used")
+
+    monkeypatch.setattr(user_crud, "generate_unique_referral_code", unexpected)
+
+    first = await user_crud.get_or_create_user(session, telegram_id=100, full_name="A", username="a")
+    second = await user_crud.get_or_create_user(session, telegram_id=200, full_name="B", username="b")
+    again = await user_crud.get_or_create_user(session, telegram_id=100, full_name="A", username="a")
+
+    assert first.referral_code == encode_referral_code(first.id)
+    assert second.referral_code and second.referral_code != first.referral_code
+    assert again.id == first.id
+
+
+@pytest.mark.asyncio
+async def test_assign_skips_taken_code(session):
+    """Тест: если код из ID занят старым кодом, берётся следующая перестановка"""
+    legacy = User(telegram_id=1, name="legacy", referral_code=encode_referral_code(2))
+    target = User(id=2, telegram_id=2, name="target")
+    session.add_all([legacy, target])
+    await session.commit()
+
+    code = await user_crud.assign_referral_code(session, target)
+    assert code == encode_referral_code(2, tweak=1)
+    assert target.referral_code == code
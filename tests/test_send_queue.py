@@ -0,0 +1,19 @@
+import pytest
+
+from bot.services.publishing.send_queue import TokenBucket
+
+
+def test_token_bucket_allows_burst_then_spaces_out():
+    """Тест: бакет пропускает burst без ожидания, дальше — с интервалом 1/rate"""
+    bucket = TokenBucket(rate=2, capacity=2)
+    assert bucket.reserve() == 0
+    assert bucket.reserve() == 0
+    assert bucket.reserve() == pytest.approx(0.5, abs=0.01)
+    assert bucket.reserve() == pytest.approx(1.0, abs=0.01)
+
+
+def test_token_bucket_pause_delays_next_send():
+    """Тест: после retry_after следующая отправка ждёт окончания паузы"""
+    bucket = TokenBucket(rate=10, capacity=5)
+    bucket.pause(3)
+    assert bucket.reserve() == pytest.approx(3.1, abs=0.01)
@@ -0,0 +1,155 @@
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+from sqlalchemy.dialects import postgresql
+
+from bot.services.stats import collector as collector_module
+from bot.services.stats.collector import StatsCollector, StatsTarget, due_posts_query
+
+
+def test_due_query_decays_with_age():
+    """Тест: интервал обновления зависит от возраста поста и ограничен сверху и снизу"""
+    sql = str(due_posts_query(["vk"], 100).compile(dialect=postgresql.dialect()))
+    assert "least(greatest((now() - posts.published_time)" in sql
+    assert "post_stats.id IS NULL" in sql
+    assert "NULLS FIRST" in sql
+
+
+@pytest.mark.asyncio
+async def test_collect_batches_per_channel(monkeypatch):
+    """Тест: посты одного канала запрашиваются пачками, ошибка пачки не ломает цикл"""
+    calls = []
+
+    async def fetcher(bot, chat_id, external_ids):
+        calls.append((chat_id, list(external_ids)))
+        if chat_id == "broken":
+            raise RuntimeError("api down")
+        return {ext: (int(ext) * 10, 1, 0) for ext in external_ids}
+
+    monkeypatch.setattr(collector_module, "_fetchers", {"vk": fetcher})
+    targets = [StatsTarget(i, str(i), "vk", "chan") for i in range(1, 6)]
+    targets.append(StatsTarget(99, "99", "vk", "broken"))
+
+    metrics = await StatsCollector(bot=None, batch_size=2, concurrency=2).collect(targets)
+
+    assert sorted(len(ids) for chat, ids in calls if chat == "chan") == [1, 2, 2]
+    assert metrics[3] == (30, 1, 0)
+    assert 99 not in metrics
+
+
+class FakeSession:
+    """Сессия-заглушка: отдаёт строки выборки и отмечает, открыта ли она"""
+
+    def __init__(self, rows, log):
+        self.log = log
+        result = MagicMock()
+        result.all.return_value = rows
+        self.execute = AsyncMock(return_value=result)
+
+    async def __aenter__(self):
+        self.log.append("open")
+        return self
+
+    async def __aexit__(self, *exc):
+        self.log.append("close")
+        return False
+
+
+def session_factory(rows, log):
+    sessions = []
+
+    def factory():
+        sessions.append(FakeSession(rows, log))
+        return sessions[-1]
+
+    return factory, sessions
+
+
+@pytest.mark.asyncio
+async def test_cycle_writes_single_upsert(monkeypatch):
+    """Тест: результат всего цикла записывается одним upsert, сессия на время запросов закрыта"""
+    log = []
+
+    async def fetcher(bot, chat_id, external_ids):
+        log.append("fetch")
+        return {ext: (5, 0, 0) for ext in external_ids}
+
+    monkeypatch.setattr(collector_module, "_fetchers", {"vk": fetcher})
+    upsert = AsyncMock()
+    monkeypatch.setattr(collector_module, "upsert_post_stats_batch", upsert)
+    monkeypatch.setattr(collector_module, "touch_post_stats_batch", AsyncMock())
+
+    factory, sessions = session_factory([(1, "11", "vk", "a"), (2, "12", "vk", "b")], log)
+    assert await StatsCollector(bot=None, session_factory=factory).run_cycle() == 2
+    upsert.assert_awaited_once_with(sessions[1], {1: (5, 0, 0), 2: (5, 0, 0)})
+    assert log == ["open", "close", "fetch", "fetch", "open", "close"]
+
+
+@pytest.mark.asyncio
+async def test_cycle_marks_posts_without_metrics(monkeypatch):
+    """Тест: посты без метрик (удалённое сообщение, ошибка канала) отмечаются попыткой"""
+    async def fetcher(bot, chat_id, external_ids):
+        if chat_id == "broken":
+            raise RuntimeError("api down")
+        return {"11": (5, 0, 0)}  # сообщения 12 больше нет
+
+    monkeypatch.setattr(collector_module, "_fetchers", {"vk": fetcher})
+    monkeypatch.setattr(collector_module, "upsert_post_stats_batch", AsyncMock())
+    touch = AsyncMock()
+    monkeypatch.setattr(collector_module, "touch_post_stats_batch", touch)
+
+    rows = [(1, "11", "vk", "a"), (2, "12", "vk", "a"), (3, "13", "vk", "broken")]
+    factory, sessions = session_factory(rows, [])
+    assert await StatsCollector(bot=None, session_factory=factory).run_cycle() == 1
+    touch.assert_awaited_once_with(sessions[1], [2, 3])
+
+
+@pytest.mark.asyncio
+async def test_cycle_skips_without_fetchers(monkeypatch):
+    """Тест: без источников метрик цикл не обращается к БД"""
+    monkeypatch.setattr(collector_module, "_fetchers", {})
+    factory = MagicMock()
+    assert await StatsCollector(bot=None, session_factory=factory).run_cycle() == 0
+    factory.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_telegram_fetcher_reads_views_reactions_forwards():
+    """Тест: MTProto-источник отдаёт просмотры, реакции и репосты одной пачкой на канал"""
+    from types import SimpleNamespace
+    from bot.services.stats.telegram import TelegramStatsFetcher
+
+    reactions = SimpleNamespace(results=[SimpleNamespace(count=3), SimpleNamespace(count=2)])
+    client = MagicMock()
+    client.get_messages = AsyncMock(return_value=[
+        SimpleNamespace(id=11, views=100, forwards=4, reactions=reactions),
+        None,  # удалённое сообщение
+        SimpleNamespace(id=13, views=None, forwards=None, reactions=None),
+    ])
+    fetcher = TelegramStatsFetcher(1, "hash", "token", "session")
+    fetcher._client = client
+
+    metrics = await fetcher(None, "-1001", ["11", "12", "13"])
+
+    client.get_messages.assert_awaited_once_with(-1001, ids=[11, 12, 13])
+    assert metrics == {"11": (100, 5, 4), "13": (0, 0, 0)}
+
+
+def test_telegram_source_registered_only_when_enabled(monkeypatch):
+    """Тест: источник Telegram регистрируется только при включённом флаге и ключах API"""
+    from bot import config
+    from bot.services.stats import telegram as telegram_module
+
+    monkeypatch.setattr(collector_module, "_fetchers", {})
+    monkeypatch.setattr(config, "STATS_TELEGRAM_MTPROTO", False)
+    assert not telegram_module.setup_telegram_stats()
+
+    monkeypatch.setattr(config, "STATS_TELEGRAM_MTPROTO", True)
+    monkeypatch.setattr(config, "TELEGRAM_API_ID", 0)
+    assert not telegram_module.setup_telegram_stats()
+
+    monkeypatch.setattr(config, "TELEGRAM_API_ID", 1)
+    monkeypatch.setattr(config, "TELEGRAM_API_HASH", "hash")
+    monkeypatch.setattr(telegram_module, "_telegram_fetcher", None)
+    assert telegram_module.setup_telegram_stats()
+    assert collector_module.has_stats_fetcher("telegram")
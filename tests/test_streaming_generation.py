@@ -0,0 +1,84 @@
+import json
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+
+from bot.services.ai.openai_service import OpenAIService
+from bot.utils.progressive_edit import ProgressiveEditor
+
+
+class StreamContent:
+    """Тело ответа aiohttp: асинхронный итератор строк"""
+
+    def __init__(self, lines):
+        self._lines = iter(lines)
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        try:
+            return next(self._lines)
+        except StopIteration:
+            raise StopAsyncIteration
+
+
+def _sse(*chunks) -> list[bytes]:
+    lines = [b": keep-alive\n"]
+    for chunk in chunks:
+        payload = {"choices": [{"delta": {"content": chunk}}]}
+        lines += [f"data: {json.dumps(payload)}\n".encode(), b"\n"]
+    return lines + [b"data: [DONE]\n"]
+
+
+@pytest.mark.asyncio
+async def test_stream_reports_accumulated_text():
+    """Тест: фрагменты потока собираются в текст, колбэк получает накопленный результат"""
+    response = MagicMock(status=200, content=StreamContent(_sse("Привет", ", ", "мир!")))
+    context = MagicMock()
+    context.__aenter__ = AsyncMock(return_value=response)
+    context.__aexit__ = AsyncMock(return_value=False)
+    http = MagicMock()
+    http.post.return_value = context
+
+    partials = []
+
+    async def on_partial(text):
+        partials.append(text)
+
+    service = OpenAIService(api_key="key", http_session=http)
+    content = await service.generate_post_content(topic="t", theme="x", use_cache=False, on_partial=on_partial)
+
+    assert content == "Привет, мир!"
+    assert partials == ["Привет", "Привет, ", "Привет, мир!"]
+    assert http.post.call_args.kwargs["json"]["stream"] is True
+
+
+@pytest.mark.asyncio
+async def test_editor_throttles_edits():
+    """Тест: правки сообщения ограничены по частоте и по приросту текста"""
+    message = MagicMock()
+    message.edit_text = AsyncMock()
+    editor = ProgressiveEditor(message, lambda text: text, interval=60, min_chars=5)
+
+    await editor.update("abc")          # прирост меньше min_chars
+    await editor.update("abcdefgh")     # первая правка
+    await editor.update("abcdefghijklmnop")  # слишком рано
+    assert message.edit_text.await_count == 1
+
+    editor.interval = 0
+    editor._next_edit_at = 0
+    await editor.update("abcdefghijklmnop")
+    editor.close()
+    await editor.update("abcdefghijklmnopqrstuvwxyz")
+    assert [c.args[0] for c in message.edit_text.await_args_list] == ["abcdefgh", "abcdefghijklmnop"]
+
+
+@pytest.mark.asyncio
+async def test_editor_ignores_edit_errors():
+    """Тест: ошибка правки не прерывает генерацию"""
+    message = MagicMock()
+    message.edit_text = AsyncMock(side_effect=RuntimeError("message is not modified"))
+    editor = ProgressiveEditor(message, lambda text: text, interval=0, min_chars=0)
+    await editor.update("text")
+    message.edit_text.assert_awaited_once()
@@ -0,0 +1,36 @@
+from decimal import Decimal
+from types import SimpleNamespace
+
+from bot.services.cache.user_cache import UserCache, user_to_cache, cache_to_user_kwargs
+
+
+def test_local_tier_is_bounded_lru():
+    """Тест: локальный уровень вытесняет самые старые записи"""
+    cache = UserCache(max_size=2, ttl=60, local_ttl=60)
+    cache._local_set(1, 0, {"id": 1})
+    cache._local_set(2, 0, {"id": 2})
+    assert cache._local_get(1) == {"id": 1}  # 1 становится самым свежим
+    cache._local_set(3, 0, {"id": 3})
+    assert cache._local_get(2) is None
+    assert cache._local_get(1) and cache._local_get(3)
+
+
+def test_invalidation_message_drops_older_versions_only():
+    """Тест: сообщение об инвалидации сбрасывает только более старую версию"""
+    cache = UserCache(max_size=10, ttl=60, local_ttl=60)
+    cache._local_set(42, 3, {"id": 1})
+    cache._handle_message(b"42:3")
+    assert cache._local_get(42) is not None
+    cache._handle_message(b"42:4")
+    assert cache._local_get(42) is None
+
+
+def test_user_roundtrip_keeps_cash_precision():
+    """Тест: баланс сохраняется в кэше без потери точности"""
+    user = SimpleNamespace(
+        id=1, telegram_id=100, name="Test", username="test", role="client", referred_by_id=None,
+        referral_code="ABCD2345", cash=Decimal("10.55"), free_posts_used=1, free_posts_limit=5
+    )
+    kwargs = cache_to_user_kwargs(user_to_cache(user))
+    assert kwargs["cash"] == Decimal("10.55")
+    assert kwargs["telegram_id"] == 100
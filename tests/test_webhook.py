@@ -0,0 +1,94 @@
+import asyncio
+
+import pytest
+from aiohttp import web
+from aiohttp.test_utils import TestClient, TestServer
+from aiogram import Bot, Dispatcher
+
+from bot import config
+from bot.utils.webhook import BoundedRequestHandler, check_webhook_config
+
+SECRET = "s3cret"
+TOKEN = "42:TEST"
+
+
+class BlockingDispatcher(Dispatcher):
+    """Dispatcher, обработка апдейтов в котором ждёт сигнала из теста"""
+
+    def __init__(self):
+        super().__init__()
+        self.release = asyncio.Event()
+        self.active = 0
+        self.max_active = 0
+
+    async def feed_raw_update(self, bot, update, **kwargs):
+        self.active += 1
+        self.max_active = max(self.max_active, self.active)
+        try:
+            await self.release.wait()
+        finally:
+            self.active -= 1
+
+
+async def make_client(dp, max_concurrent):
+    bot = Bot(token=TOKEN)
+    app = web.Application()
+    BoundedRequestHandler(dp, bot, secret_token=SECRET, max_concurrent=max_concurrent).register(app, path="/webhook")
+    client = TestClient(TestServer(app))
+    await client.start_server()
+    return client, bot
+
+
+def test_webhook_requires_secret(monkeypatch):
+    """Тест: режим webhook без секретного токена не запускается"""
+    monkeypatch.setattr(config, "BOT_MODE", "webhook")
+    monkeypatch.setattr(config, "WEBHOOK_SECRET", "")
+    with pytest.raises(RuntimeError):
+        check_webhook_config()
+    with pytest.raises(ValueError):
+        BoundedRequestHandler(Dispatcher(), Bot(token=TOKEN), secret_token="")
+
+    monkeypatch.setattr(config, "WEBHOOK_SECRET", SECRET)
+    check_webhook_config()
+
+
+@pytest.mark.asyncio
+async def test_webhook_rejects_wrong_secret():
+    """Тест: запрос без правильного секретного токена отклоняется"""
+    dp = BlockingDispatcher()
+    client, bot = await make_client(dp, max_concurrent=2)
+    try:
+        response = await client.post("/webhook", json={"update_id": 1}, headers={"X-Telegram-Bot-Api-Secret-Token": "bad"})
+        assert response.status == 401
+        response = await client.post("/webhook", json={"update_id": 2})
+        assert response.status == 401
+        assert dp.max_active == 0
+    finally:
+        await client.close()
+        await bot.session.close()
+
+
+@pytest.mark.asyncio
+async def test_webhook_applies_backpressure():
+    """Тест: сверх лимита апдейтов ответ Telegram задерживается до освобождения слота"""
+    dp = BlockingDispatcher()
+    client, bot = await make_client(dp, max_concurrent=2)
+    headers = {"X-Telegram-Bot-Api-Secret-Token": SECRET}
+    try:
+        first = await client.post("/webhook", json={"update_id": 1}, headers=headers)
+        second = await client.post("/webhook", json={"update_id": 2}, headers=headers)
+        assert first.status == second.status == 200
+
+        third = asyncio.create_task(client.post("/webhook", json={"update_id": 3}, headers=headers))
+        await asyncio.sleep(0.1)
+        assert not third.done()
+
+        dp.release.set()
+        response = await asyncio.wait_for(third, timeout=2)
+        assert response.status == 200
+        await asyncio.sleep(0.05)
+        assert dp.max_active == 2
+        assert dp.active == 0
+    finally:
+        await client.close()
+        await bot.session.close()
@@ -0,0 +1,143 @@
+from datetime import datetime, timezone
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+from sqlalchemy.dialects import postgresql
+
+from bot.services.crud.workflow_settings import due_workflow_settings_query, missing_next_run_query
+from bot.services.entitlements import LimitState
+from bot.services.workflows import executor as executor_module
+from bot.services.workflows.executor import DueWorkflow, WorkflowExecutor
+
+
+def compile_pg(statement) -> str:
+    return str(statement.compile(dialect=postgresql.dialect()))
+
+
+def make_due(n: int, user_id: int = 1) -> DueWorkflow:
+    return DueWorkflow(
+        settings_id=n, user_workflow_id=n, user_id=user_id, social_account_id=1,
+        slot=datetime(2026, 1, 1, 9, 0, tzinfo=timezone.utc), next_run_at=None,
+        theme="финансы", context=None, writing_style="friendly", content_length="medium",
+        post_language="ru", post_media_type="text", moderation=False, prompt_template_id=None,
+        content_memory={},
+    )
+
+
+def test_claim_requires_active_subscription():
+    """Тест: задачи захватываются пачкой с блокировкой и только при действующей подписке"""
+    sql = compile_pg(due_workflow_settings_query(datetime.now(timezone.utc), 100))
+    assert "EXISTS (SELECT subscriptions.id" in sql
+    assert "subscriptions.user_id = user_workflows.user_id" in sql
+    assert "FOR UPDATE OF workflow_settings SKIP LOCKED" in sql
+
+
+def test_missing_next_run_skips_unschedulable_rows():
+    """Тест: строки без времени первого поста не выбираются на каждом тике"""
+    sql = compile_pg(missing_next_run_query(10))
+    assert "workflow_settings.first_post_time ~" in sql
+    assert "workflow_settings.interval_hours >" in sql
+
+
+@pytest.mark.asyncio
+async def test_reserve_quota_consumes_per_post(monkeypatch):
+    """Тест: на каждый пост списывается лимит; без подписки или лимита слот пропускается"""
+    states = {
+        1: LimitState(user_id=1, subscription_id=10, posts_limit=1),
+        2: LimitState(user_id=2),
+    }
+    monkeypatch.setattr(executor_module, "get_limit_state", AsyncMock(side_effect=lambda s, uid: states[uid]))
+    consumed = []
+
+    async def consume(session, state, is_manual=False):
+        if state.posts_used >= state.posts_limit:
+            return False
+        state.posts_used += 1
+        consumed.append(state.user_id)
+        return True
+
+    monkeypatch.setattr(executor_module, "consume_post", consume)
+
+    due = [make_due(1, user_id=1), make_due(2, user_id=1), make_due(3, user_id=2)]
+    allowed = await WorkflowExecutor()._reserve_quota(MagicMock(), due)
+
+    assert [d.settings_id for d in allowed] == [1]
+    assert allowed[0].subscription_id == 10 and allowed[0].is_premium
+    assert consumed == [1]
+    assert executor_module.get_limit_state.await_count == 2
+
+
+class FakeSession:
+    def __init__(self):
+        self.added = []
+        self.execute = AsyncMock()
+        self.commit = AsyncMock()
+        self.rollback = AsyncMock()
+
+    def add_all(self, items):
+        self.added.extend(items)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+
+@pytest.mark.asyncio
+async def test_batch_creates_posts_and_refunds_failures(monkeypatch):
+    """Тест: посты создаются одной пачкой, лимит за неудачную генерацию возвращается"""
+    session = FakeSession()
+    monkeypatch.setattr(executor_module, "AsyncSessionLocal", lambda: session)
+
+    async def generate(params, priority):
+        return None if params["theme"] == "broken" else f"Пост: {params['topic']}"
+
+    monkeypatch.setattr(executor_module.generation_queue, "generate", generate)
+    refund = AsyncMock()
+    monkeypatch.setattr(executor_module, "increment_usage", refund)
+    monkeypatch.setattr(executor_module, "invalidate_limit_state", AsyncMock())
+    monkeypatch.setattr(executor_module, "invalidate_profile_summary", AsyncMock())
+    monkeypatch.setattr(executor_module, "notify_post_scheduled", MagicMock())
+
+    ok, broken = make_due(1), make_due(2)
+    ok.subscription_id = broken.subscription_id = 10
+    broken.theme = "broken"
+
+    created = await WorkflowExecutor()._execute_batch([ok, broken])
+
+    assert created == 1
+    assert [post.content for post in session.added] == ["Пост: финансы"]
+    refund.assert_awaited_once_with(session, 10, "posts_used", -1)
+    assert ok.content_memory["posts_generated"] == 1
+
+
+@pytest.mark.asyncio
+async def test_batch_commit_failure_refunds_whole_batch(monkeypatch):
+    """Тест: если пачка не записалась, лимит возвращается всем постам, а задачи уходят на повтор"""
+    session = FakeSession()
+    session.commit = AsyncMock(side_effect=[RuntimeError("db down"), None])
+    monkeypatch.setattr(executor_module, "AsyncSessionLocal", lambda: session)
+
+    async def generate(params, priority):
+        return f"Пост: {params['topic']}"
+
+    monkeypatch.setattr(executor_module.generation_queue, "generate", generate)
+    refund = AsyncMock()
+    monkeypatch.setattr(executor_module, "increment_usage", refund)
+    monkeypatch.setattr(executor_module, "invalidate_limit_state", AsyncMock())
+    notify = MagicMock()
+    monkeypatch.setattr(executor_module, "notify_post_scheduled", notify)
+
+    due = [make_due(1), make_due(2)]
+    for d in due:
+        d.subscription_id = 10
+
+    executor = WorkflowExecutor()
+    assert await executor._execute_batch(due) == 0
+
+    session.rollback.assert_awaited_once()
+    assert refund.await_count == 2
+    retry_rows = session.execute.await_args_list[-1].args[1]
+    assert [row["id"] for row in retry_rows] == [1, 2]
+    notify.assert_not_called()
@@ -0,0 +1,48 @@
+from datetime import datetime, timedelta, timezone
+
+from bot.services.crud.workflow_settings import compute_next_run_at
+
+
+def test_next_run_before_first_slot():
+    """Тест: до первого слота дня возвращается сам первый слот"""
+    after = datetime(2026, 1, 10, 6, 0, tzinfo=timezone.utc)
+    assert compute_next_run_at("09:30", 8, after) == datetime(2026, 1, 10, 9, 30, tzinfo=timezone.utc)
+
+
+def test_next_run_follows_interval_grid():
+    """Тест: следующий слот строго позже after и лежит на сетке интервала"""
+    anchor = datetime(2026, 1, 10, 9, 30, tzinfo=timezone.utc)
+    after = datetime(2026, 1, 11, 2, 0, tzinfo=timezone.utc)
+    assert compute_next_run_at("09:30", 8, after, anchor=anchor) == datetime(2026, 1, 11, 9, 30, tzinfo=timezone.utc)
+    assert compute_next_run_at("09:30", 8, anchor, anchor=anchor) == datetime(2026, 1, 10, 17, 30, tzinfo=timezone.utc)
+
+
+def test_next_run_manual_mode():
+    """Тест: без времени или интервала (ручной режим) расписания нет"""
+    now = datetime.now(timezone.utc)
+    assert compute_next_run_at(None, 8, now) is None
+    assert compute_next_run_at("10:00", None, now) is None
+
+
+def _chain(interval: int, count: int = 8) -> list[datetime]:
+    created_at = datetime(2026, 1, 10, 5, 0, tzinfo=timezone.utc)
+    slots = [compute_next_run_at("09:00", interval, created_at, anchor=created_at)]
+    for _ in range(count - 1):
+        slots.append(compute_next_run_at("09:00", interval, slots[-1], anchor=created_at))
+    return slots
+
+
+def test_next_run_keeps_interval_not_dividing_day():
+    """Тест: интервалы 16, 20 и 36 ч не сбиваются на смене суток"""
+    for interval in (16, 20, 36):
+        slots = _chain(interval)
+        assert slots[0] == datetime(2026, 1, 10, 9, 0, tzinfo=timezone.utc)
+        assert {b - a for a, b in zip(slots, slots[1:])} == {timedelta(hours=interval)}
+
+
+def test_next_run_skips_missed_slots_on_same_grid():
+    """Тест: после простоя следующий слот лежит на исходной сетке, а не на сетке нового дня"""
+    created_at = datetime(2026, 1, 10, 5, 0, tzinfo=timezone.utc)
+    after = datetime(2026, 1, 12, 12, 0, tzinfo=timezone.utc)
+    # 10-е 09:00 → 11-е 01:00 → 11-е 17:00 → 12-е 09:00 → 13-е 01:00
+    assert compute_next_run_at("09:00", 16, after, anchor=created_at) == datetime(2026, 1, 13, 1, 0, tzinfo=timezone.utc)